@@ -9,3 +9,9 @@ for i in $(ls $TEST_PATH); do
         exit 1
     fi
 done
+
+# The fast lexer feeding the verbose parser
+python3 main.py -i $TEST_PATH/gcd.lla -le fast -pv > /dev/null 2>&1
+if [ $? -ne 0 ]; then
+    exit 1
+fi
@@ -11,34 +11,163 @@
 # ----------------------------------------------------------------------
 """
 
+from array import array
+
+# == SOURCE POSITIONS OF AST NODES ==
+
+
+class PositionTable:
+    """
+    The source positions of the nodes of a parse, kept in an array
+    instead of on the nodes, which only hold their index 'pos'.
+
+    Every node has the offsets of the start and end of its text in the
+    input; the end is -1 unless the lexer gives the spans of tokens,
+    and both are -1 if the input is not known. The position with index
+    'pos' takes the two entries from 'pos' * 2 on. The line and column
+    of a node are found from its start through the LineIndex 'lines'
+    of the input, only when asked for.
+    """
+
+    def __init__(self, lines=None):
+        """Make an empty table for the input indexed by 'lines'."""
+        self.entries = array('i')
+        self.lines = lines
+
+    def __len__(self):
+        """Return the number of positions recorded."""
+        return len(self.entries) >> 1
+
+    def add(self, start, end=-1):
+        """Record a position. Return its index."""
+        pos = len(self.entries) >> 1
+        self.entries.extend((start, end))
+        return pos
+
+    def extend(self, other, start=0, stop=None):
+        """
+        Append the positions of the table 'other', from index 'start'
+        up to 'stop'. Return the index of the first in this table; the
+        nodes of 'other' are to be renumbered accordingly.
+        """
+        if stop is None:
+            stop = len(other)
+        base = len(self)
+        self.entries.extend(other.entries[start << 1:stop << 1])
+        return base
+
+    def move(self, start, stop, offset):
+        """
+        Move the positions from index 'start' up to 'stop' by 'offset'
+        places in the input.
+        """
+        entries = self.entries
+        for i in range(start << 1, stop << 1):
+            if entries[i] >= 0:
+                entries[i] += offset
+
+    def offset(self, lineno, column):
+        """
+        Return the offset in the input of the 1-based 'lineno' and
+        'column', or -1 if the input is not known.
+        """
+        if self.lines is None or lineno > len(self.lines.starts):
+            return -1
+        return self.lines.starts[lineno - 1] + column - 1
+
+    def position(self, node):
+        """
+        Return the line and column where 'node' starts, or None if its
+        position is not recorded.
+        """
+        pos = node.pos
+        if pos is None or self.lines is None:
+            return None
+        start = self.entries[pos << 1]
+        if start < 0:
+            return None
+        return self.lines.position(start)
+
+    def span(self, node):
+        """
+        Return the offsets of the start and end of the text of 'node'
+        in the input, or None if they are not recorded.
+        """
+        pos = node.pos
+        if pos is None:
+            return None
+        start, end = self.entries[pos << 1], self.entries[(pos << 1) + 1]
+        if start < 0 or end < 0:
+            return None
+        return start, end
+
+
+def renumber(node, delta):
+    """
+    Add 'delta' to the position index of the AST 'node' and of all its
+    descendants, after their positions move to another PositionTable.
+    """
+    if isinstance(node, list):
+        for item in node:
+            renumber(item, delta)
+    elif isinstance(node, Node):
+        if node.pos is not None:
+            node.pos += delta
+        for value in node.attributes().values():
+            renumber(value, delta)
+
+
 # == INTERFACES OF AST NODES ==
 
 
 class Node:
-    lineno = None
-    lexpos = None
+    # Nodes keep their attributes in slots, declared by every class
+    # for the attributes its constructor sets, instead of in a dict.
+    # 'pos' is the index of the position of the node in the
+    # PositionTable of its parse, or None.
+    __slots__ = ('pos',)
+
+    def __new__(cls, *args, **kwargs):
+        node = super().__new__(cls)
+        node.pos = None
+        return node
 
     def __init__(self):
         raise NotImplementedError
 
+    def attributes(self):
+        """
+        Return a dict of the attributes of the node, by name, as vars()
+        would without slots, save for its position.
+        """
+        return {
+            attr: getattr(self, attr)
+            for cls in type(self).__mro__
+            for attr in getattr(cls, '__slots__', ())
+            if attr != 'pos' and hasattr(self, attr)
+        }
+
     def __eq__(self, other):
         """
         Two nodes are equal if they are of the same type
         and have all attributes equal. Override as needed.
         """
-        return type(self) == type(other) and all(
-            getattr(self, attr) == getattr(other, attr)
-            for attr in self.__dict__.keys()
-            if attr not in ('lineno', 'lexpos')
-        )
+        if type(self) != type(other):
+            return False
+        attrs, others = self.attributes(), other.attributes()
+        attrs.pop('positions', None)
+        others.pop('positions', None)
+        return attrs == others
 
     def copy_pos(self, node):
-        """Copy line info from another AST node."""
-        self.lineno = node.lineno
-        self.lexpos = node.lexpos
+        """Copy the position of another AST node."""
+        self.pos = node.pos
 
     def __repr__(self):
-        attrs = [attr for attr in dir(self) if attr[0] != '_']
+        attrs = [
+            attr for attr in dir(self)
+            if attr[0] != '_' and hasattr(self, attr)
+        ]
         values = [getattr(self, attr) for attr in attrs]
         safe_values = []
         for value in values:
@@ -59,17 +188,18 @@ class Node:
 
 class DataNode(Node):
     """A node to which a definite type can and should be assigned."""
+    __slots__ = ()
     type = None
 
 
 class Expression(DataNode):
     """An expression that can be evaluated."""
-    pass
+    __slots__ = ()
 
 
 class Def(Node):
     """Definition of a new name."""
-    pass
+    __slots__ = ()
 
 
 class NameNode(Node):
@@ -78,18 +208,25 @@ class NameNode(Node):
     scope-aware disambiguation or checking.
     Provides basic hashing functionality.
     """
+    __slots__ = ()
     name = None
 
     def __hash__(self):
         """Simple hash. Override as needed."""
         return hash(self.name)
 
+    @property
+    def ident(self):
+        """Return the integer id of the name, if interned, or None."""
+        return getattr(self.name, 'ident', None)
+
 
 class ListNode(Node):
     """
     A node carrying a list of ast nodes.
     Supports iterating through the nodes list.
     """
+    __slots__ = ()
     list = None
 
     def __iter__(self):
@@ -98,11 +235,13 @@ class ListNode(Node):
 
 class Type(Node):
     """A node representing a type."""
-    pass
+    __slots__ = ()
 
 
 class Builtin(Type, NameNode):
     """One of the builtin types."""
+    __slots__ = ('name',)
+
     def __init__(self):
         self.name = self.__class__.__name__.lower()
 
@@ -110,17 +249,23 @@ class Builtin(Type, NameNode):
 
 
 class Program(ListNode):
+    __slots__ = ('list', 'positions')
+
     def __init__(self, list):
         self.list = list
 
 
 class LetDef(ListNode):
+    __slots__ = ('list', 'isRec')
+
     def __init__(self, list, isRec=False):
         self.list = list
         self.isRec = isRec
 
 
 class FunctionDef(Def, NameNode):
+    __slots__ = ('name', 'params', 'body', 'type')
+
     def __init__(self, name, params, body, type=None):
         self.name = name
         self.params = params
@@ -129,12 +274,16 @@ class FunctionDef(Def, NameNode):
 
 
 class Param(DataNode, NameNode):
+    __slots__ = ('name', 'type')
+
     def __init__(self, name, type=None):
         self.name = name
         self.type = type
 
 
 class BinaryExpression(Expression):
+    __slots__ = ('leftOperand', 'operator', 'rightOperand')
+
     def __init__(self, leftOperand, operator, rightOperand):
         self.leftOperand = leftOperand
         self.operator = operator
@@ -142,51 +291,77 @@ class BinaryExpression(Expression):
 
 
 class UnaryExpression(Expression):
+    __slots__ = ('operator', 'operand')
+
     def __init__(self, operator, operand):
         self.operator = operator
         self.operand = operand
 
 
 class ConstructorCallExpression(Expression, ListNode, NameNode):
+    __slots__ = ('name', 'list')
+
     def __init__(self, name, list):
         self.name = name
         self.list = list
 
 
 class ArrayExpression(Expression, ListNode, NameNode):
+    __slots__ = ('name', 'list')
+
     def __init__(self, name, list):
         self.name = name
         self.list = list
 
 
 class ConstExpression(Expression):
+    __slots__ = ('type', 'value')
+
     def __init__(self, type, value=None):
         self.type = type
         self.value = value
 
 
 class ConidExpression(Expression, NameNode):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
 
 class GenidExpression(Expression, NameNode):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
 
 class DeleteExpression(Expression):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
 
+class ErrorExpression(Expression):
+    """An expression skipped while recovering from a syntax error."""
+    __slots__ = ()
+
+    def __init__(self):
+        pass
+
+
 class DimExpression(Expression, NameNode):
+    __slots__ = ('name', 'dimension')
+
     def __init__(self, name, dimension=1):
         self.name = name
         self.dimension = dimension
 
 
 class ForExpression(Expression):
+    __slots__ = ('counter', 'startExpr', 'stopExpr', 'body', 'isDown')
+
     def __init__(self, counter, startExpr, stopExpr, body, isDown=False):
         self.counter = counter
         self.startExpr = startExpr
@@ -196,18 +371,24 @@ class ForExpression(Expression):
 
 
 class FunctionCallExpression(Expression, ListNode, NameNode):
+    __slots__ = ('name', 'list')
+
     def __init__(self, name, list):
         self.name = name
         self.list = list
 
 
 class LetInExpression(Expression):
+    __slots__ = ('letdef', 'expr')
+
     def __init__(self, letdef, expr):
         self.letdef = letdef
         self.expr = expr
 
 
 class IfExpression(Expression):
+    __slots__ = ('condition', 'thenExpr', 'elseExpr')
+
     def __init__(self, condition, thenExpr, elseExpr=None):
         self.condition = condition
         self.thenExpr = thenExpr
@@ -215,46 +396,62 @@ class IfExpression(Expression):
 
 
 class MatchExpression(Expression, ListNode):
+    __slots__ = ('expr', 'list')
+
     def __init__(self, expr, list):
         self.expr = expr
         self.list = list
 
 
 class Clause(Node):
+    __slots__ = ('pattern', 'expr')
+
     def __init__(self, pattern, expr):
         self.pattern = pattern
         self.expr = expr
 
 
 class Pattern(ListNode, NameNode):
+    __slots__ = ('name', 'list')
+
     def __init__(self, name, list=None):
         self.name = name
         self.list = list or []
 
 
 class GenidPattern(NameNode):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
 
 class NewExpression(Expression):
+    __slots__ = ('type',)
+
     def __init__(self, type):
         self.type = type
 
 
 class WhileExpression(Expression):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
 
 class VariableDef(Def, NameNode):
+    __slots__ = ('name', 'type')
+
     def __init__(self, name, type=None):
         self.name = name
         self.type = type
 
 
 class ArrayVariableDef(VariableDef, NameNode):
+    __slots__ = ('dimensions',)
+
     def __init__(self, name, dimensions, type=None):
         self.name = name
         self.dimensions = dimensions
@@ -262,12 +459,16 @@ class ArrayVariableDef(VariableDef, NameNode):
 
 
 class TDef(ListNode):
+    __slots__ = ('type', 'list')
+
     def __init__(self, type, list):
         self.type = type
         self.list = list
 
 
 class Constructor(NameNode, ListNode):
+    __slots__ = ('name', 'list')
+
     def __init__(self, name, list=None):
         self.name = name
         self.list = list or []
@@ -276,23 +477,23 @@ class Constructor(NameNode, ListNode):
 
 
 class Bool(Builtin):
-    pass
+    __slots__ = ()
 
 
 class Char(Builtin):
-    pass
+    __slots__ = ()
 
 
 class Float(Builtin):
-    pass
+    __slots__ = ()
 
 
 class Int(Builtin):
-    pass
+    __slots__ = ()
 
 
 class Unit(Builtin):
-    pass
+    __slots__ = ()
 
 
 builtin_types_map = {
@@ -306,17 +507,22 @@ builtin_types_map = {
 
 class User(Type, NameNode):
     """A user-defined type."""
+    __slots__ = ('name',)
 
     def __init__(self, name):
         self.name = name
 
 
 class Ref(Type):
+    __slots__ = ('type',)
+
     def __init__(self, type):
         self.type = type
 
 
 class Array(Type):
+    __slots__ = ('type', 'dimensions')
+
     def __init__(self, type, dimensions=1):
         self.type = type
         self.dimensions = dimensions
@@ -328,6 +534,8 @@ def String():
 
 
 class Function(Type):
+    __slots__ = ('fromType', 'toType')
+
     def __init__(self, fromType, toType):
         self.fromType = fromType
         self.toType = toType
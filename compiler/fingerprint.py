@@ -0,0 +1,117 @@
+"""
+# ----------------------------------------------------------------------
+# fingerprint.py
+#
+# Semantic fingerprints of Llama token streams
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+#
+# A fingerprint digests the kinds and values of the tokens alone, so
+# that it survives changes to blanks, comments, positions and the
+# spelling of literals (e.g. 1.50 for 1.5), and can key caches of
+# compilation results.
+# ----------------------------------------------------------------------
+"""
+
+import collections
+import hashlib
+
+# Digests of a whole token stream and of each top-level definition in it,
+# as hexadecimal strings
+Fingerprint = collections.namedtuple('Fingerprint', ['digest', 'definitions'])
+
+# Token types bearing on the bounds of top-level definitions
+_segment_types = frozenset(('LET', 'TYPE', 'IN'))
+
+
+def _hasher():
+    """Return a new hash object for fingerprints."""
+    return hashlib.blake2b(digest_size=16)
+
+
+class Fingerprinter:
+    """
+    Fingerprint a token stream incrementally, as it is lexed.
+
+    Top-level definitions start with 'let' or 'type', but so do 'let'
+    expressions, which differ in being closed by an 'in'. The stream is
+    thus digested in segments, each starting at a 'let' or 'type'; a
+    'let' segment whose 'in' arrives is merged into the segment before
+    it, once the stream ends. Only a digest per segment is kept.
+    """
+
+    def __init__(self):
+        """Make a fingerprinter for an empty token stream."""
+        self._whole = _hasher()
+
+        # Encoded tokens of the current segment
+        self._parts = []
+
+        # Digest of every closed segment
+        self._digests = []
+
+        # Whether each segment, the current one included, starts a
+        # top-level definition. Tokens before any 'let' or 'type' are
+        # taken as a definition of their own.
+        self._starts = [True]
+
+        # Indices of segments starting with a 'let' awaiting its 'in'
+        self._open = []
+
+    def update(self, tok):
+        """Add a token to the stream."""
+        toktype = tok.type
+        if toktype in _segment_types:
+            self._segment(toktype)
+        self._parts.append('%s %r\n' % (toktype, tok.value))
+
+    def _segment(self, toktype):
+        """Track a token of type 'toktype' which may end a segment."""
+        if toktype == 'IN':
+            if self._open:
+                self._starts[self._open.pop()] = False
+            return
+        if self._parts:
+            self._close()
+            self._starts.append(True)
+        if toktype == 'LET':
+            self._open.append(len(self._starts) - 1)
+        else:
+            # Every pending 'let' starts a top-level definition.
+            self._open.clear()
+
+    def _close(self):
+        """Digest the current segment."""
+        data = ''.join(self._parts).encode('utf-8')
+        self._parts.clear()
+        self._whole.update(data)
+        hasher = _hasher()
+        hasher.update(data)
+        self._digests.append(hasher.digest())
+
+    def finish(self):
+        """
+        End the stream. Return its Fingerprint, listing the digests of
+        its top-level definitions in order.
+        """
+        if self._parts:
+            self._close()
+        definitions = []
+        hasher = None
+        for digest, starts in zip(self._digests, self._starts):
+            if starts:
+                if hasher is not None:
+                    definitions.append(hasher.hexdigest())
+                hasher = _hasher()
+            hasher.update(digest)
+        if hasher is not None:
+            definitions.append(hasher.hexdigest())
+        return Fingerprint(self._whole.hexdigest(), definitions)
+
+
+def fingerprint(tokens):
+    """Return the Fingerprint of an iterable of tokens."""
+    fingerprinter = Fingerprinter()
+    update = fingerprinter.update
+    for tok in tokens:
+        update(tok)
+    return fingerprinter.finish()
@@ -0,0 +1,55 @@
+"""
+# ----------------------------------------------------------------------
+# ident.py
+#
+# Interning of Llama identifiers
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+# ----------------------------------------------------------------------
+"""
+
+
+class Identifier(str):
+    """
+    An interned identifier. Compares and hashes as the plain name,
+    and carries the dense integer id given to it by its table.
+    """
+
+    # Index of the identifier in its IdentifierTable
+    ident = -1
+
+
+class IdentifierTable:
+    """
+    The distinct identifiers of a compilation.
+
+    Every name is stored once and numbered densely from 0 in order of
+    first appearance, so that all occurrences of a name share a single
+    string and later stages may index arrays by id instead of hashing.
+    """
+
+    def __init__(self):
+        """Make a new empty table."""
+        # Identifiers in order of their ids
+        self.names = []
+
+        # Map from each name to its identifier
+        self.ids = {}
+
+    def intern(self, name):
+        """Return the identifier of 'name', adding it if absent."""
+        identifier = self.ids.get(name)
+        if identifier is None:
+            identifier = Identifier(name)
+            identifier.ident = len(self.names)
+            self.names.append(identifier)
+            self.ids[identifier] = identifier
+        return identifier
+
+    def __getitem__(self, ident):
+        return self.names[ident]
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __len__(self):
+        return len(self.names)
@@ -13,11 +13,18 @@
 # ----------------------------------------------------------------------
 """
 
+import bisect
+import concurrent.futures
+import itertools
+import os
 import re
+import threading
+import time
 
 from ply import lex
 
-from compiler import error
+from compiler import error, fingerprint, ident, lexprofile, lineindex, literal
+from compiler import tabcache, tokenbuffer
 
 # Represent reserved words as a frozenset for fast lookup
 reserved_words = frozenset('''
@@ -173,6 +180,176 @@ tokens = sum(
 )
 
 
+# Codes of the lexer states at the start of a line, other than comment.
+# Inside a comment, the code is the nesting level, which is positive.
+_line_state_codes = {'INITIAL': 0, 'char': -1, 'string': -2}
+_line_state_names = {code: state for state, code in _line_state_codes.items()}
+
+
+def _line_state(state, level):
+    """Encode a lexer state and comment nesting level as an integer."""
+    if state == 'comment':
+        return level
+    return _line_state_codes[state]
+
+
+def _line_state_decode(code):
+    """Return the lexer state and comment nesting level of a code."""
+    if code > 0:
+        return 'comment', code
+    return _line_state_names[code], 0
+
+
+class _TooManyErrors(Exception):
+    """Raised by a lexer once it reports its maximum number of errors."""
+    pass
+
+
+def _illegal_run_end(data, pos, limit):
+    """
+    Return the end of the run of illegal characters in INITIAL state
+    starting with the illegal character at 'pos' and ending by 'limit'.
+    """
+    if isinstance(data, str):
+        match = _fast_tables['INITIAL'][0].match
+        skip = _illegal_regex.match
+    else:
+        match = _fast_byte_tables['INITIAL'][0].match
+        skip = _illegal_byte_regex.match
+    end = pos + 1
+    while end < limit:
+        found = skip(data, end, limit)
+        if found is not None:
+            end = found.end()
+            continue
+        found = match(data, end)
+        if found is None or found.lastindex != _error_group:
+            break
+        if found.start(_error_group) != end:
+            # Blanks are not illegal.
+            break
+        end += 1
+    return end
+
+
+def _illegal_diagnostic(lineno, column, run, state):
+    """Return the format and arguments reporting a run of illegal chars."""
+    state_msg = (" while inside %s" % state) if state != 'INITIAL' else ""
+    if len(run) == 1:
+        return (
+            "%d:%d: error: Illegal character '%s'%s.",
+            lineno,
+            column,
+            run,
+            state_msg
+        )
+    return (
+        "%d:%d-%d: error: %d illegal characters, starting with '%s'%s.",
+        lineno,
+        column,
+        column + len(run) - 1,
+        len(run),
+        run[0],
+        state_msg
+    )
+
+
+# PLY lexers built so far, keyed by their build options. They are
+# bound to a dummy wrapper object and only serve as cloning prototypes.
+_ply_lexers = {}
+_ply_lexers_lock = threading.Lock()
+
+
+def _build_ply_lexer(cache_dir, optimize=False, **kwargs):
+    """
+    Build a PLY lexer from the rules of _LexerFactory. If 'optimize' is
+    enabled, load its tables from the table cache in 'cache_dir', or
+    store them there if they are absent.
+    """
+    module = _LexerFactory(None)
+    if not optimize:
+        return lex.lex(module=module, **kwargs)
+
+    cache = tabcache.TableCache(cache_dir)
+    key = tabcache.digest(
+        module, 't_', sorted(module.tokens), module.states,
+        kwargs.get('reflags'), lex.__tabversion__
+    )
+    path = cache.path('lextab', key, '.py')
+    tables = cache.load_module(path)
+    if tables is not None:
+        return lex.lex(module=module, optimize=True, lextab=tables, **kwargs)
+
+    temporary = cache.temporary(path)
+    if temporary is None:
+        return lex.lex(module=module, **kwargs)
+    prototype = lex.lex(
+        module=module,
+        optimize=True,
+        lextab=os.path.splitext(os.path.basename(temporary))[0],
+        outputdir=cache.directory,
+        **kwargs
+    )
+    cache.publish(temporary, path)
+    return prototype
+
+
+class _ProfiledRegex:
+    """
+    A master regex of a PLY lexer, recording the rule of every match
+    in a LexerProfile.
+    """
+
+    def __init__(self, regex, state, profile):
+        """Wrap 'regex', used in lexer state 'state'."""
+        self.regex = regex
+        self.state = state
+        self.profile = profile
+        # PLY names the group of each rule after the rule.
+        self.names = {index: name for name, index in regex.groupindex.items()}
+
+    def match(self, data, pos):
+        """Match at 'pos' like the wrapped regex, recording the match."""
+        start = time.perf_counter()
+        found = self.regex.match(data, pos)
+        if found is not None:
+            self.profile.record(
+                self.state,
+                self.names[found.lastindex],
+                found.end() - found.start(),
+                start
+            )
+        return found
+
+
+def _profiled_error(func, state, profile):
+    """Wrap the error rule 'func' of 'state' to record its calls."""
+    def error_rule(tok):
+        start = time.perf_counter()
+        lexer = tok.lexer
+        pos = lexer.lexpos
+        result = func(tok)
+        profile.record(state, 't_ANY_error', lexer.lexpos - pos, start)
+        return result
+    return error_rule
+
+
+def _profile_ply_lexer(lexer, profile):
+    """Instrument the rules of a cloned PLY lexer to record in 'profile'."""
+    lexer.lexstatere = {
+        state: [
+            (_ProfiledRegex(regex, state, profile), funcs)
+            for regex, funcs in master
+        ]
+        for state, master in lexer.lexstatere.items()
+    }
+    lexer.lexstateerrorf = {
+        state: _profiled_error(func, state, profile)
+        for state, func in lexer.lexstateerrorf.items()
+    }
+    lexer.begin(lexer.lexstate)
+
+
 class _LexerFactory:
     """
     Implementation of a Llama lexer
@@ -203,27 +380,66 @@ class _LexerFactory:
     # Levels of nested comment blocks still open
     level = 0
 
+    # If not None, the encoded state at each new line is appended here.
+    line_states = None
+
     # Logger used for recording events. Possibly shared with other modules.
     logger = None
 
-    def __init__(self, logger, verbose=False):
+    # Table interning identifiers. Possibly shared with other lexers.
+    identifiers = None
+
+    # Pool of string literals. Possibly shared with other lexers.
+    literals = None
+
+    # Number of errors reported for the current input
+    errors = 0
+
+    # If not None, stop lexing after reporting this many errors.
+    max_errors = None
+
+    # True once lexing has stopped due to too many errors
+    gave_up = False
+
+    # If True, every token carries the offsets of its text in 'span'.
+    spans = False
+
+    def __init__(self, logger, verbose=False, identifiers=None,
+                 literals=None, max_errors=None):
         """
         Initialize wrapper object of PLY lexer. To get a working lexer,
         invoke build() on the returned object.
         """
         self.logger = logger
         self.verbose = verbose
+        self.identifiers = identifiers
+        self.literals = literals
+        self.max_errors = max_errors
 
     # == REQUIRED METHODS ==
 
-    def build(self, **kwargs):
+    def build(self, cache_dir=None, **kwargs):
         """
-        Build a lexer out of PLY and attach it to the wrapper object.
+        Attach a lexer derived from PLY to the wrapper object.
+
+        The lexing tables are built by PLY only once per process for
+        each set of build options. Every wrapper object gets its own
+        clone of the built lexer, bound to the object's rules, so
+        that any number of lexers can be live at once.
+        If 'optimize' is enabled, the tables are loaded from the table
+        cache in 'cache_dir', after being stored there if absent.
 
         NOTE: This function should be called once before ANY methods
         or attributes of the wrapper object are accessed.
         """
-        self.lexer = lex.lex(module=self, **kwargs)
+        key = (cache_dir,) + tuple(sorted(kwargs.items()))
+        with _ply_lexers_lock:
+            prototype = _ply_lexers.get(key)
+            if prototype is None:
+                prototype = _build_ply_lexer(cache_dir, **kwargs)
+                _ply_lexers[key] = prototype
+        self.lexer = prototype.clone(self)
+        self.lexer.lexstatestack = []
 
     # A wrapper around the function of the inner lexer
     def token(self):
@@ -231,27 +447,43 @@ class _LexerFactory:
         Return a token to caller. Detect when <EOF> has been reached.
         Signal abnormal cases.
         """
+        if self.gave_up:
+            return None
+        try:
+            return self._token()
+        except _TooManyErrors:
+            self.gave_up = True
+            return None
+
+    def _token(self):
+        """Return the next token, or None at <EOF>."""
         tok = self.lexer.token()
         if tok is None:
             # Check for abnormal EOF
             state = self.lexer.current_state()
             if state == "comment":
-                self.logger.error(
+                self._error(
                     "%d: error: Unclosed comment reaching end of file.",
                     self.lexer.lineno
                 )
             elif state == "string":
-                self.logger.error(
+                self._error(
                     "%d: error: Unclosed string reaching end of file.",
                     self.lexer.lineno
                 )
             elif state == "char":
-                self.logger.error(
+                self._error(
                     "%d: error: Unclosed character literal at end of file.",
                     self.lexer.lineno
                 )
             return None
 
+        if tok.type == 'CONID':
+            tok.value = self.identifiers.intern(tok.value)
+
+        if self.spans:
+            tok.span = (tok.lexpos, self.lexer.lexpos)
+
         # Track the token's column instead of lexing position.
         tok.lexpos -= self.bol
         if self.verbose:
@@ -265,13 +497,34 @@ class _LexerFactory:
         return tok
 
     def input(self, lexdata):
-        """Feed the lexer with input."""
+        """Feed the lexer with input and reset the per-input state."""
+        self.bol = -1
+        self.level = 0
+        self.line_states = None
+        self.errors = 0
+        self.gave_up = False
+        self.lexer.lineno = 1
+        self.lexer.begin('INITIAL')
         self.lexer.input(lexdata)
 
     def skip(self, value=1):
         """Skip 'value' characters in the input string."""
         self.lexer.skip(value)
 
+    def _error(self, fmt, *args):
+        """
+        Report an error, leading with its line. Stop lexing once
+        the maximum number of errors has been reported.
+        """
+        self.logger.error(fmt, *args)
+        self.errors += 1
+        if self.errors == self.max_errors:
+            self.logger.error(
+                "%d: error: Too many lexical errors; giving up.",
+                args[0]
+            )
+            raise _TooManyErrors
+
     # == LEXING OF NON-TOKENS ==
 
     # Ignored characters
@@ -284,6 +537,9 @@ class _LexerFactory:
         r'\n+'
         self.lexer.lineno += len(tok.value)
         self.bol = self.lexer.lexpos - 1
+        if self.line_states is not None:
+            state = _line_state(self.lexer.current_state(), self.level)
+            self.line_states.extend([state] * len(tok.value))
 
     # Single-line comments. Do not consume the newline.
     def t_SCOMMENT(self, _):
@@ -305,11 +561,10 @@ class _LexerFactory:
             self.level = 0
             self.lexer.begin('INITIAL')
 
-    # Ignore (almost) anything inside a block comment
-    # but stop matching when '(', '*' or a newline appears.
-    # Match each comment-initiating character seperately.
+    # Ignore (almost) anything inside a block comment, in runs that
+    # stop at a newline or at a '(*' or '*)' opening or closing one.
     def t_comment_SPECIAL(self, _):
-        r'[(*]|[^\n(*]+'
+        r'(?:[^\n(*]|\((?!\*)|\*(?!\)))+'
         pass
 
     # == LEXING OF TOKENS CARRYING NO VALUE ==
@@ -370,6 +625,8 @@ class _LexerFactory:
     def t_GENID(self, tok):
         r'[a-z][A-Za-z0-9_]*'
         tok.type = reserved_tokens.get(tok.value, tok.type)
+        if tok.type == 'GENID':
+            tok.value = self.identifiers.intern(tok.value)
 
         booleans = {
             'TRUE': True,
@@ -385,7 +642,7 @@ class _LexerFactory:
         try:
             tok.value = float(tok.value)
         except OverflowError:
-            self.logger.error(
+            self._error(
                 "%d:%d: error: Floating-point constant is irrepresentable.",
                 tok.lineno,
                 tok.lexpos - self.bol
@@ -409,7 +666,13 @@ class _LexerFactory:
 
     char_content = r"(%s|%s)" % (normal_char_content, escape_char_content)
     proper_char = r"'%s'" % char_content
-    proper_string = r'"%s*"' % char_content
+
+    # Strings are matched as runs of plain characters separated by
+    # escapes, so each prefix matches in only one way and a long
+    # unterminated string fails in linear time.
+    string_run = r'[\x20\x21\x23-\x26\x28-\x5b\x5d-\x7e]*'
+    string_escape = r'(?:\\[ntr0\'"\\]|\\x[a-fA-F0-9]{2})'
+    proper_string = r'"%s(?:%s%s)*"' % (string_run, string_escape, string_run)
 
     # Proper or empty char literal.
     @lex.TOKEN('(' + proper_char + ')|(' + empty_char + ')')
@@ -418,7 +681,7 @@ class _LexerFactory:
         if tok.value:
             tok.value = unescape(tok.value)[0]
         else:  # Illegal empty char
-            self.logger.error(
+            self._error(
                 "%d:%d: error: Empty character literal not allowed.",
                 tok.lineno,
                 tok.lexpos - self.bol
@@ -429,7 +692,7 @@ class _LexerFactory:
     # Malformed char literal ahead; enter 'char' state for recovery.
     def t_INITIAL_LCHAR(self, tok):
         r"'"
-        self.logger.error(
+        self._error(
             "%d:%d: error: Bad character literal.",
             tok.lineno,
             tok.lexpos - self.bol
@@ -452,14 +715,14 @@ class _LexerFactory:
     # Proper string literal
     @lex.TOKEN(proper_string)
     def t_INITIAL_SCONST(self, tok):
-        tok.value = explode(tok.value[1:-1])
+        tok.value = self.literals.intern(tok.value[1:-1])
         # NOTE: Empty string is valid and is just the null byte.
         return tok
 
     # Malformed string literal ahead; enter 'string' state for recovery.
     def t_INITIAL_LSTRING(self, tok):
         r'"'
-        self.logger.error(
+        self._error(
             "%d:%d: error: Bad string literal.",
             tok.lineno,
             tok.lexpos - self.bol
@@ -475,25 +738,753 @@ class _LexerFactory:
     def t_string_RSTRING(self, tok):
         r'"'
         tok.type = 'SCONST'
-        tok.value = explode('')
+        tok.value = self.literals.intern('')
         self.lexer.begin('INITIAL')
         return tok
 
     # Catch-all error reporting and panic recovery.
+    # A whole run of illegal characters is reported and skipped at once.
     def t_ANY_error(self, tok):
-        state = self.lexer.current_state()
-        state_msg = (" while inside %s" % state) if state != 'INITIAL' else ""
-        self.logger.error(
-            "%d:%d: error: Illegal character '%s'%s.",
+        lexdata = self.lexer.lexdata
+        lexpos = self.lexer.lexpos
+        run = lexdata[lexpos:_illegal_run_end(lexdata, lexpos, len(lexdata))]
+        self._error(*_illegal_diagnostic(
             tok.lineno,
             tok.lexpos - self.bol,
-            tok.value[0],
-            state_msg
-        )
-        self.lexer.skip(1)
+            run,
+            self.lexer.current_state()
+        ))
+        self.lexer.skip(len(run))
         self.lexer.begin('INITIAL')
 
 
+# Values of the tokens whose value is implied by their type [exported]
+implicit_values = {toktype: value for value, toktype in operators.items()}
+implicit_values.update(
+    (toktype, value) for value, toktype in delimiters.items()
+)
+implicit_values.update(
+    (toktype, value) for value, toktype in reserved_tokens.items()
+)
+implicit_values.update(TRUE=True, FALSE=False)
+
+
+# == FAST LEXING ENGINE ==
+
+# Actions performed by the fast engine after a successful match.
+# Every alternative of a master regex maps to exactly one action.
+(
+    _ERROR,
+    _IGNORE,
+    _NEWLINE,
+    _WORD,
+    _ICONST,
+    _FCONST,
+    _CCONST,
+    _SCONST,
+    _LCOMMENT,
+    _RCOMMENT,
+    _LCHAR,
+    _RCHAR,
+    _LSTRING,
+    _RSTRING
+) = range(14)
+
+_boolean_values = {
+    'TRUE': True,
+    'FALSE': False
+}
+
+# Token type of every operator and delimiter, keyed by its text.
+_operator_types = dict(operators)
+_operator_types.update(delimiters)
+
+# Token type and value of every keyword and operator, keyed by its text
+_reserved_values = {
+    word: (toktype, _boolean_values.get(toktype, word))
+    for word, toktype in reserved_tokens.items()
+}
+_operator_values = {
+    text: (toktype, text) for text, toktype in _operator_types.items()
+}
+
+# The same, keyed by the bytes of the text, for lexing bytes-like input
+_reserved_byte_values = {
+    word.encode('ascii'): pair for word, pair in _reserved_values.items()
+}
+_operator_byte_values = {
+    text.encode('ascii'): pair for text, pair in _operator_values.items()
+}
+
+
+def _decode_ascii(raw):
+    """Return the text of the ASCII bytes 'raw'."""
+    return raw.decode('ascii')
+
+
+def _rule_regex(rule):
+    """Return the regex of a _LexerFactory rule, as PLY would see it."""
+    return getattr(rule, 'regex', rule.__doc__)
+
+
+def _literals_regex(literals):
+    """
+    Return a regex matching the longest of the given literals,
+    factored by common prefix so that at most one branch is tried
+    per input character.
+    """
+    suffixes = {}
+    for text in literals:
+        suffixes.setdefault(text[0], []).append(text[1:])
+
+    branches = []
+    for head, tails in sorted(suffixes.items()):
+        rests = [tail for tail in tails if tail]
+        if not rests:
+            branches.append(re.escape(head))
+        else:
+            branches.append(
+                '%s(?:%s)%s' % (
+                    re.escape(head),
+                    _literals_regex(rests),
+                    '?' if len(rests) < len(tails) else ''
+                )
+            )
+    return '|'.join(branches)
+
+
+def _compile_rules(rules, blank='', binary=False):
+    """
+    Compile a sequence of (action, token type, regex, rule name) tuples
+    into a single master regex, optionally preceded by a 'blank' regex.
+    Return the regex along with three tables mapping the index of each
+    top-level group to its action, its token type and the name of its
+    rule in _LexerFactory respectively.
+    If 'binary' is True, the regex matches bytes instead of text.
+    """
+    parts = []
+    actions = [None]
+    types = [None]
+    names = [None]
+    for action, toktype, regex, name in rules:
+        parts.append('(%s)' % regex)
+        padding = [None] * re.compile(regex, re.ASCII).groups
+        actions.append(action)
+        actions.extend(padding)
+        types.append(toktype)
+        types.extend(padding)
+        names.append(name)
+        names.extend(padding)
+    master = '%s(?:%s)' % (blank, '|'.join(parts))
+    if binary:
+        master = master.encode('ascii')
+    return (
+        re.compile(master, re.ASCII),
+        tuple(actions),
+        tuple(types),
+        tuple(names)
+    )
+
+
+def _build_fast_tables(track_lines, binary=False, count_lines=False):
+    """
+    Build the master regex and group table for every lexer state.
+    If 'track_lines' is False, newlines are ignored like blanks.
+    If 'count_lines' is True, newlines are skipped like blanks before
+    a match in INITIAL state all the same, for the caller to count.
+    If 'binary' is True, the regexes match bytes instead of text.
+
+    Rules are taken from _LexerFactory and tried in an order which
+    yields the same match as PLY: a rule precedes every other rule
+    that could match a prefix of its lexemes. Operators are merged
+    into a single longest-match alternative.
+
+    In INITIAL state, ignored characters are skipped as part of the
+    next match and any character no rule can match is caught by an
+    error rule. Ignored characters trailing at the end of the input
+    are matched by an empty alternative; without it the master regex
+    would fail after every one of them in turn, in quadratic time.
+    Every other state is matched exhaustively by its rules. Operators
+    and the end of the input are the only alternatives without a
+    single rule name.
+    """
+    factory = _LexerFactory
+
+    def rule(action, toktype, name):
+        """Return the alternative for the _LexerFactory rule 'name'."""
+        return action, toktype, _rule_regex(getattr(factory, name)), name
+
+    ignore = re.escape(factory.t_INITIAL_comment_ignore)
+    newline = rule(_NEWLINE if track_lines else _IGNORE, None, 't_ANY_newline')
+    if track_lines and not count_lines:
+        blank = '[%s]*' % ignore
+    else:
+        blank = '[%s]*' % (ignore + '\\n')
+    lcomment = rule(_LCOMMENT, None, 't_INITIAL_comment_LCOMMENT')
+
+    initial = (
+        newline,
+        rule(_WORD, 'GENID', 't_GENID'),
+        rule(_IGNORE, None, 't_SCOMMENT'),
+        lcomment,
+        (_WORD, None, _literals_regex(_operator_types), None),
+        (_WORD, 'CONID', factory.t_CONID, 't_CONID'),
+        rule(_FCONST, 'FCONST', 't_FCONST'),
+        rule(_ICONST, 'ICONST', 't_ICONST'),
+        rule(_CCONST, 'CCONST', 't_INITIAL_CCONST'),
+        rule(_LCHAR, None, 't_INITIAL_LCHAR'),
+        rule(_SCONST, 'SCONST', 't_INITIAL_SCONST'),
+        rule(_LSTRING, None, 't_INITIAL_LSTRING'),
+        (_ERROR, None, '[^%s\\n]' % ignore, 't_ANY_error'),
+        (_IGNORE, None, '\\Z', None)
+    )
+
+    comment = (
+        rule(_IGNORE, None, 't_comment_SPECIAL'),
+        newline,
+        lcomment,
+        rule(_RCOMMENT, None, 't_comment_RCOMMENT')
+    )
+
+    char = (
+        newline,
+        rule(_IGNORE, None, 't_char_CCONST'),
+        rule(_RCHAR, 'CCONST', 't_char_RCHAR')
+    )
+
+    string = (
+        newline,
+        rule(_IGNORE, None, 't_string_SCONST'),
+        rule(_RSTRING, 'SCONST', 't_string_RSTRING')
+    )
+
+    return {
+        'INITIAL': _compile_rules(initial, blank=blank, binary=binary),
+        'comment': _compile_rules(comment, binary=binary),
+        'char': _compile_rules(char, binary=binary),
+        'string': _compile_rules(string, binary=binary)
+    }
+
+
+# Master regexes are compiled once per process and shared by all engines.
+_fast_tables = _build_fast_tables(track_lines=True, count_lines=True)
+_fast_line_tables = _build_fast_tables(track_lines=True)
+_fast_offset_tables = _build_fast_tables(track_lines=False)
+_fast_byte_tables = _build_fast_tables(track_lines=True, binary=True)
+_fast_byte_offset_tables = _build_fast_tables(track_lines=False, binary=True)
+
+# Group of the INITIAL master regex catching illegal characters
+_error_group = _fast_tables['INITIAL'][1].index(_ERROR)
+
+# Runs of characters that cannot start any token in INITIAL state
+_illegal_regex = re.compile('[^%s]+' % re.escape(''.join(sorted(set(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+    '\'" \r\t\n'
+).union(operator[0] for operator in _operator_types)))))
+_illegal_byte_regex = re.compile(_illegal_regex.pattern.encode('ascii'))
+
+
+def _profiled_matches(profile, state, matches, names, operators):
+    """
+    Generate the matches of a master regex of the fast engine in 'state'
+    from the iterator 'matches', recording the rule of each in 'profile'.
+    Operators are recorded under the rule of their token type.
+    """
+    perf_counter = time.perf_counter
+    record = profile.record
+    while True:
+        start = perf_counter()
+        found = next(matches, None)
+        if found is None:
+            return
+        idx = found.lastindex
+        name = names[idx]
+        if name is None:
+            operator = operators.get(found[idx])
+            if operator is None:
+                # Blanks up to the end of the input, ignored by PLY
+                yield found
+                continue
+            name = 't_' + operator[0]
+        begin, end = found.span(idx)
+        record(state, name, end - begin, start)
+        yield found
+
+
+class _FastLexer:
+    """
+    Single-pass implementation of the Llama lexer.
+
+    Produces exactly the same tokens and diagnostics as _LexerFactory,
+    but matches each token with one master regex per lexer state and
+    performs keyword lookup, literal decoding and comment nesting
+    inline instead of dispatching through PLY.
+
+    Input is either a string or a text stream. A stream is read lazily
+    into a sliding window holding at least one complete line ahead of
+    the current position.
+
+    Exposes the subset of the PLY lexer interface used by Lexer, so
+    that it serves as its own raw lexer.
+
+    Given a line index, tokens carry their absolute offset in 'lexpos'
+    and no line; newlines are then skipped like any blank, and lines
+    and columns are only resolved for diagnostics.
+    """
+
+    # Input string, or the current window of an input stream
+    lexdata = ''
+
+    # Absolute position of the next character to be lexed
+    lexpos = 0
+
+    # Current line of input
+    lineno = 1
+
+    # File position of the most recent beginning of line
+    bol = -1
+
+    # Levels of nested comment blocks still open
+    level = 0
+
+    # If not None, the encoded state at each new line is appended here.
+    line_states = None
+
+    # Line index of the input, if positions are resolved lazily
+    lines = None
+
+    # If 'verbose' is True, each token will be stored as a DEBUG event.
+    verbose = False
+
+    # Logger used for recording events. Possibly shared with other modules.
+    logger = None
+
+    # Table interning identifiers. Possibly shared with other lexers.
+    identifiers = None
+
+    # Pool of string literals. Possibly shared with other lexers.
+    literals = None
+
+    # Number of errors reported for the current input
+    errors = 0
+
+    # If not None, stop lexing after reporting this many errors.
+    max_errors = None
+
+    # True once lexing has stopped due to too many errors
+    gave_up = False
+
+    # If not None, the LexerProfile recording every match
+    profile = None
+
+    # If True, every token carries the offsets of its text in 'span'.
+    spans = False
+
+    def __init__(self, logger, verbose=False, identifiers=None,
+                 literals=None, max_errors=None):
+        """Initialize a fast lexer. No tables need to be built."""
+        self.logger = logger
+        self.verbose = verbose
+        self.identifiers = identifiers
+        self.literals = literals
+        self.max_errors = max_errors
+        self.lexer = self
+        self._state = 'INITIAL'
+        # Token type and value of every keyword, operator and name met
+        # so far, keyed by its text and by its bytes respectively
+        self._words = dict(_reserved_values)
+        self._words.update(_operator_values)
+        self._byte_words = dict(_reserved_byte_values)
+        self._byte_words.update(_operator_byte_values)
+        self._tokens = None
+        self._stream = None
+        self._chunk_size = 0
+
+    # == PLY LEXER INTERFACE ==
+
+    def begin(self, state):
+        """Switch to lexer state 'state'."""
+        self._state = state
+
+    def current_state(self):
+        """Return the current lexer state."""
+        return self._state
+
+    def input(self, lexdata):
+        """Feed the lexer with input and reset the per-input state."""
+        self._reset(lexdata, None, 0)
+
+    def input_stream(self, stream, chunk_size):
+        """
+        Feed the lexer with a text stream, to be read in chunks of
+        'chunk_size' characters, and reset the per-input state.
+        """
+        self._reset('', stream, chunk_size)
+
+    def skip(self, value=1):
+        """Skip 'value' characters in the input string."""
+        self.lexpos += value
+
+    def token(self):
+        """
+        Return a token to caller. Detect when <EOF> has been reached.
+        Signal abnormal cases.
+        """
+        tok = next(self._tokens)
+        if tok is not None and self.verbose:
+            if self.lines is None:
+                lineno, column = tok.lineno, tok.lexpos
+            else:
+                lineno, column = self.lines.position(tok.lexpos)
+            self.logger.debug(
+                "%d:%d\t%s\t%s",
+                lineno,
+                column,
+                tok.type,
+                tok.value
+            )
+        return tok
+
+    def tokens(self):
+        """
+        Return an iterator over the remaining tokens of the input.
+        Unless tokens are logged, it runs the scanning loop directly.
+        """
+        if self.verbose:
+            return iter(self.token, None)
+        return iter(self._tokens.__next__, None)
+
+    def _reset(self, lexdata, stream, chunk_size):
+        """Reset the per-input state."""
+        self.lexdata = lexdata
+        self.lexpos = 0
+        self.lineno = 1
+        self.bol = -1
+        self.level = 0
+        self.line_states = None
+        self.errors = 0
+        self.gave_up = False
+        self._state = 'INITIAL'
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._tokens = self._scan()
+
+    # == SCANNING LOOP ==
+
+    def _scan(self):
+        """
+        Generate the tokens of the input, one per resumption.
+        Generate None forever once <EOF> has been reached, or once
+        lexing has stopped after too many errors.
+
+        Matches are found by iterating the master regex of the current
+        state over the input, restarting whenever the state changes or
+        the caller skips input. No rule matches across a newline, except
+        for newline runs, which may be split freely; so a window ending
+        at a newline is lexed exactly as the whole input would be.
+
+        Positions are relative to the window, which starts at absolute
+        position 'base'. Position and line tracking live in locals while
+        scanning and are synchronized with the object on every token and
+        newline, so that the position attributes behave as with PLY.
+        """
+        data = self.lexdata
+        base = 0
+        pos = self.lexpos
+        limit = len(data) if self._stream is None else 0
+        lineno = self.lineno
+        bol = self.bol
+        line_states = self.line_states
+        offsets = self.lines is not None
+        if isinstance(data, str):
+            if offsets:
+                tables = _fast_offset_tables
+            elif self.profile is not None:
+                # Newlines are matched one run at a time, as with PLY.
+                tables = _fast_line_tables
+            else:
+                tables = _fast_tables
+            words = self._words
+            intern = self.identifiers.intern
+            operators = _operator_values
+            decode = str
+            # Newlines before matches in INITIAL state may be skipped
+            # as blanks, and are then counted from the text skipped.
+            count_lines = tables is _fast_tables
+        else:
+            # Bytes-like input is matched in place; only the text of
+            # identifiers and literals is ever decoded.
+            tables = _fast_byte_offset_tables if offsets else _fast_byte_tables
+            words = self._byte_words
+            intern = self._intern_bytes
+            operators = _operator_byte_values
+            decode = _decode_ascii
+            count_lines = False
+        literals = self.literals
+        profile = self.profile
+        spans = self.spans
+        token_class = lex.LexToken
+        initial = _line_state('INITIAL', 0)
+
+        try:
+            while True:
+                if pos >= limit:
+                    if self._stream is None:
+                        break
+                    data, limit = self._refill(data, base, pos)
+                    if not data:
+                        pos = self.lexpos - base
+                        break
+                    bol -= self.lexpos - base
+                    pos = 0
+                    base = self.lexpos
+                    continue
+
+                state = self._state
+                regex, actions, types, rules = tables[state]
+                matches = regex.finditer(data, pos, limit)
+                if profile is not None:
+                    matches = _profiled_matches(
+                        profile, state, matches, rules, operators
+                    )
+                for found in matches:
+                    idx = found.lastindex
+                    action = actions[idx]
+                    skipped = pos
+                    start, pos = found.span(idx)
+                    if count_lines and start != skipped:
+                        newlines = data.count('\n', skipped, start)
+                        if newlines:
+                            lineno += newlines
+                            bol = data.rfind('\n', skipped, start)
+                            self.lineno = lineno
+                            self.bol = base + bol
+                            if line_states is not None:
+                                line_states.extend([initial] * newlines)
+
+                    if action == _WORD:
+                        value = found[idx]
+                        word = words.get(value)
+                        if word is None:
+                            # A name, met for the first time
+                            word = words[value] = (types[idx], intern(value))
+                        toktype, value = word
+                    elif action == _IGNORE:
+                        continue
+                    elif action == _NEWLINE:
+                        lineno += pos - start
+                        bol = pos - 1
+                        self.lineno = lineno
+                        self.bol = base + bol
+                        if line_states is not None:
+                            state_code = _line_state(state, self.level)
+                            line_states.extend([state_code] * (pos - start))
+                        continue
+                    elif action == _ICONST:
+                        value = int(found[idx])
+                        toktype = types[idx]
+                    elif action == _FCONST:
+                        value = self._float(found[idx], base + start)
+                        toktype = types[idx]
+                    elif action == _CCONST:
+                        value = self._char(
+                            decode(found[idx][1:-1]), base + start
+                        )
+                        toktype = types[idx]
+                    elif action == _SCONST:
+                        value = literals.intern(decode(found[idx][1:-1]))
+                        toktype = types[idx]
+                    elif action == _ERROR:
+                        end = _illegal_run_end(data, start, limit)
+                        self._illegal_characters(data[start:end], base + start)
+                        if end == pos:
+                            continue
+                        pos = end
+                        break
+                    elif action == _RCHAR or action == _RSTRING:
+                        if action == _RCHAR:
+                            value = '\0'
+                        else:
+                            value = literals.intern('')
+                        toktype = types[idx]
+                        self._state = 'INITIAL'
+                    else:
+                        self._transition(action, base + start)
+                        break
+
+                    tok = token_class()
+                    tok.type = toktype
+                    tok.value = value
+                    if offsets:
+                        tok.lexpos = base + start
+                    else:
+                        tok.lineno = lineno
+                        tok.lexpos = start - bol
+                    if spans:
+                        tok.span = (base + start, base + pos)
+                    lexpos = self.lexpos = base + pos
+                    yield tok
+                    if self.lexpos != lexpos or self._state is not state:
+                        pos = self.lexpos - base
+                        break
+                else:
+                    # Only ignored characters remain.
+                    pos = limit
+
+            while True:
+                self.lexpos = base + pos + 1
+                self._unexpected_eof()
+                yield None
+                pos = self.lexpos - base
+        except _TooManyErrors:
+            self.gave_up = True
+        while True:
+            yield None
+
+    def _refill(self, data, base, pos):
+        """
+        Drop the lexed part of the window and read on until the window
+        holds a newline or the stream is exhausted. Account for the
+        dropped input in 'lexpos' and return the new window along with
+        the position up to which it may be lexed.
+        """
+        stream = self._stream
+        excess = max(pos - len(data), 0)
+        parts = [data[pos:]]
+        size = len(parts[0])
+        limit = None
+        self.lexpos = base + pos - excess
+        while limit is None:
+            chunk = stream.read(self._chunk_size)
+            if not chunk:
+                break
+            if self.lines is not None:
+                self.lines.extend(chunk, self.lexpos + size)
+            if excess:
+                # Discard input skipped before it was read.
+                dropped = min(excess, len(chunk))
+                chunk = chunk[dropped:]
+                excess -= dropped
+                self.lexpos += dropped
+            # Join the chunks of a long line only once it is complete.
+            parts.append(chunk)
+            size += len(chunk)
+            newline = chunk.rfind('\n')
+            if newline != -1:
+                limit = size - len(chunk) + newline + 1
+        data = self.lexdata = ''.join(parts)
+        return data, size if limit is None else limit
+
+    # == INLINE TOKEN PROCESSING ==
+
+    def _intern_bytes(self, raw):
+        """Intern the identifier spelled by the bytes 'raw'."""
+        return self.identifiers.intern(raw.decode('ascii'))
+
+    def _position(self, offset):
+        """Return the line and column of an absolute input position."""
+        if self.lines is None:
+            return self.lineno, offset - self.bol
+        return self.lines.position(offset)
+
+    def _float(self, text, offset):
+        """Decode a floating-point constant."""
+        try:
+            return float(text)
+        except OverflowError:
+            self._error(
+                "%d:%d: error: Floating-point constant is irrepresentable.",
+                *self._position(offset)
+            )
+            return 0.0
+
+    def _char(self, text, offset):
+        """Decode a proper or empty character literal."""
+        if text:
+            return unescape(text)[0]
+        self._error(
+            "%d:%d: error: Empty character literal not allowed.",
+            *self._position(offset)
+        )
+        return '\0'
+
+    def _transition(self, action, offset):
+        """
+        Perform the state transition of a comment delimiter or of
+        a malformed literal.
+        """
+        if action == _LCOMMENT:
+            self.level += 1
+            self._state = 'comment'
+        elif action == _RCOMMENT:
+            if self.level > 1:
+                self.level -= 1
+            else:
+                self.level = 0
+                self._state = 'INITIAL'
+        else:
+            if action == _LCHAR:
+                msg, state = "Bad character literal.", 'char'
+            else:
+                msg, state = "Bad string literal.", 'string'
+            lineno, column = self._position(offset)
+            self._error(
+                "%d:%d: error: %s",
+                lineno,
+                column,
+                msg
+            )
+            self._state = state
+
+    def _illegal_characters(self, run, offset):
+        """Report a run of illegal characters and recover in INITIAL state."""
+        if not isinstance(run, str):
+            # Report characters rather than bytes, as for decoded text.
+            run = bytes(run).decode('utf-8', 'replace')
+        lineno, column = self._position(offset)
+        self._error(*_illegal_diagnostic(lineno, column, run, self._state))
+        self._state = 'INITIAL'
+
+    def _error(self, fmt, *args):
+        """
+        Report an error, leading with its line. Stop lexing once
+        the maximum number of errors has been reported.
+        """
+        self.logger.error(fmt, *args)
+        self.errors += 1
+        if self.errors == self.max_errors:
+            self.logger.error(
+                "%d: error: Too many lexical errors; giving up.",
+                args[0]
+            )
+            raise _TooManyErrors
+
+    def _unexpected_eof(self):
+        """Check for abnormal EOF."""
+        if self.lines is not None:
+            self.lineno = len(self.lines)
+        state = self._state
+        if state == "comment":
+            self._error(
+                "%d: error: Unclosed comment reaching end of file.",
+                self.lineno
+            )
+        elif state == "string":
+            self._error(
+                "%d: error: Unclosed string reaching end of file.",
+                self.lineno
+            )
+        elif state == "char":
+            self._error(
+                "%d: error: Unclosed character literal at end of file.",
+                self.lineno
+            )
+
+
+# Available lexing engines
+_engines = frozenset(('ply', 'fast'))
+
+
 class Lexer:
     """ A Llama lexer"""
 
@@ -503,37 +1494,137 @@ class Lexer:
     # Logger used for logging events. Possibly shared with other modules.
     logger = None
 
-    def __init__(self, debug=False, optimize=True, logger=None, verbose=False):
+    # Line index of the input, if positions are resolved lazily
+    lines = None
+
+    # Table interning identifiers. Possibly shared with other lexers.
+    identifiers = None
+
+    # Pool of string literals. Possibly shared with other lexers.
+    literals = None
+
+    # Directory of the table cache; None for the per-user default
+    cache_dir = None
+
+    # Per-rule statistics, if profiling is enabled
+    profile = None
+
+    # True if tokens carry the offsets of their text, for lossless lexing
+    trivia = False
+
+    # Fingerprint of the last input, once lexed, if fingerprinting
+    fingerprint = None
+    _fingerprinter = None
+    _unfingerprinted_token = None
+
+    def __init__(self, debug=False, optimize=True, logger=None, verbose=False,
+                 engine='ply', lazy_positions=False, identifiers=None,
+                 literals=None, max_errors=100, cache_dir=None,
+                 profile=False, trivia=False, fingerprint=False):
         """
         Create a new lexer.
 
         By default, the lexer accepts only ASCII and is optimized (i.e
-        caches the lexing tables across invocations).
+        caches the lexing tables across invocations). The tables are
+        cached in 'cache_dir', or else in a per-user directory.
         If a 'logger' is not provided, create one.
         For detailed reporting on regex construction, enable 'debug'.
         For echoing matched tokens to stdout, enable 'verbose'.
+        For the single-pass master-regex engine, set 'engine' to 'fast'.
+        For tokens carrying their absolute offset in 'lexpos' and no
+        line, to be resolved on demand by position(), enable
+        'lazy_positions'. Only the fast engine supports this.
+        Identifiers are interned in the IdentifierTable 'identifiers',
+        which may be shared among the lexers of a compilation; if not
+        provided, create one. Token values of identifiers are then
+        Identifier strings carrying their integer id.
+        Likewise, string literals are pooled in the LiteralPool
+        'literals'. Their token values are immutable StringLiterals.
+        Lexing of an input stops after 'max_errors' errors have been
+        reported, unless it is None. A run of illegal characters is
+        reported as a single error.
+        For per-rule match counts and timings, enable 'profile' and
+        read them from the LexerProfile in 'profile'. Lexers not
+        profiling pay nothing for it.
+        For a lossless token stream, enable 'trivia': every token then
+        carries in 'span' the absolute start and end offsets of its
+        text, and token buffers keep the end offsets. The trivia module
+        recovers the blanks, comments and skipped input between tokens.
+        For a digest of every input by its token kinds and values, per
+        input and per top-level definition, enable 'fingerprint' and
+        read the Fingerprint in 'fingerprint' once the input is lexed;
+        it stays None if lexing the input reported errors.
         """
+        if engine not in _engines:
+            raise ValueError("Unknown lexer engine: %s" % engine)
+        if lazy_positions and engine != 'fast':
+            raise ValueError("Lazy positions require the fast engine.")
         self.debug = debug
         self.optimize = optimize
+        self.engine = engine
+        self.lazy_positions = lazy_positions
+        self.max_errors = max_errors
+        self.cache_dir = cache_dir
+        self.trivia = trivia
+        if identifiers is None:
+            self.identifiers = ident.IdentifierTable()
+        else:
+            self.identifiers = identifiers
+        if literals is None:
+            self.literals = literal.LiteralPool()
+        else:
+            self.literals = literals
         if logger is None:
             self.logger = error.Logger()
         else:
             self.logger = logger
         self.verbose = verbose
+        if profile:
+            self.profile = lexprofile.LexerProfile()
+            self.token = self._profiled_token
+        if fingerprint:
+            self._unfingerprinted_token = self.token
+            self.token = self._fingerprinted_token
 
     def _setup_inner_lexer(self):
         """Create a new inner lexer and bind it to the Lexer object."""
 
-        self._lexer = _LexerFactory(logger=self.logger, verbose=self.verbose)
+        if self.engine == 'fast':
+            self._lexer = _FastLexer(
+                logger=self.logger,
+                verbose=self.verbose,
+                identifiers=self.identifiers,
+                literals=self.literals,
+                max_errors=self.max_errors
+            )
+            self._lexer.profile = self.profile
+            self._lexer.spans = self.trivia
+            return
+
+        self._lexer = _LexerFactory(
+            logger=self.logger,
+            verbose=self.verbose,
+            identifiers=self.identifiers,
+            literals=self.literals,
+            max_errors=self.max_errors
+        )
         self._lexer.build(
+            cache_dir=self.cache_dir,
             debug=self.debug,
             optimize=self.optimize,
             reflags=re.ASCII
         )
+        if self.profile is not None:
+            _profile_ply_lexer(self._lexer.lexer, self.profile)
+        self._lexer.spans = self.trivia
 
     # == ITERATOR INTERFACE ==
 
     def __iter__(self):
+        # Plain tokens of the fast engine are drawn straight from it.
+        if self.engine == 'fast' and self._lexer is not None:
+            if self.profile is None and self._unfingerprinted_token is None:
+                return self._lexer.tokens()
         return self
 
     def __next__(self):
@@ -545,9 +1636,45 @@ class Lexer:
     # == PUBLIC API ==
 
     def input(self, data):
-        """Feed the lexer with input and prepare for tokenizing."""
-        self._setup_inner_lexer()
+        """
+        Feed the lexer with input and prepare for tokenizing.
+        Besides a string, the fast engine accepts a bytes-like object,
+        such as a memoryview or an mmap of the input file, and lexes
+        it in place; positions then count bytes instead of characters.
+        """
+        if not isinstance(data, str) and self.engine != 'fast':
+            raise ValueError("Bytes input requires the fast engine.")
+        if self._lexer is None:
+            self._setup_inner_lexer()
+        if self.profile is not None:
+            self.profile.begin_input()
+        if self._unfingerprinted_token is not None:
+            self.fingerprint = None
+            self._fingerprinter = fingerprint.Fingerprinter()
         self._lexer.input(data)
+        if self.lazy_positions:
+            self.lines = self._lexer.lines = lineindex.LineIndex(data)
+
+    def input_stream(self, stream, chunk_size=65536):
+        """
+        Feed the lexer with a text stream and prepare for tokenizing.
+        The stream is read lazily, 'chunk_size' characters at a time,
+        so memory use is bounded by the chunk size and the longest line
+        instead of the size of the input.
+        Only the fast engine can lex streams.
+        """
+        if self.engine != 'fast':
+            raise ValueError("Streaming input requires the fast engine.")
+        if self._lexer is None:
+            self._setup_inner_lexer()
+        if self.profile is not None:
+            self.profile.begin_input()
+        if self._unfingerprinted_token is not None:
+            self.fingerprint = None
+            self._fingerprinter = fingerprint.Fingerprinter()
+        self._lexer.input_stream(stream, chunk_size)
+        if self.lazy_positions:
+            self.lines = self._lexer.lines = lineindex.LineIndex()
 
     def skip(self, amount):
         """Skip the lexer 'amount' characters forward."""
@@ -561,6 +1688,27 @@ class Lexer:
             raise Exception("Cannot tokenize from empty data.")
         return self._lexer.token()
 
+    def _profiled_token(self):
+        """Return the next token, timing the matches completing it."""
+        tok = Lexer.token(self)
+        self.profile.pause()
+        if tok is None:
+            self.profile.enter(self._lexer.lexer.current_state())
+        return tok
+
+    def _fingerprinted_token(self):
+        """Return the next token, adding it to the fingerprint."""
+        tok = self._unfingerprinted_token()
+        if tok is not None:
+            self._fingerprinter.update(tok)
+        elif self._fingerprinter is not None:
+            # Illegal input leaves no token to digest, so an input in
+            # error would pass for the same input without the errors.
+            if not self._lexer.errors:
+                self.fingerprint = self._fingerprinter.finish()
+            self._fingerprinter = None
+        return tok
+
     def tokenize(self, data):
         """
         Lex the given string. Return an iterator over the string tokens.
@@ -568,19 +1716,274 @@ class Lexer:
         self.input(data)
         return iter(self)
 
+    def tokenize_columns(self, data):
+        """
+        Lex the given string in bulk. Return a TokenBuffer holding
+        the string tokens in compact, column-oriented form.
+        """
+        return self._tokenize_columns(data, _line_state('INITIAL', 0))
+
+    def _tokenize_columns(self, data, line_state):
+        """
+        Lex the given string in bulk, starting in the encoded lexer
+        state 'line_state'. Return a TokenBuffer of the string tokens.
+        """
+        self._resume(data, 0, 1, line_state)
+        inner = self._lexer
+        buffer = tokenbuffer.TokenBuffer(
+            tokens, implicit_values, ends=self.trivia
+        )
+        buffer.source = data
+        buffer.line_states.append(line_state)
+        inner.line_states = buffer.line_states
+        append = buffer.append
+        ends = buffer.ends
+        for tok in self:
+            append(tok.type, tok.value, tok.lineno, tok.lexpos,
+                   inner.bol + tok.lexpos)
+            if ends is not None:
+                ends.append(tok.span[1])
+        inner.line_states = None
+        return buffer
+
+    def relex(self, buffer, offset, deleted, inserted):
+        """
+        Lex the source of 'buffer' after an edit replacing 'deleted'
+        characters at 'offset' with the string 'inserted'. Return a
+        TokenBuffer for the edited source, as tokenize_columns would.
+
+        'buffer' must come from tokenize_columns or relex. Lexing
+        resumes at the start of the line holding the edit, in the lexer
+        state recorded for that line, since no token spans a newline.
+        Once the lexer enters a line past the edit in the same state
+        as the corresponding line of 'buffer', the rest of the tokens
+        are taken from 'buffer', moved by the size of the edit.
+        Only diagnostics for the relexed lines are reported.
+        """
+        old = buffer.source
+        if old is None:
+            raise ValueError("Token buffer carries no source.")
+        if offset < 0 or deleted < 0 or offset + deleted > len(old):
+            raise ValueError("Edit lies outside the source.")
+
+        data = old[:offset] + inserted + old[offset + deleted:]
+        offset_delta = len(inserted) - deleted
+        line_delta = inserted.count('\n') - old.count('\n', offset,
+                                                      offset + deleted)
+
+        # Resume at the start of the line holding the edit.
+        first_line = old.count('\n', 0, offset)
+        restart = old.rfind('\n', 0, offset) + 1
+        first_token = bisect.bisect_left(buffer.offsets, restart)
+
+        # Lines after this one begin past the edit.
+        last_edited_line = first_line + inserted.count('\n')
+
+        new = buffer[:first_token]
+        new.source = data
+        new.line_states = buffer.line_states[:first_line + 1]
+        self._resume(data, restart, first_line + 1, new.line_states[-1])
+        inner = self._lexer
+        inner.line_states = new.line_states
+
+        append = new.append
+        ends = new.ends
+        for tok in self:
+            line = len(new.line_states) - 1
+            if line > last_edited_line:
+                old_line = line - line_delta
+                if new.line_states[line] == buffer.line_states[old_line]:
+                    # Lexing has lined up with the old token stream.
+                    old_restart = inner.bol + 1 - offset_delta
+                    new.extend_shifted(
+                        buffer,
+                        bisect.bisect_left(buffer.offsets, old_restart),
+                        offset_delta,
+                        line_delta
+                    )
+                    new.line_states.extend(buffer.line_states[old_line + 1:])
+                    break
+            append(tok.type, tok.value, tok.lineno, tok.lexpos,
+                   inner.bol + tok.lexpos)
+            if ends is not None:
+                ends.append(tok.span[1])
+        inner.line_states = None
+        return new
+
+    def tokenize_parallel(self, data, processes=None, chunks=None):
+        """
+        Lex the given string in bulk on a pool of 'processes' worker
+        processes, one per CPU by default. Return a TokenBuffer and log
+        diagnostics exactly as tokenize_columns would.
+
+        The string is split into 'chunks' pieces, one per process by
+        default, at lines starting with 'let' or 'type', guessing that
+        no comment or literal is open there. Every piece is lexed on its
+        own. A piece whose guess proves wrong, i.e. whose predecessor
+        ends in another lexer state, is lexed again in that state.
+        """
+        processes = processes or os.cpu_count() or 1
+        bounds = _chunk_bounds(data, chunks or processes)
+        if len(bounds) <= 2:
+            return self.tokenize_columns(data)
+
+        pieces = [data[start:end] for start, end in zip(bounds, bounds[1:])]
+        options = {
+            'debug': self.debug,
+            'optimize': self.optimize,
+            'cache_dir': self.cache_dir,
+            'trivia': self.trivia,
+            'verbose': self.verbose,
+            'engine': self.engine,
+            'max_errors': None
+        }
+        initial = _line_state('INITIAL', 0)
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(
+                _tokenize_chunk,
+                itertools.repeat(options),
+                pieces,
+                itertools.repeat(initial)
+            ))
+
+        line_state = initial
+        last = len(pieces) - 1
+        errors = 0
+        for index, piece in enumerate(pieces):
+            chunk, events = results[index]
+            if line_state != initial:
+                chunk, events = _tokenize_chunk(options, piece, line_state)
+                results[index] = chunk, events
+            line_state = chunk.line_states[-1]
+            if index != last and line_state != initial:
+                # The piece ends inside a comment or literal, which
+                # is reported as unclosed at the end of the piece.
+                events.pop()
+            errors += sum(1 for event in events if event[0] == 'error')
+        if self.max_errors is not None and errors >= self.max_errors:
+            # Garbage input; find where to give up by lexing serially.
+            return self.tokenize_columns(data)
+
+        buffer = tokenbuffer.TokenBuffer(
+            tokens, implicit_values, ends=self.trivia
+        )
+        buffer.source = data
+        buffer.line_states.append(initial)
+        for start, (chunk, events) in zip(bounds, results):
+            for value_id, value in enumerate(chunk.pool):
+                # Share names and literals with the rest of the input.
+                if isinstance(value, ident.Identifier):
+                    chunk.pool[value_id] = self.identifiers.intern(value)
+                elif isinstance(value, literal.StringLiteral):
+                    chunk.pool[value_id] = self.literals.add(value)
+            line_delta = len(buffer.line_states) - 1
+            for name, fmt, args in events:
+                # All lexer diagnostics lead with the line number.
+                getattr(self.logger, name)(fmt, args[0] + line_delta,
+                                           *args[1:])
+            buffer.extend_shifted(chunk, 0, start, line_delta)
+            buffer.line_states.extend(chunk.line_states[1:])
+        return buffer
+
+    def _resume(self, data, pos, lineno, line_state):
+        """
+        Feed the lexer with input and resume lexing at position 'pos',
+        the start of line 'lineno', in the encoded state 'line_state'.
+        """
+        if self.lazy_positions:
+            raise ValueError("Token buffers require eager positions.")
+        self.input(data)
+        inner = self._lexer
+        state, level = _line_state_decode(line_state)
+        inner.lexer.lexpos = pos
+        inner.lexer.lineno = lineno
+        inner.bol = pos - 1
+        inner.level = level
+        inner.lexer.begin(state)
+
     # == EXPORT POSITION ATTRIBUTES ==
 
+    def position(self, offset):
+        """
+        Return the line and column of an absolute offset into the input.
+        Only available if positions are resolved lazily.
+        """
+        if self.lines is None:
+            raise ValueError("Positions are resolved eagerly.")
+        return self.lines.position(offset)
+
     @property
     def lexpos(self):
         """Return column following last token matched in current line."""
+        if self.lines is not None:
+            return self.lines.position(self._lexer.lexpos)[1]
         return self._lexer.lexer.lexpos - self._lexer.bol
 
     @property
     def lineno(self):
         """Return current line of input"""
+        if self.lines is not None:
+            return self.lines.position(self._lexer.lexpos)[0]
         return self._lexer.lexer.lineno
 
 
+class _RecordingLogger(error.LoggerInterface):
+    """A logger recording unformatted events, to be replayed elsewhere."""
+
+    def __init__(self):
+        """Make a new logger with no events."""
+        self.events = []
+
+    def debug(self, fmt, *args):
+        self.events.append(('debug', fmt, args))
+
+    def info(self, fmt, *args):
+        self.events.append(('info', fmt, args))
+
+    def warning(self, fmt, *args):
+        self.events.append(('warning', fmt, args))
+        self.warnings += 1
+
+    def error(self, fmt, *args):
+        self.events.append(('error', fmt, args))
+        self.errors += 1
+
+
+# Lines likely to start a top-level definition
+_boundary_regex = re.compile(r'^(?:let|type)\b', re.MULTILINE | re.ASCII)
+
+
+def _chunk_bounds(data, chunks):
+    """
+    Split 'data' into at most 'chunks' pieces of similar size, each
+    starting at a line likely to start a top-level definition.
+    Return the start of every piece, followed by the length of 'data'.
+    """
+    bounds = [0]
+    size = len(data) // chunks
+    for k in range(1, chunks):
+        found = _boundary_regex.search(data, max(k * size, bounds[-1] + 1))
+        if found is None:
+            break
+        bounds.append(found.start())
+    bounds.append(len(data))
+    return bounds
+
+
+def _tokenize_chunk(options, data, line_state):
+    """
+    Lex a piece of input in bulk, starting in the encoded lexer state
+    'line_state'. Return a TokenBuffer of the piece tokens, without
+    the source, along with the events logged. Runs in worker processes
+    of Lexer.tokenize_parallel.
+    """
+    logger = _RecordingLogger()
+    lexer = Lexer(logger=logger, **options)
+    buffer = lexer._tokenize_columns(data, line_state)
+    buffer.source = None
+    return buffer, logger.events
+
+
 def tokenize(data, logger=None):
     """
     Lex the given string using the default Lexer.
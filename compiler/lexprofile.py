@@ -0,0 +1,147 @@
+"""
+# ----------------------------------------------------------------------
+# lexprofile.py
+#
+# Per-rule statistics of the Llama lexer
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+# ----------------------------------------------------------------------
+"""
+
+import collections
+import time
+
+
+class RuleStats:
+    """The matches of one lexer rule in one lexer state."""
+
+    __slots__ = ('matches', 'length', 'seconds')
+
+    def __init__(self):
+        """Make empty statistics."""
+        self.matches = 0
+
+        # Characters matched; bytes, for bytes-like input
+        self.length = 0
+
+        # Cumulative time spent finding and acting on the matches
+        self.seconds = 0.0
+
+
+class LexerProfile:
+    """
+    Statistics of the matches of every lexer rule, per lexer state, and
+    counts of the transitions between lexer states, accumulated over
+    all the inputs of a lexer.
+
+    A match is timed from the start of the search for it up to the
+    start of the search for the next match, or up to the return of
+    the token it completes, so that time spent by the caller between
+    tokens is not counted.
+    """
+
+    def __init__(self):
+        """Make an empty profile."""
+        # RuleStats, keyed by (state, rule name)
+        self.rules = {}
+
+        # Counts of transitions, keyed by (source state, target state)
+        self.transitions = collections.Counter()
+
+        self._state = 'INITIAL'
+
+        # Statistics of the match being timed and the start of its time
+        self._pending = None
+        self._since = 0.0
+
+    def begin_input(self):
+        """Prepare for a new input, which is lexed from INITIAL state."""
+        self.pause()
+        self._state = 'INITIAL'
+
+    def record(self, state, rule, length, start):
+        """
+        Record a match of 'length' characters by 'rule' in 'state',
+        whose search started at time 'start'.
+        """
+        self._stop(start)
+        stats = self.rules.get((state, rule))
+        if stats is None:
+            stats = self.rules[state, rule] = RuleStats()
+        stats.matches += 1
+        stats.length += length
+        self._pending = stats
+        self._since = start
+        self.enter(state)
+
+    def enter(self, state):
+        """Note that the lexer is in 'state', counting any transition."""
+        if state != self._state:
+            self.transitions[self._state, state] += 1
+            self._state = state
+
+    def pause(self):
+        """Stop timing the last match, as its token is returned."""
+        self._stop(time.perf_counter())
+
+    def _stop(self, now):
+        """Charge the time up to 'now' to the match being timed."""
+        if self._pending is not None:
+            self._pending.seconds += now - self._since
+            self._pending = None
+
+    def report(self):
+        """
+        Return the statistics as a dictionary: a list of rules, each
+        a dictionary of its state, name, matches, length and seconds,
+        slowest first; a list of transitions, each a dictionary of its
+        source, target and count, most frequent first; and the total
+        number of seconds.
+        """
+        rules = [
+            {
+                'state': state,
+                'rule': rule,
+                'matches': stats.matches,
+                'length': stats.length,
+                'seconds': stats.seconds
+            }
+            for (state, rule), stats in self.rules.items()
+        ]
+        rules.sort(key=lambda entry: (-entry['seconds'], entry['rule']))
+        transitions = [
+            {'source': source, 'target': target, 'count': count}
+            for (source, target), count in sorted(
+                self.transitions.items(),
+                key=lambda item: (-item[1], item[0])
+            )
+        ]
+        return {
+            'rules': rules,
+            'transitions': transitions,
+            'seconds': sum(entry['seconds'] for entry in rules)
+        }
+
+    def format(self):
+        """Return the statistics as a printable table."""
+        report = self.report()
+        lines = [
+            "%-8s %-28s %10s %10s %10s" % (
+                'state', 'rule', 'matches', 'length', 'ms'
+            )
+        ]
+        for entry in report['rules']:
+            lines.append("%-8s %-28s %10d %10d %10.3f" % (
+                entry['state'],
+                entry['rule'],
+                entry['matches'],
+                entry['length'],
+                1000 * entry['seconds']
+            ))
+        lines.append("total %61.3f" % (1000 * report['seconds']))
+        for entry in report['transitions']:
+            lines.append("transition %s -> %s: %d" % (
+                entry['source'],
+                entry['target'],
+                entry['count']
+            ))
+        return "\n".join(lines)
@@ -0,0 +1,58 @@
+"""
+# ----------------------------------------------------------------------
+# lineindex.py
+#
+# Resolution of input offsets to lines and columns
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+# ----------------------------------------------------------------------
+"""
+
+import bisect
+import re
+from array import array
+
+_newline_regex = re.compile(b'\n')
+
+
+class LineIndex:
+    """
+    The offsets at which the lines of an input start.
+
+    Built once per input, in one pass over it, so that absolute offsets
+    can be resolved to lines and columns on demand, in logarithmic time,
+    instead of tracking lines and columns for every token.
+    """
+
+    def __init__(self, data=''):
+        """Make an index of the lines of 'data'."""
+        self.starts = array('i', [0])
+        self.extend(data, 0)
+
+    def extend(self, text, offset):
+        """
+        Index the lines starting in 'text', found at 'offset'. The text
+        may also be a bytes-like object.
+        """
+        starts = self.starts
+        if not isinstance(text, (str, bytes)):
+            starts.extend(
+                offset + found.end() for found in _newline_regex.finditer(text)
+            )
+            return
+        find = text.find
+        newline = '\n' if isinstance(text, str) else b'\n'
+        found = find(newline)
+        while found != -1:
+            starts.append(offset + found + 1)
+            found = find(newline, found + 1)
+
+    def position(self, offset):
+        """
+        Return the line and column of an absolute offset. Both are
+        1-based, as the lexer reports them.
+        """
+        line = bisect.bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
+    def __len__(self):
+        return len(self.starts)
@@ -0,0 +1,115 @@
+"""
+# ----------------------------------------------------------------------
+# literal.py
+#
+# Compact representation of Llama string literals
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+# ----------------------------------------------------------------------
+"""
+
+import re
+
+
+# Escape sequences allowed in string literals and the bytes they denote
+escape_table = {
+    b'\\n': b'\n',
+    b'\\t': b'\t',
+    b'\\r': b'\r',
+    b'\\0': b'\0',
+    b'\\\\': b'\\',
+    b"\\'": b"'",
+    b'\\"': b'"'
+}
+escape_table.update(
+    (('\\x%s%s' % (high, low)).encode('ascii'), bytes((int(high + low, 16),)))
+    for high in '0123456789abcdefABCDEF'
+    for low in '0123456789abcdefABCDEF'
+)
+
+_escape_regex = re.compile(rb'\\(?:x..|.)')
+
+
+def decode(text):
+    """
+    Unescape the body of a proper string literal and null-terminate it.
+    Return the result as bytes.
+    """
+    data = text.encode('ascii')
+    if b'\\' in data:
+        data = _escape_regex.sub(lambda m: escape_table[m[0]], data)
+    return data + b'\0'
+
+
+class StringLiteral:
+    """
+    An immutable, null-terminated string literal, stored as bytes.
+
+    Acts as a read-only sequence of one-character strings and compares
+    equal to the list of characters by which literals used to be
+    represented, which is still available as 'chars'.
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        """Make a literal of the null-terminated bytes 'data'."""
+        self.data = data
+
+    @property
+    def chars(self):
+        """Return a new list of the characters of the literal."""
+        return list(self.data.decode('latin-1'))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self.data[key].decode('latin-1'))
+        return chr(self.data[key])
+
+    def __iter__(self):
+        return iter(self.data.decode('latin-1'))
+
+    def __eq__(self, other):
+        if isinstance(other, StringLiteral):
+            return self.data == other.data
+        if isinstance(other, list):
+            return self.chars == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.data)
+
+    def __repr__(self):
+        return 'StringLiteral(%r)' % self.data
+
+
+class LiteralPool:
+    """
+    The distinct string literals of a compilation.
+    Equal literals are decoded and stored only once.
+    """
+
+    def __init__(self):
+        """Make a new empty pool."""
+        # Map from the body of a literal, as written, to the literal
+        self._by_text = {}
+
+        # Map from the contents of a literal to the literal
+        self._by_data = {}
+
+    def intern(self, text):
+        """Return the literal with body 'text', adding it if absent."""
+        literal = self._by_text.get(text)
+        if literal is None:
+            literal = self.add(StringLiteral(decode(text)))
+            self._by_text[text] = literal
+        return literal
+
+    def add(self, literal):
+        """Return the pooled literal equal to 'literal', pooling it."""
+        return self._by_data.setdefault(literal.data, literal)
+
+    def __len__(self):
+        return len(self._by_data)
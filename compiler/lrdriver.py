@@ -0,0 +1,311 @@
+"""
+# ----------------------------------------------------------------------
+# lrdriver.py
+#
+# LR parsing driver over compact tables for the Llama parser
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+#
+# The driver runs the LALR automaton generated by PLY, packed into
+# flat integer arrays indexed by small integer symbol kinds, and calls
+# the grammar rule functions directly. It reproduces the behaviour of
+# the PLY driver exactly, error recovery included.
+# ----------------------------------------------------------------------
+"""
+
+from array import array
+
+from ply import yacc
+
+# Entry of the action table marking a syntax error
+_ERROR = 0x7fffffff
+
+# Kinds of trace events. Each event comes with two integers:
+# SHIFT: the state entered and the kind of the terminal shifted.
+# REDUCE: the production reduced and the state entered.
+# ERROR: the state and the kind of the lookahead in error.
+# POP: the state popped while recovering and the state uncovered.
+# DISCARD: the state and the kind of the lookahead dropped while
+# recovering.
+SHIFT, REDUCE, ERROR, POP, DISCARD = range(5)
+_event_names = ('shift', 'reduce', 'error', 'pop', 'discard')
+
+
+class _Reduction(list):
+    """
+    The symbols of a production being reduced, passed to a grammar
+    rule: item 0 receives the result and items 1, 2, ... hold the values
+    of the right-hand side. Being a list, indexing it costs no Python
+    call. Stands in for PLY's YaccProduction.
+    """
+
+    __slots__ = ('lexer', 'tokens')
+
+    # The symbols of the right-hand side are still on top of the stack
+    # of symbols 'tokens' while the rule runs.
+
+    def symbol(self, n):
+        """Return the n-th symbol if it is a token; else None."""
+        return self.tokens[len(self.tokens) - len(self) + n]
+
+    def lineno(self, n):
+        """Return the line of the n-th symbol, if it is a token; else 0."""
+        symbol = self.tokens[len(self.tokens) - len(self) + n]
+        return getattr(symbol, 'lineno', 0)
+
+    def lexpos(self, n):
+        """Return the offset of the n-th symbol, if it is a token; else 0."""
+        symbol = self.tokens[len(self.tokens) - len(self) + n]
+        return getattr(symbol, 'lexpos', 0)
+
+
+class LRTables:
+    """
+    The parsing tables of a PLY parser in compact form.
+
+    Terminals and nonterminals are numbered by kind. The action of
+    state s on terminal kind k is actions[s * nterminals + k]: a shift
+    to state t > 0, a reduction by production -t, acceptance if 0, or
+    a syntax error. The state reached from state s on nonterminal kind
+    k is gotos[s * nnonterminals + k].
+    """
+
+    def __init__(self, parser, rules):
+        """
+        Pack the tables of the PLY parser 'parser', whose grammar rules
+        are the functions named after them in the namespace 'rules'.
+        """
+        terminals = {'$end', 'error'}
+        for row in parser.action.values():
+            terminals.update(row)
+        self.terminal_kinds = {
+            name: kind for kind, name in enumerate(sorted(terminals))
+        }
+        # Token types the grammar does not know share one more kind.
+        self.unknown_kind = len(self.terminal_kinds)
+        self.end_kind = self.terminal_kinds['$end']
+        self.error_kind = self.terminal_kinds['error']
+        self.nterminals = nterminals = self.unknown_kind + 1
+
+        nonterminals = {prod.name for prod in parser.productions}
+        nonterminal_kinds = {
+            name: kind for kind, name in enumerate(sorted(nonterminals))
+        }
+        self.nnonterminals = nnonterminals = len(nonterminal_kinds)
+
+        nstates = max(parser.action) + 1
+        self.actions = array('i', [_ERROR]) * (nstates * nterminals)
+        for state, row in parser.action.items():
+            for name, action in row.items():
+                # Nonassociative operators leave None, an error.
+                if action is None:
+                    continue
+                self.actions[
+                    state * nterminals + self.terminal_kinds[name]
+                ] = action
+        self.gotos = array('i', [-1]) * (nstates * nnonterminals)
+        for state, row in parser.goto.items():
+            for name, target in row.items():
+                self.gotos[
+                    state * nnonterminals + nonterminal_kinds[name]
+                ] = target
+
+        # Reductions to take without a lookahead, as PLY does; 0 if none
+        self.defaults = array('i', [0]) * nstates
+        for state, action in parser.defaulted_states.items():
+            self.defaults[state] = action
+
+        self.lhs = array('i', (
+            nonterminal_kinds[prod.name] for prod in parser.productions
+        ))
+        self.lengths = array('i', (prod.len for prod in parser.productions))
+        self.rules = [
+            getattr(rules, prod.func) if prod.func else None
+            for prod in parser.productions
+        ]
+
+        # Names of terminal kinds and productions, for reading traces
+        self.terminal_names = sorted(self.terminal_kinds, key=(
+            lambda name: self.terminal_kinds[name]
+        )) + ['<unknown>']
+        self.production_names = [prod.str for prod in parser.productions]
+
+    def parse(self, module, lexer, data=None, values=None, trace=None):
+        """
+        Parse the tokens of 'lexer', fed with 'data' unless it is None,
+        calling the grammar rules and error rule of 'module'. Return the
+        value of the start symbol, or None if the input could not be
+        recovered from its syntax errors.
+        The values of the symbols on the stack are kept in the list
+        'values', if given, where they remain once parsing stops.
+        Every action taken is reported to 'trace', if given, as a call
+        trace(event, a, b) with an event kind and its two integers.
+        """
+        actions, gotos, defaults = self.actions, self.gotos, self.defaults
+        nterminals, nnonterminals = self.nterminals, self.nnonterminals
+        lhs, lengths, rules = self.lhs, self.lengths, self.rules
+        terminal_kinds, unknown_kind = self.terminal_kinds, self.unknown_kind
+        end_kind, error_kind = self.end_kind, self.error_kind
+
+        if data is not None:
+            lexer.input(data)
+        get_token = lexer.token
+
+        reduction = _Reduction([None])
+        reduction.lexer = lexer
+
+        # Parallel stacks of states, symbol values and symbols; the
+        # symbol of a nonterminal is None.
+        states = [0]
+        if values is None:
+            values = []
+        values[:] = [None]
+        tokens = reduction.tokens = [None]
+
+        # Lookahead symbol and its kind, and lookaheads put back
+        lookahead = None
+        kind = end_kind
+        pending = []
+        errorcount = 0
+        state = 0
+
+        while True:
+            action = defaults[state]
+            if not action:
+                if lookahead is None:
+                    if pending:
+                        lookahead, kind = pending.pop()
+                    else:
+                        lookahead = get_token()
+                        if lookahead is None:
+                            lookahead = yacc.YaccSymbol()
+                            lookahead.type = '$end'
+                            kind = end_kind
+                        else:
+                            kind = terminal_kinds.get(
+                                lookahead.type, unknown_kind
+                            )
+                action = actions[state * nterminals + kind]
+
+            if action == _ERROR:
+                if trace is not None:
+                    trace(ERROR, state, kind)
+                if errorcount == 0:
+                    errtoken = lookahead if kind != end_kind else None
+                    if errtoken is not None and \
+                            not hasattr(errtoken, 'lexer'):
+                        errtoken.lexer = lexer
+                    module.p_error(errtoken)
+                errorcount = yacc.error_count
+
+                if len(states) <= 1 and kind != end_kind:
+                    # Nothing left to pop; drop the lookahead.
+                    if trace is not None:
+                        trace(DISCARD, state, kind)
+                    lookahead = None
+                    state = 0
+                    del pending[:]
+                    continue
+                if kind == end_kind:
+                    return None
+                if kind != error_kind:
+                    top = tokens[-1]
+                    if top is not None and top.type == 'error':
+                        if trace is not None:
+                            trace(DISCARD, state, kind)
+                        lookahead = None
+                        continue
+                    error = yacc.YaccSymbol()
+                    error.type = 'error'
+                    if hasattr(lookahead, 'lineno'):
+                        error.lineno = error.endlineno = lookahead.lineno
+                    if hasattr(lookahead, 'lexpos'):
+                        error.lexpos = error.endlexpos = lookahead.lexpos
+                    error.value = lookahead
+                    pending.append((lookahead, kind))
+                    lookahead = error
+                    kind = error_kind
+                else:
+                    states.pop()
+                    values.pop()
+                    tokens.pop()
+                    if trace is not None:
+                        trace(POP, state, states[-1])
+                    state = states[-1]
+                continue
+
+            if action > 0:
+                # Shift
+                states.append(action)
+                values.append(lookahead.value)
+                tokens.append(lookahead)
+                state = action
+                if trace is not None:
+                    trace(SHIFT, action, kind)
+                lookahead = None
+                if errorcount:
+                    errorcount -= 1
+                continue
+
+            if action < 0:
+                # Reduce
+                length = lengths[-action]
+                if length:
+                    reduction[1:] = values[-length:]
+                    reduction[0] = None
+                    rules[-action](module, reduction)
+                    del states[-length:]
+                    del values[-length:]
+                    del tokens[-length:]
+                else:
+                    del reduction[1:]
+                    reduction[0] = None
+                    rules[-action](module, reduction)
+                values.append(reduction[0])
+                tokens.append(None)
+                state = gotos[states[-1] * nnonterminals + lhs[-action]]
+                states.append(state)
+                if trace is not None:
+                    trace(REDUCE, -action, state)
+                continue
+
+            # Accept
+            return values[-1]
+
+
+class ParserTrace:
+    """
+    A trace of parsing actions, recorded compactly as triples of
+    integers in an array. Pass it as the 'trace' of a parse.
+    """
+
+    def __init__(self):
+        """Make an empty trace."""
+        self.events = array('i')
+
+    def __call__(self, event, a, b):
+        """Record an event."""
+        self.events.extend((event, a, b))
+
+    def __len__(self):
+        """Return the number of events recorded."""
+        return len(self.events) // 3
+
+    def clear(self):
+        """Drop all events recorded."""
+        del self.events[:]
+
+    def decode(self, tables):
+        """
+        Generate the events recorded while parsing with the LRTables
+        'tables', as tuples of the event name and its two integers,
+        with terminal kinds and productions given by name.
+        """
+        events = self.events
+        for i in range(0, len(events), 3):
+            event, a, b = events[i], events[i + 1], events[i + 2]
+            if event == REDUCE:
+                yield (_event_names[event], tables.production_names[a], b)
+            elif event == POP:
+                yield (_event_names[event], a, b)
+            else:
+                yield (_event_names[event], a, tables.terminal_names[b])
@@ -11,20 +11,73 @@
 # ----------------------------------------------------------------------
 """
 
+import concurrent.futures
+import copy
+import gc
+import os
+import threading
+
 from ply import yacc
 
-from compiler import ast, error, lex
+from compiler import ast, error, ident, lex, lineindex, lrdriver, tabcache
+
+
+# PLY parsers built so far, keyed by their build options. They only
+# serve as cloning prototypes; their grammar rules act on the Parser
+# object of the clone reducing.
+_yacc_parsers = {}
+_yacc_parsers_lock = threading.Lock()
+
+# Compact tables of the prototypes, for the fast engine, under the same keys
+_lr_tables = {}
+
+_engines = frozenset(('ply', 'fast'))
+
+
+def _rule(func):
+    """
+    Return a grammar rule calling 'func' as a method of the Parser
+    object whose PLY parser is reducing.
+    """
+    def rule(p):
+        func(p.parser.module, p)
+    return rule
+
+
+def _clone_yacc_parser(prototype, module):
+    """
+    Return a copy of the PLY parser 'prototype', sharing its tables
+    and grammar rules, reducing and reporting errors on behalf of
+    'module'.
+    """
+    parser = copy.copy(prototype)
+    parser.module = module
+    parser.errorfunc = module.p_error
+    return parser
+
+
+def _symbol(p, n):
+    """Return the n-th symbol of a reduction 'p'; None if not a token."""
+    if isinstance(p, yacc.YaccProduction):
+        return p.slice[n]
+    return p.symbol(n)
 
 
-def _track(p):
-    """Add position to root of reduced grammar rule."""
-    if isinstance(p[1], ast.Node):
-        if p[0] is not p[1]:
-            p[0].copy_pos(p[1])
-    else:
-        node = p[0]
-        node.lineno = p.lineno(1)
-        node.lexpos = p.lexpos(1)
+def _end(positions, p):
+    """
+    Return the offset of the end of the text of a reduction 'p', as
+    recorded in the PositionTable 'positions', or -1 if unknown.
+    """
+    for n in range(len(p) - 1, 0, -1):
+        span = getattr(_symbol(p, n), 'span', None)
+        if span is not None:
+            return span[1]
+        value = p[n]
+        while isinstance(value, list) and value:
+            value = value[-1]
+        if isinstance(value, ast.Node) and value.pos is not None:
+            return positions.entries[(value.pos << 1) + 1]
+    return -1
 
 
 class Parser:
@@ -63,11 +116,25 @@ class Parser:
         p[0] = ast.Program(p[1])
 
     def p_def_list(self, p):
-        """def_list : letdef def_list
-                    | typedef def_list
+        """def_list : def_list letdef
+                    | def_list typedef
                     | empty"""
+        if len(p) == 2:
+            # The stack is empty, so any error before was recovered from
+            # by dropping the tokens in error, without error productions.
+            self._recovering = False
+        elif self._recovering:
+            # A definition reduced while recovering is in error; drop it.
+            p[0] = p[1]
+            return
         self._expand_list(p)
 
+    def p_def_list_error(self, p):
+        """def_list : def_list error"""
+        # Skip a broken definition, up to the next 'let' or 'type'.
+        self._recovering = False
+        p[0] = p[1]
+
     def p_letdef(self, p):
         """letdef : LET REC def_seq
                   | LET def_seq"""
@@ -75,10 +142,10 @@ class Parser:
             p[0] = ast.LetDef(p[3], isRec=True)
         else:
             p[0] = ast.LetDef(p[2])
-        _track(p)
+        self._track(p)
 
     def p_def_seq(self, p):
-        """def_seq : def AND def_seq
+        """def_seq : def_seq AND def
                    | def"""
         self._expand_seq(p)
 
@@ -86,7 +153,7 @@ class Parser:
         """def : function_def
                | var_def"""
         p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_function_def(self, p):
         """function_def : GENID param_list COLON type EQ expr
@@ -95,10 +162,10 @@ class Parser:
             p[0] = ast.FunctionDef(p[1], p[2], p[6], p[4])
         else:
             p[0] = ast.FunctionDef(p[1], p[2], p[4])
-        _track(p)
+        self._track(p)
 
     def p_param_list(self, p):
-        """param_list : param param_list
+        """param_list : param_list param
                       | empty"""
         self._expand_list(p)
 
@@ -109,7 +176,7 @@ class Parser:
             p[0] = ast.Param(p[2], p[4])
         else:
             p[0] = ast.Param(p[1])
-        _track(p)
+        self._track(p)
 
     def p_type(self, p):
         """type : LPAREN type RPAREN
@@ -119,7 +186,7 @@ class Parser:
             p[0] = p[2]
         else:
             p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_builtin_type(self, p):
         """builtin_type : BOOL
@@ -128,7 +195,7 @@ class Parser:
                         | INT
                         | UNIT"""
         p[0] = ast.builtin_types_map[p[1]]()
-        _track(p)
+        self._track(p)
 
     def p_derived_type(self, p):
         """derived_type : array_type
@@ -136,7 +203,7 @@ class Parser:
                         | ref_type
                         | user_type"""
         p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_array_type(self, p):
         """array_type : ARRAY LBRACKET star_comma_seq RBRACKET OF type
@@ -145,31 +212,31 @@ class Parser:
             p[0] = ast.Array(p[6], p[3])
         else:
             p[0] = ast.Array(p[3])
-        _track(p)
+        self._track(p)
 
     def p_star_comma_seq(self, p):
-        """star_comma_seq : TIMES COMMA star_comma_seq
+        """star_comma_seq : star_comma_seq COMMA TIMES
                           | TIMES"""
         # We 'll be counting stars :)
         if len(p) == 4:
-            p[0] = p[3] + 1
+            p[0] = p[1] + 1
         else:
             p[0] = 1
 
     def p_function_type(self, p):
         """function_type : type ARROW type"""
         p[0] = ast.Function(p[1], p[3])
-        _track(p)
+        self._track(p)
 
     def p_ref_type(self, p):
         """ref_type : type REF"""
         p[0] = ast.Ref(p[1])
-        _track(p)
+        self._track(p)
 
     def p_user_type(self, p):
         """user_type : GENID"""
         p[0] = ast.User(p[1])
-        _track(p)
+        self._track(p)
 
     def p_empty(self, _):
         """empty :"""
@@ -220,22 +287,26 @@ class Parser:
             p[0] = ast.UnaryExpression(p[1], p[2])
         else:
             p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_begin_end_expr(self, p):
         """begin_end_expr : BEGIN expr END"""
         p[0] = p[2]
-        _track(p)
+        self._track(p)
+
+    def p_begin_end_expr_error(self, p):
+        """begin_end_expr : BEGIN error END"""
+        self._recover(p)
 
     def p_constructor_call_expr(self, p):
         """constructor_call_expr : CONID simple_expr_seq"""
         p[0] = ast.ConstructorCallExpression(p[1], p[2])
-        _track(p)
+        self._track(p)
 
     def p_simple_expr_seq(self, p):
-        """simple_expr_seq : simple_expr simple_expr_seq
+        """simple_expr_seq : simple_expr_seq simple_expr
                            | simple_expr"""
-        self._expand_seq(p, 1, 2)
+        self._expand_seq(p)
 
     def p_simple_expr(self, p):
         """simple_expr : array_simple_expr
@@ -251,68 +322,72 @@ class Parser:
                        | sconst_simple_expr
                        | uconst_simple_expr"""
         p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_array_simple_expr(self, p):
         """array_simple_expr : GENID LBRACKET expr_comma_seq RBRACKET"""
         p[0] = ast.ArrayExpression(p[1], p[3])
-        _track(p)
+        self._track(p)
 
     def p_paren_simple_expr(self, p):
         """paren_simple_expr : LPAREN expr RPAREN"""
         p[0] = p[2]
-        _track(p)
+        self._track(p)
+
+    def p_paren_simple_expr_error(self, p):
+        """paren_simple_expr : LPAREN error RPAREN"""
+        self._recover(p)
 
     def p_bang_simple_expr(self, p):
         """bang_simple_expr : BANG simple_expr"""
         p[0] = ast.UnaryExpression(p[1], p[2])
-        _track(p)
+        self._track(p)
 
     def p_bconst_simple_expr(self, p):
         """bconst_simple_expr : TRUE
                               | FALSE"""
         p[0] = ast.ConstExpression(ast.Bool(), p[1])
-        _track(p)
+        self._track(p)
 
     def p_cconst_simple_expr(self, p):
         """cconst_simple_expr : CCONST"""
         p[0] = ast.ConstExpression(ast.Char(), p[1])
-        _track(p)
+        self._track(p)
 
     def p_conid_simple_expr(self, p):
         """conid_simple_expr : CONID"""
         p[0] = ast.ConidExpression(p[1])
-        _track(p)
+        self._track(p)
 
     def p_iconst_simple_expr(self, p):
         """iconst_simple_expr : ICONST"""
         p[0] = ast.ConstExpression(ast.Int(), p[1])
-        _track(p)
+        self._track(p)
 
     def p_fconst_simple_expr(self, p):
         """fconst_simple_expr : FCONST"""
         p[0] = ast.ConstExpression(ast.Float(), p[1])
-        _track(p)
+        self._track(p)
 
     def p_genid_simple_expr(self, p):
         """genid_simple_expr : GENID"""
         p[0] = ast.GenidExpression(p[1])
-        _track(p)
+        self._track(p)
 
     def p_sconst_simple_expr(self, p):
         """sconst_simple_expr : SCONST"""
         p[0] = ast.ConstExpression(ast.String(), p[1])
-        _track(p)
+        self._track(p)
 
     def p_uconst_simple_expr(self, p):
         """uconst_simple_expr : LPAREN RPAREN"""
         p[0] = ast.ConstExpression(ast.Unit())
-        _track(p)
+        self._track(p)
 
     def p_delete_expr(self, p):
         """delete_expr : DELETE expr"""
         p[0] = ast.DeleteExpression(p[2])
-        _track(p)
+        self._track(p)
 
     def p_dim_expr(self, p):
         """dim_expr : DIM ICONST GENID
@@ -321,33 +396,41 @@ class Parser:
             p[0] = ast.DimExpression(p[3], p[2])
         else:
             p[0] = ast.DimExpression(p[2])
-        _track(p)
+        self._track(p)
 
     def p_for_expr(self, p):
         """for_expr : for_to_expr
                     | for_downto_expr"""
         p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_for_to_expr(self, p):
         """for_to_expr : FOR GENID EQ expr TO expr DO expr DONE"""
         p[0] = ast.ForExpression(p[2], p[4], p[6], p[8])
-        _track(p)
+        self._track(p)
 
     def p_for_downto_expr(self, p):
         """for_downto_expr : FOR GENID EQ expr DOWNTO expr DO expr DONE"""
         p[0] = ast.ForExpression(p[2], p[4], p[6], p[8], isDown=True)
-        _track(p)
+        self._track(p)
+
+    def p_for_expr_error(self, p):
+        """for_expr : FOR error DONE"""
+        self._recover(p)
 
     def p_function_call_expr(self, p):
         """function_call_expr : GENID simple_expr_seq"""
         p[0] = ast.FunctionCallExpression(p[1], p[2])
-        _track(p)
+        self._track(p)
 
     def p_in_expr(self, p):
         """in_expr : letdef IN expr"""
         p[0] = ast.LetInExpression(p[1], p[3])
-        _track(p)
+        self._track(p)
+
+    def p_in_expr_error(self, p):
+        """in_expr : LET error IN expr"""
+        self._recover(p)
 
     def p_if_expr(self, p):
         # WARNING: Changing order of clauses produces Syntax Errors,
@@ -358,38 +441,42 @@ class Parser:
             p[0] = ast.IfExpression(p[2], p[4], p[6])
         else:
             p[0] = ast.IfExpression(p[2], p[4])
-        _track(p)
+        self._track(p)
 
     def p_match_expr(self, p):
         """match_expr : MATCH expr WITH clause_seq END"""
         p[0] = ast.MatchExpression(p[2], p[4])
-        _track(p)
+        self._track(p)
+
+    def p_match_expr_error(self, p):
+        """match_expr : MATCH error END"""
+        self._recover(p)
 
     def p_clause_seq(self, p):
-        """clause_seq : clause PIPE clause_seq
+        """clause_seq : clause_seq PIPE clause
                       | clause"""
         self._expand_seq(p)
 
     def p_clause(self, p):
         """clause : pattern ARROW expr"""
         p[0] = ast.Clause(p[1], p[3])
-        _track(p)
+        self._track(p)
 
     def p_pattern(self, p):
         """pattern : complex_pattern
                    | simple_pattern"""
         p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_complex_pattern(self, p):
         """complex_pattern : CONID simple_pattern_seq"""
         p[0] = ast.Pattern(p[1], p[2])
-        _track(p)
+        self._track(p)
 
     def p_simple_pattern_seq(self, p):
-        """simple_pattern_seq : simple_pattern simple_pattern_seq
+        """simple_pattern_seq : simple_pattern_seq simple_pattern
                               | simple_pattern"""
-        self._expand_seq(p, list_idx=2)
+        self._expand_seq(p)
 
     def p_simple_pattern(self, p):
         """simple_pattern : LPAREN pattern RPAREN
@@ -407,74 +494,78 @@ class Parser:
             p[0] = p[2]
         else:
             p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_conid_simple_pattern(self, p):
         """conid_simple_pattern : CONID"""
         p[0] = ast.Pattern(p[1])
-        _track(p)
+        self._track(p)
 
     def p_genid_simple_pattern(self, p):
         """genid_simple_pattern : GENID"""
         p[0] = ast.GenidPattern(p[1])
-        _track(p)
+        self._track(p)
 
     def p_mfconst_simple_pattern(self, p):
         """mfconst_simple_pattern : FMINUS FCONST"""
         p[0] = ast.ConstExpression(ast.Float(), -p[2])
-        _track(p)
+        self._track(p)
 
     def p_pfconst_simple_pattern(self, p):
         """pfconst_simple_pattern : FPLUS FCONST"""
         p[0] = ast.ConstExpression(ast.Float(), p[2])
-        _track(p)
+        self._track(p)
 
     def p_miconst_simple_pattern(self, p):
         """miconst_simple_pattern : MINUS ICONST"""
         p[0] = ast.ConstExpression(ast.Int(), -p[2])
-        _track(p)
+        self._track(p)
 
     def p_piconst_simple_pattern(self, p):
         """piconst_simple_pattern : PLUS ICONST"""
         p[0] = ast.ConstExpression(ast.Int(), p[2])
-        _track(p)
+        self._track(p)
 
     def p_new_expr(self, p):
         """new_expr : NEW type"""
         p[0] = ast.NewExpression(p[2])
-        _track(p)
+        self._track(p)
 
     def p_while_expr(self, p):
         """while_expr : WHILE expr DO expr DONE"""
         p[0] = ast.WhileExpression(p[2], p[4])
-        _track(p)
+        self._track(p)
+
+    def p_while_expr_error(self, p):
+        """while_expr : WHILE error DONE"""
+        self._recover(p)
 
     def p_var_def(self, p):
         """var_def : array_var_def
                    | simple_var_def"""
         p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_array_var_def(self, p):
         """array_var_def : array_var_def_typed
                          | array_var_def_untyped"""
         p[0] = p[1]
-        _track(p)
+        self._track(p)
 
     def p_array_var_def_typed(self, p):
         """array_var_def_typed : MUTABLE GENID LBRACKET expr_comma_seq RBRACKET COLON type"""
         item_type = p[7]
         arr_type = ast.Array(item_type, len(p[4]))
         p[0] = ast.ArrayVariableDef(p[2], p[4], arr_type)
-        _track(p)
+        self._track(p)
 
     def p_array_var_def_untyped(self, p):
         """array_var_def_untyped : MUTABLE GENID LBRACKET expr_comma_seq RBRACKET"""
         p[0] = ast.ArrayVariableDef(p[2], p[4])
-        _track(p)
+        self._track(p)
 
     def p_expr_comma_seq(self, p):
-        """expr_comma_seq : expr COMMA expr_comma_seq
+        """expr_comma_seq : expr_comma_seq COMMA expr
                           | expr"""
         self._expand_seq(p)
 
@@ -487,14 +578,14 @@ class Parser:
             p[0] = ast.VariableDef(p[2], vartype)
         else:
             p[0] = ast.VariableDef(p[2])
-        _track(p)
+        self._track(p)
 
     def p_typedef(self, p):
         """typedef : TYPE tdef_and_seq"""
         p[0] = p[2]
 
     def p_tdef_and_seq(self, p):
-        """tdef_and_seq : tdef AND tdef_and_seq
+        """tdef_and_seq : tdef_and_seq AND tdef
                         | tdef"""
         self._expand_seq(p)
 
@@ -503,10 +594,10 @@ class Parser:
                 | builtin_type EQ constr_pipe_seq"""
         # NOTE: Flag redefinition of builtin_types during semantic analysis.
         p[0] = ast.TDef(p[1], p[3])
-        _track(p)
+        self._track(p)
 
     def p_constr_pipe_seq(self, p):
-        """constr_pipe_seq : constr PIPE constr_pipe_seq
+        """constr_pipe_seq : constr_pipe_seq PIPE constr
                            | constr"""
         self._expand_seq(p)
 
@@ -517,101 +608,287 @@ class Parser:
             p[0] = ast.Constructor(p[1], p[3])
         else:
             p[0] = ast.Constructor(p[1])
-        _track(p)
+        self._track(p)
 
     def p_type_seq(self, p):
-        """type_seq : type type_seq
+        """type_seq : type_seq type
                     | type"""
-        self._expand_seq(p, list_idx=2)
+        self._expand_seq(p)
 
     def p_error(self, p):
         """Signal syntax error"""
+        self._recovering = True
         if p is not None:
+            lines = getattr(self._lexer, 'lines', None)
+            if lines is None:
+                lineno, column = p.lineno, p.lexpos
+            else:
+                lineno, column = lines.position(p.lexpos)
             self.logger.error(
                 "%d:%d: error: Syntax error on token %s\t%s",
-                p.lineno,
-                p.lexpos,
+                lineno,
+                column,
                 p.type,
                 p.value
             )
         else:
             self.logger.error("Syntax error in unknown token")
 
-    def _expand_seq(self, p, last_idx=1, list_idx=3):
-        if len(p) == last_idx + 1:
-            p[0] = [p[last_idx]]
+    def _track(self, p):
+        """Record the position of the root of a reduced grammar rule."""
+        node, first = p[0], p[1]
+        positions = self.positions
+        entries = positions.entries
+        shared = None
+        if isinstance(first, ast.Node):
+            if node is first:
+                return
+            shared = first.pos
+            if shared is None:
+                node.pos = None
+                return
+            start = entries[shared << 1]
+        else:
+            symbol = _symbol(p, 1)
+            span = getattr(symbol, 'span', None)
+            if span is not None:
+                start = span[0]
+            elif self._offsets:
+                # The token holds an absolute offset.
+                start = getattr(symbol, 'lexpos', -1)
+            else:
+                start = positions.offset(
+                    getattr(symbol, 'lineno', 0), getattr(symbol, 'lexpos', 0)
+                )
+        end = -1 if start < 0 else _end(positions, p)
+        if node.pos is None and shared is not None and \
+                entries[(shared << 1) + 1] == end:
+            # Spanning the same text as its first child, as always when
+            # ends are unknown, the node shares its position and even
+            # the int object of its index.
+            node.pos = shared
+            return
+        # A node passed up, as from within parentheses, takes the
+        # position of the whole construct in a new entry, as its own
+        # may be shared.
+        node.pos = len(entries) >> 1
+        entries.append(start)
+        entries.append(end)
+
+    def _recover(self, p):
+        """Replace a construct skipped by error recovery."""
+        self._recovering = False
+        p[0] = ast.ErrorExpression()
+        self._track(p)
+
+    # Sequences and lists are left-recursive, so that each item is
+    # reduced as soon as it is parsed and appended in constant time.
+
+    def _expand_seq(self, p):
+        if len(p) == 2:
+            # first item
+            p[0] = [p[1]]
         else:
-            p[list_idx].insert(0, p[last_idx])
-            p[0] = p[list_idx]
+            p[1].append(p[len(p) - 1])
+            p[0] = p[1]
 
     def _expand_list(self, p):
         if p[1] is None:
-            # end of list
+            # start of list
             p[0] = []
         else:
-            p[2].insert(0, p[1])
-            p[0] = p[2]
+            p[1].append(p[2])
+            p[0] = p[1]
 
     parser = None
     tokens = lex.tokens
     logger = None
     verbose = False
+    _lexer = None
+
+    # Compact tables driving the fast engine; None for the PLY engine
+    tables = None
+
+    # Start symbol of the grammar
+    start = 'program'
+
+    # Callable receiving the actions of the fast engine, if tracing
+    trace = None
+
+    # Whether a syntax error is being recovered from
+    _recovering = False
+
+    # PositionTable of the nodes of the last parse
+    positions = None
+
+    # Whether the tokens of the parse hold absolute offsets in 'lexpos'
+    _offsets = False
 
     def __init__(self, debug=False, logger=None, optimize=True,
-                 start='program', verbose=False):
+                 start='program', verbose=False, cache_dir=None,
+                 engine='ply', trace=None):
         """
         Create a parser.
 
         By default, the parser is optimized (i.e. caches LALR tables
-        accross invocations).
+        accross invocations). The tables are cached in 'cache_dir', or
+        else in a per-user directory, and loaded without analysing the
+        grammar again.
+        The tables are loaded only once per process for each set of
+        build options, and shared by all parsers built with them; a
+        parser is then cheap to create and safe to use alongside others.
         If a 'logger' is not provided, create one.
         For detailed reporting on the tables construction, enable
         'debug' and check the 'parser.out' file.
         For manually specifying the initial state, modify 'start'.
         For echoing LR stack to stdout while parsing, enable 'verbose'.
+        For the LR driver over compact integer tables, which calls the
+        grammar rules directly, set 'engine' to 'fast'. It builds the
+        same ASTs and reports the same errors as PLY's driver, which
+        still serves 'verbose' parsing.
+        For tracing the actions of the fast engine, pass a callable
+        'trace', such as an lrdriver.ParserTrace, to receive them as
+        integer events. Parsers not tracing pay next to nothing for it.
         """
+        if engine not in _engines:
+            raise ValueError("Unknown parser engine: %s" % engine)
+        if trace is not None and engine != 'fast':
+            raise ValueError("Tracing requires the fast engine.")
         self.verbose = verbose
+        self.start = start
+        self.trace = trace
         if logger is None:
             self.logger = error.Logger()
         else:
             self.logger = logger
 
+        key = (self.__class__, start, debug, optimize, cache_dir)
+        with _yacc_parsers_lock:
+            prototype = _yacc_parsers.get(key)
+            if prototype is None:
+                prototype = self._build(start, debug, optimize, cache_dir)
+                _yacc_parsers[key] = prototype
+            if engine == 'fast':
+                self.tables = _lr_tables.get(key)
+                if self.tables is None:
+                    self.tables = lrdriver.LRTables(
+                        prototype, self.__class__
+                    )
+                    _lr_tables[key] = self.tables
+        self.parser = _clone_yacc_parser(prototype, self)
+
+        if verbose:
+            self.logger.info(
+                "%s: %s: %s",
+                __name__,
+                self.__class__.__name__,
+                'parser ready'
+            )
+
+    @classmethod
+    def _build(cls, start, debug, optimize, cache_dir):
+        """
+        Build a prototype PLY parser for the grammar rules of the class,
+        for _clone_yacc_parser to copy. If 'optimize' is enabled, load
+        its tables from the table cache in 'cache_dir', or store them
+        there if absent.
+        """
+        module = cls.__new__(cls)
         if start == 'program':
             errorlog = None
-            yaccfile = 'parsetab'
         else:
             # Explicitly silence warnings about unused rules when
-            # starting from a state other than the default. In addition,
-            # send parser cache to a special file, to avoid conflicts and
-            # make cleaning easy
+            # starting from a state other than the default.
             errorlog = yacc.NullLogger()
-            yaccfile = "%s_%s" % ('aux', start)
 
-        self.parser = yacc.yacc(
-            module=self,
+        # Tables are cached per start symbol, keyed by the grammar. If
+        # the cache cannot be written to, every process builds them.
+        picklefile = path = None
+        if optimize:
+            cache = tabcache.TableCache(cache_dir)
+            key = tabcache.digest(
+                module, 'p_', start, cls.precedence, sorted(cls.tokens),
+                yacc.__tabversion__
+            )
+            path = cache.path('parsetab_%s' % start, key, '.pickle')
+            if os.path.exists(path):
+                picklefile = path
+            else:
+                picklefile = cache.temporary(path)
+
+        parser = yacc.yacc(
+            module=module,
             errorlog=errorlog,
             debug=debug,
-            optimize=optimize,
+            optimize=picklefile is not None,
             start=start,
-            tabmodule=yaccfile
+            write_tables=False,
+            picklefile=picklefile
         )
-
-        if verbose:
-            self.logger.info(
-                "%s: %s: %s",
-                __name__,
-                self.__class__.__name__,
-                'parser ready'
-            )
-
-    def parse(self, data, lexer=None):
+        if picklefile not in (None, path):
+            cache.publish(picklefile, path)
+        for prod in parser.productions:
+            if prod.func:
+                prod.callable = _rule(getattr(cls, prod.func))
+        return parser
+
+    def parse(self, data, lexer=None, positions=None):
         """
         Parse the input and return the AST. If a lexer is not provided,
         create one on the fly.
+        Any token source with a token() method may stand in for the
+        lexer; to parse its tokens as they are, pass None as 'data'.
+
+        The positions of the nodes are recorded in the PositionTable
+        'positions', or else in a new one, kept in 'positions' of the
+        parser and of the Program. Their spans are recorded
+        if the tokens carry theirs, as with a 'trivia' lexer. Without
+        'data', positions are known only if the token source has the
+        input in 'lexdata' or the table already has its line index.
+
+        Syntax errors are reported and recovered from, resuming at the
+        next top-level definition or at the 'end', 'done', 'in' or ')'
+        closing the construct in error, so that a single parse reports
+        every independent error. Constructs skipped inside a definition
+        become ErrorExpressions; definitions skipped at the top level
+        are left out of the Program. If the input ends in error, the
+        Program holds the definitions preceding the error.
         """
         if lexer is None:
             lexer = lex.Lexer(logger=self.logger)
-        return self.parser.parse(data, lexer, debug=self.verbose)
+        self._lexer = lexer
+        self._recovering = False
+        if positions is None:
+            positions = ast.PositionTable()
+        self.positions = positions
+        self._offsets = getattr(lexer, 'lazy_positions', False)
+        if data is not None:
+            if not self._offsets:
+                positions.lines = lineindex.LineIndex(data)
+        elif positions.lines is None:
+            source = getattr(lexer, 'lexdata', None)
+            if source is not None:
+                positions.lines = lineindex.LineIndex(source)
+        if self.tables is not None and not self.verbose:
+            values = []
+            tree = self.tables.parse(self, lexer, data, values, self.trace)
+        else:
+            tree = self.parser.parse(data, lexer, debug=self.verbose)
+            values = None
+        if tree is None and self.start == 'program':
+            # The input ended in error; the stack starts with a def_list.
+            if values is None:
+                values = [
+                    getattr(symbol, 'value', None)
+                    for symbol in self.parser.symstack
+                ]
+            if len(values) > 1:
+                tree = ast.Program(values[1])
+        if self._offsets:
+            positions.lines = lexer.lines
+        if isinstance(tree, ast.Program):
+            tree.positions = positions
+        return tree
 
 
 def parse(data, start='program', logger=None):
@@ -631,3 +908,142 @@ def quiet_parse(data, start='program'):
     Explicitly silence errors/warnings.
     """
     return parse(data, start=start, logger=error.LoggerMock())
+
+
+def top_level_definitions(tokens):
+    """
+    Split a list of tokens into lists of tokens, one per top-level
+    definition, in order.
+
+    Top-level definitions start with 'let' or 'type', but so do 'let'
+    expressions, which differ in being closed by an 'in'. A 'let' whose
+    'in' arrives is thus merged into the definition before it, as in
+    fingerprint.Fingerprinter. Tokens before any 'let' or 'type' are
+    taken as a definition of their own.
+    """
+    segments = [[]]
+    starts = [True]
+
+    # Indices of segments starting with a 'let' awaiting its 'in'
+    pending = []
+    for tok in tokens:
+        toktype = tok.type
+        if toktype == 'IN':
+            if pending:
+                starts[pending.pop()] = False
+        elif toktype == 'LET' or toktype == 'TYPE':
+            if segments[-1]:
+                segments.append([])
+                starts.append(True)
+            if toktype == 'LET':
+                pending.append(len(segments) - 1)
+            else:
+                # Every pending 'let' starts a top-level definition.
+                pending.clear()
+        segments[-1].append(tok)
+
+    result = []
+    for segment, start in zip(segments, starts):
+        if start or not result:
+            result.append(segment)
+        else:
+            result[-1].extend(segment)
+    return [segment for segment in result if segment]
+
+
+# Identifiers of the input, as interned by the parent process; set in
+# the worker processes of parallel_parse.
+_worker_identifiers = None
+
+
+def _init_worker(names):
+    """Intern the identifiers 'names' in order, in a worker process."""
+    global _worker_identifiers  # pylint: disable=global-statement
+    _worker_identifiers = ident.IdentifierTable()
+    for name in names:
+        _worker_identifiers.intern(name)
+
+
+def _parse_definitions(data):
+    """
+    Parse the top-level definitions in 'data'. Return their list and
+    PositionTable, without its line index, or None if they hold errors.
+    Runs in worker processes of parallel_parse.
+    """
+    logger = error.LoggerMock()
+    lexer = lex.Lexer(logger=logger, engine='fast',
+                      identifiers=_worker_identifiers)
+    parser = Parser(logger=logger, start='def_list', engine='fast')
+    definitions = parser.parse(data, lexer)
+    if logger.errors:
+        return None
+    parser.positions.lines = None
+    return definitions, parser.positions
+
+
+def parallel_parse(data, processes=None, logger=None, min_size=1 << 17):
+    """
+    Parse the given string on a pool of 'processes' worker processes,
+    one per CPU by default, and return the AST of the program, equal
+    to that of parse, positions and identifiers included.
+
+    Inputs shorter than 'min_size' characters are parsed serially, as
+    starting the workers and sending back the subtrees would cost more
+    than the parse saves.
+
+    The input is lexed once to find its top-level definitions, which
+    are split into runs of about equal length. Every run is lexed and
+    parsed by a worker, and the resulting subtrees are sent back with
+    the arrays of their positions, and joined. Inputs with errors are
+    parsed serially instead, so that errors are reported to 'logger'
+    as parse would.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(data) < min_size:
+        return parse(data, logger=logger)
+    mock = error.LoggerMock()
+    lexer = lex.Lexer(logger=mock, engine='fast', trivia=True)
+    definitions = top_level_definitions(list(lexer.tokenize(data)))
+    if mock.errors or len(definitions) < 2:
+        return parse(data, logger=logger)
+
+    # A few runs per process, to even out the load
+    size = len(data) // (4 * processes) + 1
+    runs = []
+    offsets = []
+    first = None
+    for tokens in definitions:
+        if first is None:
+            first = tokens[0]
+        last = tokens[-1]
+        if last.span[1] - first.span[0] >= size or tokens is definitions[-1]:
+            runs.append(data[first.span[0]:last.span[1]])
+            offsets.append(first.span[0])
+            first = None
+
+    # Unpickling the subtrees allocates many objects that all stay
+    # alive; collecting garbage meanwhile only rescans them.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+                processes,
+                initializer=_init_worker,
+                initargs=(lexer.identifiers.names,)) as executor:
+            results = list(executor.map(_parse_definitions, runs))
+    finally:
+        if enabled:
+            gc.enable()
+    if any(result is None for result in results):
+        return parse(data, logger=logger)
+    program = []
+    positions = ast.PositionTable(lineindex.LineIndex(data))
+    for (definitions, table), offset in zip(results, offsets):
+        base = positions.extend(table)
+        positions.move(base, len(positions), offset)
+        if base:
+            ast.renumber(definitions, base)
+        program.extend(definitions)
+    program = ast.Program(program)
+    program.positions = positions
+    return program
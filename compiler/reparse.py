@@ -0,0 +1,137 @@
+"""
+# ----------------------------------------------------------------------
+# reparse.py
+#
+# Incremental parsing of Llama sources
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+#
+# A source is split at the bounds of its top-level definitions, found
+# from its tokens alone, and each definition is parsed on its own.
+# The subtrees of definitions are cached by a digest of their text, so
+# that parsing an edited source only parses the definitions changed
+# by the edit; the rest are reused, moved to their new offsets.
+# The positions of all versions share one PositionTable, where those
+# of each definition take a contiguous range of entries, and whose
+# line index is that of the last version.
+# ----------------------------------------------------------------------
+"""
+
+import collections
+import hashlib
+
+from compiler import ast, error, lex, lineindex, parse
+
+# A Program and the indices in its list of the definitions parsed
+# afresh, as opposed to reused from an earlier parse
+Reparse = collections.namedtuple('Reparse', ['program', 'changed'])
+
+
+class _TokenSource:
+    """A token source over a list of tokens, for the parser."""
+
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+
+    def token(self):
+        """Return the next token, or None at the end."""
+        return next(self._tokens, None)
+
+
+class IncrementalParser:
+    """
+    A parser of successive versions of a Llama source, reusing the
+    subtrees of the top-level definitions left unchanged.
+    """
+
+    def __init__(self, logger=None, engine='fast'):
+        """
+        Create a new incremental parser.
+        If a 'logger' is not provided, create one. Definitions are
+        parsed by a Parser of the given 'engine'.
+        """
+        if logger is None:
+            self.logger = error.Logger()
+        else:
+            self.logger = logger
+        self.lexer = lex.Lexer(logger=self.logger, engine='fast', trivia=True)
+        self.parser = parse.Parser(logger=self.logger, engine=engine)
+        self.positions = ast.PositionTable()
+
+        # Offset, subtrees and range of positions of every definition
+        # of the last source parsed without errors, by column and digest
+        # of its text
+        self._cache = {}
+
+    def parse(self, data):
+        """
+        Parse the string 'data', a new version of the source, and
+        return a Reparse of its Program.
+
+        Only definitions unlike any of the last version, in text or in
+        starting column, are parsed; their indices in the Program are
+        listed in 'changed'. Those left unchanged are shared with the
+        Program of the last version and moved in place to their new
+        offsets. Syntax errors are reported for the definitions parsed.
+        Definitions in error are parsed anew every time.
+        The Program carries in 'positions' the PositionTable shared by
+        all versions.
+        """
+        cache = self._cache
+        positions = self.positions
+        positions.lines = lineindex.LineIndex(data)
+        program = []
+        changed = set()
+
+        # Key, offset, subtrees and range of positions of every
+        # definition
+        entries = []
+        for tokens in parse.top_level_definitions(
+                list(self.lexer.tokenize(data))):
+            first = tokens[0]
+            start, end = first.span[0], tokens[-1].span[1]
+            digest = hashlib.blake2b(
+                data[start:end].encode('utf-8'),
+                digest_size=16
+            ).digest()
+            key = (first.lexpos, digest)
+            entry = cache.pop(key, None)
+            if entry is not None:
+                offset, items, base, size = entry
+                if offset != start:
+                    positions.move(base, base + size, start - offset)
+            else:
+                errors = self.logger.errors
+                base = len(positions)
+                tree = self.parser.parse(None, _TokenSource(tokens), positions)
+                size = len(positions) - base
+                items = tree.list if tree is not None else []
+                changed.update(range(len(program), len(program) + len(items)))
+                if self.logger.errors != errors:
+                    key = None
+            entries.append((key, start, items, base, size))
+            program.extend(items)
+
+        if len(positions) > 2 * sum(entry[-1] for entry in entries):
+            entries = self._compact(entries)
+        self._cache = {
+            entry[0]: entry[1:] for entry in entries if entry[0] is not None
+        }
+        program = ast.Program(program)
+        program.positions = self.positions
+        return Reparse(program, changed)
+
+    def _compact(self, entries):
+        """
+        Drop the positions of definitions no longer in the source, once
+        they make up most of the table. Return the entries of the
+        definitions, with their ranges moved.
+        """
+        old = self.positions
+        self.positions = ast.PositionTable(old.lines)
+        moved = []
+        for key, offset, items, base, size in entries:
+            new_base = self.positions.extend(old, base, base + size)
+            if new_base != base:
+                ast.renumber(items, new_base - base)
+            moved.append((key, offset, items, new_base, size))
+        return moved
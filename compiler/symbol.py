@@ -68,7 +68,7 @@ class Table:
     class _Entry:
         """An entry of the symbol table."""
         # Reference to the ast node that the entry represents.
-        # The node should contain the lineno and lexpos attributes.
+        # The node should have a position recorded.
         node = None
 
         # Reference to the symbol table scope containing the entry.
@@ -0,0 +1,114 @@
+"""
+# ----------------------------------------------------------------------
+# tabcache.py
+#
+# On-disk cache of the lexing and parsing tables generated by PLY
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+# ----------------------------------------------------------------------
+"""
+
+import hashlib
+import importlib.util
+import os
+import threading
+
+
+def default_directory():
+    """
+    Return the per-user cache directory: $LLAMA_CACHE_DIR if set,
+    otherwise 'llama' under $XDG_CACHE_HOME or ~/.cache.
+    """
+    directory = os.environ.get('LLAMA_CACHE_DIR')
+    if directory:
+        return directory
+    base = os.environ.get('XDG_CACHE_HOME')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'llama')
+
+
+def digest(rules, prefix, *extra):
+    """
+    Return a hex digest of the rules of object 'rules', i.e. its
+    attributes named with 'prefix', and of any 'extra' values.
+    A function rule contributes its regex or docstring, as PLY reads
+    it, and any other rule its value.
+    """
+    parts = [repr(value) for value in extra]
+    for name in sorted(dir(rules)):
+        if name.startswith(prefix):
+            rule = getattr(rules, name)
+            if callable(rule):
+                rule = getattr(rule, 'regex', rule.__doc__)
+            parts.append('%s=%r' % (name, rule))
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+
+class TableCache:
+    """
+    A directory of generated tables, keyed by a digest of the rules
+    they were generated from, so that stale tables are never loaded.
+
+    Entries are first written to a temporary file and then renamed
+    into place, so that processes sharing the cache never observe a
+    partially written entry. A cache that cannot be written to is
+    only read from.
+    """
+
+    def __init__(self, directory=None):
+        """
+        Make a cache in 'directory'. If none is provided, use the
+        per-user default.
+        """
+        if directory is None:
+            directory = default_directory()
+        self.directory = directory
+
+    def path(self, name, key, suffix):
+        """Return the path of the entry for 'name' with digest 'key'."""
+        return os.path.join(self.directory, '%s_%s%s' % (name, key, suffix))
+
+    def load_module(self, path):
+        """
+        Import and return the table module at 'path', or None if it is
+        not cached.
+        """
+        name = os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(module)
+        except OSError:
+            return None
+        return module
+
+    def temporary(self, path):
+        """
+        Return a path, private to the calling thread, to write the
+        entry at 'path' to before publishing it, or None if the cache
+        cannot be written to.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            return None
+        if not os.access(self.directory, os.W_OK):
+            return None
+        root, suffix = os.path.splitext(path)
+        return '%s_%d_%d%s' % (
+            root, os.getpid(), threading.get_ident(), suffix
+        )
+
+    @staticmethod
+    def publish(temporary, path):
+        """
+        Atomically move the entry written to 'temporary' to 'path'.
+        On failure, discard it; it is then regenerated next time.
+        """
+        try:
+            os.replace(temporary, path)
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
@@ -0,0 +1,210 @@
+"""
+# ----------------------------------------------------------------------
+# tokenbuffer.py
+#
+# Compact, column-oriented storage of Llama token streams
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+# ----------------------------------------------------------------------
+"""
+
+from array import array
+
+from ply import lex
+
+
+class TokenBuffer:
+    """
+    A token stream stored column-wise in typed arrays.
+
+    Each token occupies a kind byte and four 32-bit integers: its
+    absolute start offset, line, column and value index. Values implied
+    by the token kind (keywords, operators, booleans) are not stored;
+    all other values are stored once per distinct value in a pool,
+    shared among slices of the buffer.
+    Supports len(), random access and slicing. Accessing a single
+    token materializes it as a PLY LexToken.
+
+    A buffer made by a lexer also keeps the lexed source and the lexer
+    state at the start of every line, so that it can be relexed
+    incrementally after an edit.
+    A buffer of a lossless token stream also keeps the absolute end
+    offset of every token, from which the trivia between the tokens
+    can be recovered.
+    """
+
+    def __init__(self, types, implicit_values, ends=False):
+        """
+        Make a new empty buffer for tokens whose types are the
+        entries of 'types'. Values of the token types in
+        'implicit_values' are never stored.
+        If 'ends' is True, the end offsets of the tokens are kept too,
+        in the 'ends' array, which the producer fills.
+        """
+        # Token type of each token kind. Kinds index this tuple.
+        self.types = tuple(types)
+        self._kind_of = {toktype: k for k, toktype in enumerate(self.types)}
+        assert len(self.types) <= 256, 'Token kinds do not fit in a byte.'
+
+        # Values implied by the token type
+        self._implicit_values = implicit_values
+
+        # One entry per token
+        self.kinds = array('B')
+        self.offsets = array('i')
+        self.linenos = array('i')
+        self.columns = array('i')
+        self.value_ids = array('i')
+        self.ends = array('i') if ends else None
+
+        # Distinct explicit values and their indices
+        self.pool = []
+        self._pool_ids = {}
+
+        # Lexed source and encoded lexer state at the start of each
+        # line, if known. Shared among slices of the buffer.
+        self.source = None
+        self.line_states = array('i')
+
+    def append(self, toktype, value, lineno, column, offset):
+        """Append a token at the end of the buffer."""
+        kind = self._kind_of[toktype]
+        if toktype in self._implicit_values:
+            value_id = -1
+        else:
+            value_id = self._pool_id((kind, value), value)
+        self.kinds.append(kind)
+        self.offsets.append(offset)
+        self.linenos.append(lineno)
+        self.columns.append(column)
+        self.value_ids.append(value_id)
+
+    def _pool_id(self, key, value):
+        """Return the pool index of a value, pooling it if needed."""
+        value_id = self._pool_ids.get(key)
+        if value_id is None:
+            value_id = len(self.pool)
+            self.pool.append(value)
+            self._pool_ids[key] = value_id
+        return value_id
+
+    def extend_shifted(self, other, start, offset_delta, line_delta):
+        """
+        Append the tokens of 'other' from index 'start' on, moving them
+        'offset_delta' characters and 'line_delta' lines forward.
+        Both buffers must have the same token kinds.
+        """
+        assert other.types == self.types, 'Buffers differ in token kinds.'
+        if other.pool is self.pool:
+            value_ids = other.value_ids[start:]
+        else:
+            remap = [None] * len(other.pool)
+            for key, value_id in other._pool_ids.items():
+                remap[value_id] = self._pool_id(key, other.pool[value_id])
+            value_ids = (
+                remap[value_id] if value_id >= 0 else -1
+                for value_id in other.value_ids[start:]
+            )
+        self.kinds.extend(other.kinds[start:])
+        self.offsets.extend(
+            offset + offset_delta for offset in other.offsets[start:]
+        )
+        self.linenos.extend(
+            lineno + line_delta for lineno in other.linenos[start:]
+        )
+        self.columns.extend(other.columns[start:])
+        self.value_ids.extend(value_ids)
+        if self.ends is not None:
+            self.ends.extend(end + offset_delta for end in other.ends[start:])
+
+    # == RANDOM ACCESS ==
+
+    def type(self, i):
+        """Return the type of the i-th token."""
+        return self.types[self.kinds[i]]
+
+    def value(self, i):
+        """Return the value of the i-th token."""
+        value_id = self.value_ids[i]
+        if value_id < 0:
+            return self._implicit_values[self.types[self.kinds[i]]]
+        return self.pool[value_id]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._slice(key)
+        tok = lex.LexToken()
+        tok.type = self.type(key)
+        tok.value = self.value(key)
+        tok.lineno = self.linenos[key]
+        tok.lexpos = self.columns[key]
+        if self.ends is not None:
+            tok.span = (self.offsets[key], self.ends[key])
+        return tok
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _slice(self, key):
+        """Return a new buffer with the tokens in slice 'key'."""
+        other = TokenBuffer.__new__(TokenBuffer)
+        other.types = self.types
+        other._kind_of = self._kind_of
+        other._implicit_values = self._implicit_values
+        other.kinds = self.kinds[key]
+        other.offsets = self.offsets[key]
+        other.linenos = self.linenos[key]
+        other.columns = self.columns[key]
+        other.value_ids = self.value_ids[key]
+        other.ends = None if self.ends is None else self.ends[key]
+        other.pool = self.pool
+        other._pool_ids = self._pool_ids
+        other.source = self.source
+        other.line_states = self.line_states
+        return other
+
+    # == PARSER INTERFACE ==
+
+    def reader(self):
+        """
+        Return a token source over the buffer, usable in place of a
+        lexer by a parser, e.g. Parser.parse(None, buffer.reader()).
+        """
+        return TokenReader(self)
+
+    @property
+    def nbytes(self):
+        """Return the size of the per-token arrays in bytes."""
+        columns = [
+            self.kinds,
+            self.offsets,
+            self.linenos,
+            self.columns,
+            self.value_ids
+        ]
+        if self.ends is not None:
+            columns.append(self.ends)
+        return sum(column.itemsize * len(column) for column in columns)
+
+
+class TokenReader:
+    """A cursor over a TokenBuffer, providing the lexer interface."""
+
+    def __init__(self, buffer):
+        """Make a new reader positioned at the start of 'buffer'."""
+        self.buffer = buffer
+        self.index = 0
+
+        # Lexed source, for the positions of the tokens
+        self.lexdata = buffer.source
+
+    def token(self):
+        """Return the next token of the buffer or None at its end."""
+        if self.index >= len(self.buffer):
+            return None
+        tok = self.buffer[self.index]
+        self.index += 1
+        return tok
@@ -0,0 +1,114 @@
+"""
+# ----------------------------------------------------------------------
+# trivia.py
+#
+# Trivia of lossless Llama token streams
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+#
+# Trivia is the input between tokens: blanks, comments and any input
+# skipped while recovering from lexing errors. Lossless lexers record
+# only where the text of each token starts and ends; trivia is found
+# from these offsets and the source on demand.
+#
+# The trailing trivia of a token runs up to and including the first
+# newline after it that is not inside a block comment. The rest of
+# the trivia up to the next token is the leading trivia of that token.
+# The input before the first token leads it and the input after the
+# last token trails it, so that a token stream tiles its source.
+# ----------------------------------------------------------------------
+"""
+
+import re
+
+# Pieces of trivia: a newline, blanks, a line comment, the opening of a
+# block comment or any other single character.
+_trivia_pattern = r'(\n)|[ \t\r]+|--[^\n]*|(\(\*)|.'
+_trivia_regex = re.compile(_trivia_pattern, re.DOTALL)
+_trivia_byte_regex = re.compile(_trivia_pattern.encode('ascii'), re.DOTALL)
+
+# Block comment delimiters; openings are captured.
+_comment_regex = re.compile(r'(\(\*)|\*\)')
+_comment_byte_regex = re.compile(rb'(\(\*)|\*\)')
+
+
+def _comment_end(source, pos, limit, regex):
+    """
+    Return the end of the block comment opening at 'pos', or 'limit'
+    if it does not close before.
+    """
+    level = 0
+    for found in regex.finditer(source, pos, limit):
+        if found.lastindex == 1:
+            level += 1
+        else:
+            level -= 1
+            if level == 0:
+                return found.end()
+    return limit
+
+
+def trailing_end(source, end, limit):
+    """
+    Return the end of the trailing trivia of a token ending at offset
+    'end' of 'source', if the next token starts at 'limit'.
+    """
+    if isinstance(source, str):
+        match, comments = _trivia_regex.match, _comment_regex
+    else:
+        match, comments = _trivia_byte_regex.match, _comment_byte_regex
+    pos = end
+    while pos < limit:
+        found = match(source, pos, limit)
+        if found.lastindex == 1:
+            return found.end()
+        if found.lastindex == 2:
+            pos = _comment_end(source, pos, limit, comments)
+        else:
+            pos = found.end()
+    return limit
+
+
+def bounds(source, starts, ends):
+    """
+    Return the trivia of the tokens whose text spans from 'starts[i]'
+    to 'ends[i]' in 'source', as a list of (leading start, trailing
+    end) offset pairs: the i-th token is 'source[lead:trail]' with its
+    trivia, where 'lead, trail = bounds(...)[i]'.
+    """
+    pairs = []
+    leading = 0
+    last = len(starts) - 1
+    for i in range(last + 1):
+        if i < last:
+            trailing = trailing_end(source, ends[i], starts[i + 1])
+        else:
+            trailing = len(source)
+        pairs.append((leading, trailing))
+        leading = trailing
+    return pairs
+
+
+def attach(source, tokens):
+    """
+    Set the 'trivia' attribute of every token, each of which must
+    carry a 'span', to its pair of trivia bounds. Return the tokens.
+    """
+    pairs = bounds(
+        source,
+        [tok.span[0] for tok in tokens],
+        [tok.span[1] for tok in tokens]
+    )
+    for tok, pair in zip(tokens, pairs):
+        tok.trivia = pair
+    return tokens
+
+
+def pieces(source, starts, ends):
+    """
+    Generate the leading trivia, text and trailing trivia of every
+    token whose text spans from 'starts[i]' to 'ends[i]' in 'source'.
+    Joined, they reproduce the source, unless there are no tokens.
+    """
+    for (leading, trailing), start, end in zip(
+            bounds(source, starts, ends), starts, ends):
+        yield source[leading:start], source[start:end], source[end:trailing]
@@ -0,0 +1,407 @@
+"""
+# ----------------------------------------------------------------------
+# winnow.py
+#
+# Near-duplicate detection among Llama sources
+# http://courses.softlab.ntua.gr/compilers/2012a/llama2012.pdf
+#
+# Sources are fingerprinted by winnowing the hashes of the k-grams of
+# their tokens, with identifiers normalized, as in Schleimer et al.,
+# "Winnowing: Local Algorithms for Document Fingerprinting" (2003).
+# Any run of at least k + window - 1 tokens shared by two sources,
+# up to renaming, yields a fingerprint shared by both.
+# The fingerprints of a corpus are kept in an inverted index on disk,
+# along with the number of files holding each. Queries ignore the
+# fingerprints held by more than a fraction of the files, which come
+# from boilerplate shared across the corpus and whose postings grow
+# with it, so that a query costs time in proportion to its own
+# fingerprints times the cutoff, rather than to the size of the corpus.
+#
+# Usage: python -m compiler.winnow index INDEX FILE...
+#        python -m compiler.winnow query INDEX FILE...
+# ----------------------------------------------------------------------
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import os
+import sqlite3
+import sys
+
+from compiler import error, lex
+
+# Token types normalized to their type, since renaming does not matter
+_normalized_types = frozenset(('GENID', 'CONID'))
+
+# Modulus and base of the rolling k-gram hash
+_modulus = (1 << 61) - 1
+_base = 1000003
+
+# Default length of k-grams and of winnowing windows, in tokens
+default_k = 8
+default_window = 8
+
+# Default fraction of the indexed files above which a fingerprint is
+# ignored by queries. Fingerprints held by two files are never ignored.
+default_max_share = 0.1
+
+
+def _symbols(tokens):
+    """
+    Generate an integer for every token, depending only on its type
+    and, unless it is an identifier, its value.
+    """
+    cache = {}
+    for tok in tokens:
+        if tok.type in _normalized_types:
+            key = tok.type
+        else:
+            key = '%s %r' % (tok.type, tok.value)
+        symbol = cache.get(key)
+        if symbol is None:
+            digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8)
+            symbol = cache[key] = int.from_bytes(digest.digest(), 'big')
+        yield symbol % _modulus
+
+
+def kgram_hashes(tokens, k=default_k):
+    """Return the rolling hashes of every 'k' consecutive tokens."""
+    hashes = []
+    top = pow(_base, k - 1, _modulus)
+    window = collections.deque()
+    h = 0
+    for symbol in _symbols(tokens):
+        if len(window) == k:
+            h = (h - window.popleft() * top) % _modulus
+        window.append(symbol)
+        h = (h * _base + symbol) % _modulus
+        if len(window) == k:
+            hashes.append(h)
+    return hashes
+
+
+def winnow(hashes, window=default_window):
+    """
+    Return the set of hashes selected by winnowing: the minimum of
+    every 'window' consecutive hashes, the rightmost one on ties.
+    A sequence shorter than a window selects its minimum.
+    """
+    if len(hashes) < window:
+        return {min(hashes)} if hashes else set()
+    selected = set()
+    last = -1
+    # Indices of increasing hashes, candidates for the minimum
+    candidates = collections.deque()
+    for i, h in enumerate(hashes):
+        while candidates and hashes[candidates[-1]] >= h:
+            candidates.pop()
+        candidates.append(i)
+        if candidates[0] <= i - window:
+            candidates.popleft()
+        if i >= window - 1 and candidates[0] != last:
+            last = candidates[0]
+            selected.add(hashes[last])
+    return selected
+
+
+def fingerprints(data, k=default_k, window=default_window):
+    """Return the set of winnowed fingerprints of a Llama source."""
+    lexer = lex.Lexer(logger=error.LoggerMock(), engine='fast',
+                      max_errors=None)
+    return winnow(kgram_hashes(lexer.tokenize(data), k), window)
+
+
+def _fingerprint_file(path, k, window):
+    """
+    Return the fingerprints of the file at 'path'. Runs in worker
+    processes of Index.add.
+    """
+    with open(path, 'rb') as file:
+        return fingerprints(file.read(), k, window)
+
+
+class Index:
+    """
+    An inverted index from fingerprints to the files holding them,
+    stored in an SQLite database.
+    The k-gram and window lengths are fixed when the index is created.
+    """
+
+    def __init__(self, path, k=default_k, window=default_window):
+        """
+        Open the index at 'path', creating it with the given k-gram and
+        window lengths if it does not exist.
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS settings (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                hash INTEGER NOT NULL,
+                file INTEGER NOT NULL,
+                PRIMARY KEY (hash, file)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_file ON postings (file);
+            CREATE TABLE IF NOT EXISTS counts (
+                hash INTEGER PRIMARY KEY,
+                files INTEGER NOT NULL
+            );
+        ''')
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO settings VALUES (?, ?)',
+                (('k', k), ('window', window), ('files', 0))
+            )
+        settings = dict(self.connection.execute('SELECT * FROM settings'))
+        self.k = settings['k']
+        self.window = settings['window']
+
+    def close(self):
+        """Close the index."""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """Return the number of files indexed."""
+        cursor = self.connection.execute(
+            "SELECT value FROM settings WHERE name = 'files'"
+        )
+        return cursor.fetchone()[0]
+
+    def fingerprints(self, data):
+        """Return the fingerprints of a Llama source for this index."""
+        return fingerprints(data, self.k, self.window)
+
+    def add(self, paths, processes=None):
+        """
+        Fingerprint the files at 'paths' on a pool of 'processes' worker
+        processes, one per CPU by default, and index them, replacing
+        any earlier entries for the same paths.
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        processes = processes or os.cpu_count() or 1
+        if processes == 1 or len(paths) <= 1:
+            results = map(
+                _fingerprint_file,
+                paths,
+                [self.k] * len(paths),
+                [self.window] * len(paths)
+            )
+            self._store(paths, results)
+            return
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            results = executor.map(
+                _fingerprint_file,
+                paths,
+                [self.k] * len(paths),
+                [self.window] * len(paths),
+                chunksize=max(1, len(paths) // (4 * processes))
+            )
+            self._store(paths, results)
+
+    def _store(self, paths, results):
+        """Index the fingerprints in 'results' under 'paths'."""
+        with self.connection:
+            for path, hashes in zip(paths, results):
+                self._remove(path)
+                file = self.connection.execute(
+                    'INSERT INTO files (path, count) VALUES (?, ?)',
+                    (path, len(hashes))
+                ).lastrowid
+                self.connection.executemany(
+                    'INSERT INTO postings VALUES (?, ?)',
+                    ((h, file) for h in hashes)
+                )
+                self.connection.executemany(
+                    '''INSERT INTO counts VALUES (?, 1) ON CONFLICT (hash)
+                       DO UPDATE SET files = files + 1''',
+                    ((h,) for h in hashes)
+                )
+                self._count(1)
+
+    def _count(self, delta):
+        """Add 'delta' to the number of files indexed."""
+        self.connection.execute(
+            "UPDATE settings SET value = value + ? WHERE name = 'files'",
+            (delta,)
+        )
+
+    def _remove(self, path):
+        """Drop the entries for 'path', if any."""
+        row = self.connection.execute(
+            'SELECT id FROM files WHERE path = ?', (path,)
+        ).fetchone()
+        if row is not None:
+            self.connection.execute('''
+                DELETE FROM counts WHERE files = 1 AND hash IN (
+                    SELECT hash FROM postings WHERE file = ?
+                )
+            ''', row)
+            self.connection.execute('''
+                UPDATE counts SET files = files - 1 WHERE hash IN (
+                    SELECT hash FROM postings WHERE file = ?
+                )
+            ''', row)
+            self.connection.execute(
+                'DELETE FROM postings WHERE file = ?', row
+            )
+            self.connection.execute('DELETE FROM files WHERE id = ?', row)
+            self._count(-1)
+
+    def query(self, hashes, threshold=0.0, exclude=None,
+              max_share=default_max_share):
+        """
+        Return the indexed files sharing more than a fraction
+        'threshold' of the fingerprints in 'hashes', as a list of
+        (path, fraction) pairs, the most similar first. The file at
+        path 'exclude', if given, is left out.
+        Fingerprints held by more than a fraction 'max_share' of the
+        indexed files, and by more than two, are ignored, both in
+        finding the files and in the fractions.
+        """
+        cutoff = max(2, int(max_share * len(self)))
+        hashes = set(hashes)
+        if not hashes:
+            return []
+        cursor = self.connection.cursor()
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER PRIMARY KEY)'
+        )
+        cursor.execute('DELETE FROM query')
+        cursor.executemany(
+            'INSERT INTO query VALUES (?)', ((h,) for h in hashes)
+        )
+        common = cursor.execute('''
+            DELETE FROM query WHERE (
+                SELECT files FROM counts WHERE counts.hash = query.hash
+            ) > ?
+        ''', (cutoff,)).rowcount
+        # CROSS JOIN fixes the join order, so that SQLite looks up the
+        # postings of the query rather than scanning them all to group
+        rows = cursor.execute('''
+            SELECT files.path, COUNT(*)
+            FROM query
+            CROSS JOIN postings ON postings.hash = query.hash
+            CROSS JOIN files ON files.id = postings.file
+            GROUP BY postings.file
+        ''').fetchall()
+        cursor.execute('DELETE FROM query')
+        if exclude is not None:
+            exclude = os.path.abspath(exclude)
+        retained = len(hashes) - common
+        matches = [
+            (path, shared / retained)
+            for path, shared in rows
+            if shared / retained > threshold and path != exclude
+        ]
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
+
+    def query_file(self, path, threshold=0.0, max_share=default_max_share):
+        """
+        Return the files sharing more than a fraction 'threshold' of
+        the fingerprints of the file at 'path', other than itself,
+        as query does.
+        """
+        hashes = _fingerprint_file(path, self.k, self.window)
+        return self.query(hashes, threshold, path, max_share)
+
+
+def mk_cli_parser():
+    """Generate a cli parser for near-duplicate detection."""
+    cli_parser = argparse.ArgumentParser(
+        prog="python -m compiler.winnow",
+        description="Near-duplicate detection among Llama sources."
+    )
+    commands = cli_parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser(
+        "index",
+        help="Add files to an index, creating it if needed."
+    )
+    index.add_argument("index", help="The index file.")
+    index.add_argument("files", nargs="+", help="The files to index.")
+    index.add_argument(
+        "-j",
+        "--processes",
+        help="Number of worker processes; one per CPU by default.",
+        type=int,
+        default=None
+    )
+    index.add_argument(
+        "-k",
+        help="Length of k-grams, in tokens, for a new index.",
+        type=int,
+        default=default_k
+    )
+    index.add_argument(
+        "-w",
+        "--window",
+        help="Length of winnowing windows, in k-grams, for a new index.",
+        type=int,
+        default=default_window
+    )
+
+    query = commands.add_parser(
+        "query",
+        help="List the indexed files similar to each given file."
+    )
+    query.add_argument("index", help="The index file.")
+    query.add_argument("files", nargs="+", help="The files to look up.")
+    query.add_argument(
+        "-t",
+        "--threshold",
+        help="""\
+            Report files sharing more than this percentage of the\
+            fingerprints of a file. Defaults to 50.\
+            """,
+        type=float,
+        default=50.0
+    )
+    query.add_argument(
+        "-m",
+        "--max-share",
+        help="""\
+            Ignore fingerprints held by more than this percentage of the\
+            indexed files, as boilerplate. Defaults to %g.\
+            """ % (100 * default_max_share),
+        type=float,
+        default=100 * default_max_share
+    )
+    return cli_parser
+
+
+def main(argv):
+    """Index or look up the files given on the command line 'argv'."""
+    args = mk_cli_parser().parse_args(argv[1:])
+    if args.command == "index":
+        with Index(args.index, args.k, args.window) as index:
+            index.add(args.files, args.processes)
+            sys.stdout.write("%d files indexed.\n" % len(index))
+        return 0
+    with Index(args.index) as index:
+        for path in args.files:
+            for match, fraction in index.query_file(
+                    path, args.threshold / 100, args.max_share / 100):
+                sys.stdout.write(
+                    "%s\t%s\t%.1f%%\n" % (path, match, 100 * fraction)
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -12,9 +12,11 @@
 import argparse
 import collections
 import logging
+import mmap
+import os
 import sys
 
-from compiler import lex, parse, error
+from compiler import lex, lrdriver, parse, error
 
 # Compiler invocation options and switches.
 # Available to all modules.
@@ -71,6 +73,51 @@ def mk_cli_parser():
         default=False
     )
 
+    cli_parser.add_argument(
+        "-le",
+        "--lexer_engine",
+        help="""\
+            Select the lexing engine: 'ply' (default) or the single-pass\
+            'fast' engine.\
+            """,
+        choices=("ply", "fast"),
+        default="ply"
+    )
+
+    cli_parser.add_argument(
+        "-lp",
+        "--lexer_profile",
+        help="""\
+            Report match counts, lengths and times of every lexer rule\
+            and lexer state transitions to stderr.\
+            """,
+        action="store_true",
+        default=False
+    )
+
+    cli_parser.add_argument(
+        "-fp",
+        "--fingerprint",
+        help="""\
+            Print the fingerprint of the input tokens, which ignores\
+            layout and comments, and of each top-level definition,\
+            unless the input has lexical errors.\
+            """,
+        action="store_true",
+        default=False
+    )
+
+    cli_parser.add_argument(
+        "-mm",
+        "--mmap",
+        help="""\
+            Map the input file into memory and lex its bytes in place,\
+            without decoding it. Requires the 'fast' lexing engine.\
+            """,
+        action="store_true",
+        default=False
+    )
+
     cli_parser.add_argument(
         "-pv",
         "--parser_verbose",
@@ -82,6 +129,27 @@ def mk_cli_parser():
         default=False
     )
 
+    cli_parser.add_argument(
+        "-pe",
+        "--parser_engine",
+        help="""\
+            Select the parsing engine: 'ply' (default) or the 'fast' LR\
+            driver over compact tables.\
+            """,
+        choices=("ply", "fast"),
+        default="ply"
+    )
+
+    cli_parser.add_argument(
+        "-pt",
+        "--parser_trace",
+        help="""\
+            Record every parsing action in this file, as native 32-bit\
+            integer triples. Requires the 'fast' parsing engine.\
+            """,
+        default=None
+    )
+
     cli_parser.add_argument(
         "-pd",
         "--parser_debug",
@@ -91,31 +159,68 @@ def mk_cli_parser():
         action="store_true",
         default=False
     )
+
+    cli_parser.add_argument(
+        "-cd",
+        "--cache_dir",
+        help="""\
+            Cache the lexing and parsing tables in this directory instead\
+            of the per-user default ($LLAMA_CACHE_DIR or ~/.cache/llama).\
+            """,
+        default=None
+    )
     return cli_parser
 
 
-def read_program(input_file):
+def open_program(input_file):
     """
-    Read input from file or stdin (if a file is not provided).
-    Return read program as a single string.
+    Open input file or stdin (if a file is not provided) for reading.
+    Return the opened file.
     """
     if input_file == "<stdin>":
         sys.stdout.write("Reading from stdin (type <EOF> to end):\n")
         sys.stdout.flush()
-        data = sys.stdin.read()
-    else:
-        try:
-            file = open(input_file)
-            data = file.read()
-            file.close()
-        except IOError:
-            sys.exit(
-                "Could not open file %s for reading. Aborting."
-                % input_file
-            )
+        return sys.stdin
+    try:
+        return open(input_file)
+    except IOError:
+        sys.exit(
+            "Could not open file %s for reading. Aborting."
+            % input_file
+        )
+
+
+def read_program(input_file):
+    """
+    Read input from file or stdin (if a file is not provided).
+    Return read program as a single string.
+    """
+    file = open_program(input_file)
+    data = file.read()
+    if file is not sys.stdin:
+        file.close()
     return data
 
 
+def map_program(input_file):
+    """
+    Map the input file into memory, read-only.
+    Return the mapping, or empty bytes if the file is empty.
+    """
+    if input_file == "<stdin>":
+        sys.exit("Cannot map stdin into memory. Aborting.")
+    try:
+        with open(input_file, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except IOError:
+        sys.exit(
+            "Could not open file %s for reading. Aborting."
+            % input_file
+        )
+
+
 def main():
     """One function to invoke them all!"""
 
@@ -128,18 +233,40 @@ def main():
     OPTS["output"] = args.output
     OPTS["prepare"] = args.prepare
     OPTS["lexer_verbose"] = args.lexer_verbose
+    OPTS["lexer_engine"] = args.lexer_engine
+    OPTS["lexer_profile"] = args.lexer_profile
+    OPTS["fingerprint"] = args.fingerprint
+    OPTS["mmap"] = args.mmap
     OPTS["parser_verbose"] = args.parser_verbose
+    OPTS["parser_engine"] = args.parser_engine
+    OPTS["parser_trace"] = args.parser_trace
     OPTS["parser_debug"] = args.parser_debug
+    OPTS["cache_dir"] = args.cache_dir
 
     lexer = lex.Lexer(
         logger=error.Logger(inputfile=OPTS["input"], level=logging.DEBUG),
-        verbose=OPTS["lexer_verbose"]
+        verbose=OPTS["lexer_verbose"],
+        engine=OPTS["lexer_engine"],
+        # The verbose parser prints the line of every token.
+        lazy_positions=(
+            OPTS["lexer_engine"] == "fast" and not OPTS["parser_verbose"]
+        ),
+        cache_dir=OPTS["cache_dir"],
+        profile=OPTS["lexer_profile"],
+        fingerprint=OPTS["fingerprint"]
     )
 
+    if OPTS["parser_trace"] and OPTS["parser_engine"] != "fast":
+        sys.exit("Tracing the parser requires the 'fast' parsing engine.")
+    trace = lrdriver.ParserTrace() if OPTS["parser_trace"] else None
+
     parser = parse.Parser(
         debug=OPTS["parser_debug"],
         logger=error.Logger(inputfile=OPTS["input"], level=logging.DEBUG),
-        verbose=OPTS["parser_verbose"]
+        verbose=OPTS["parser_verbose"],
+        cache_dir=OPTS["cache_dir"],
+        engine=OPTS["parser_engine"],
+        trace=trace
     )
 
     # Stop here if this a dry run.
@@ -147,11 +274,35 @@ def main():
         print("Finished generating lexer and parser tables. Exiting...")
         return
 
-    # Get some input.
-    data = read_program(OPTS["input"])
+    if OPTS["mmap"] and OPTS["lexer_engine"] != "fast":
+        sys.exit("Mapping the input requires the 'fast' lexing engine.")
 
     # Lex, parse and construct the AST.
-    parser.parse(data=data, lexer=lexer)
+    if OPTS["mmap"]:
+        data = map_program(OPTS["input"])
+        parser.parse(data=data, lexer=lexer)
+    elif OPTS["lexer_engine"] == "fast":
+        # Stream the input through the lexer instead of reading it whole.
+        file = open_program(OPTS["input"])
+        lexer.input_stream(file)
+        parser.parse(data=None, lexer=lexer)
+        if file is not sys.stdin:
+            file.close()
+    else:
+        data = read_program(OPTS["input"])
+        parser.parse(data=data, lexer=lexer)
+
+    if trace is not None:
+        with open(OPTS["parser_trace"], "wb") as file:
+            trace.events.tofile(file)
+
+    if OPTS["lexer_profile"]:
+        sys.stderr.write(lexer.profile.format() + "\n")
+
+    if OPTS["fingerprint"] and lexer.fingerprint is not None:
+        print(lexer.fingerprint.digest)
+        for digest in lexer.fingerprint.definitions:
+            print("  " + digest)
 
     # On lexing/parsing error, abort further compilation.
     if not (lexer.logger.success or parser.logger.success):
@@ -0,0 +1,55 @@
+"""
+# ----------------------------------------------------------------------
+# lexbench.py
+#
+# Benchmark of the lexer engines
+#
+# Lexes the programs of tests/correct, concatenated and repeated SCALE
+# times, with each lexer engine, and reports the best time of a few
+# runs in CPU seconds, along with the throughput in tokens per second.
+#
+# Usage: python -m tests.lexbench [SCALE]
+# ----------------------------------------------------------------------
+"""
+
+import sys
+import time
+
+from compiler import error, lex
+from tests import parsebench
+
+
+def best_time(engine, data, repeat=7):
+    """
+    Return the least CPU time taken by 'engine' to lex 'data', and the
+    number of tokens.
+    """
+    best = None
+    for _ in range(repeat):
+        lexer = lex.Lexer(logger=error.LoggerMock(), engine=engine)
+        count = 0
+        start = time.process_time()
+        for _ in lexer.tokenize(data):
+            count += 1
+        elapsed = time.process_time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, count
+
+
+def main(argv):
+    """Report the lexing time of every engine, scaled by 'argv[1]'."""
+    scale = int(argv[1]) if len(argv) > 1 else 60
+    data = parsebench.corpus(scale)
+    times = {}
+    for engine in ("ply", "fast"):
+        times[engine], count = best_time(engine, data)
+        sys.stdout.write("%-5s %8d tokens %8.3f s %10.0f tokens/s\n" % (
+            engine, count, times[engine], count / times[engine]
+        ))
+    sys.stdout.write("speedup %.2fx\n" % (times["ply"] / times["fast"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
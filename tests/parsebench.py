@@ -0,0 +1,137 @@
+"""
+# ----------------------------------------------------------------------
+# parsebench.py
+#
+# Benchmark of the parser engines
+#
+# Parses the programs of tests/correct, concatenated and repeated
+# SCALE times, with each parser engine, from tokens lexed beforehand,
+# and reports the best time of a few runs.
+# Given numbers of PROCESSES, parses the same source from scratch on
+# as many worker processes instead, and reports the speedup over a
+# serial parse, along with the costs parallel parsing adds to it:
+# lexing the source to split it, and sending the subtrees back.
+#
+# Usage: python -m tests.parsebench [SCALE [PROCESSES...]]
+# ----------------------------------------------------------------------
+"""
+
+import os
+import pickle
+import sys
+import time
+
+from compiler import error, lex, parse
+
+
+class _TokenList:
+    """A token source replaying a list of tokens."""
+
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+
+    def token(self):
+        return next(self._tokens, None)
+
+
+def corpus(scale):
+    """Return the programs of tests/correct, repeated 'scale' times."""
+    path = os.path.join(os.path.dirname(__file__), "correct")
+    programs = []
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name)) as program:
+            programs.append(program.read())
+    return "\n".join(programs * scale)
+
+
+def best_time(engine, tokens, repeat=5):
+    """Return the least time taken by 'engine' to parse 'tokens'."""
+    parser = parse.Parser(logger=error.LoggerMock(), engine=engine)
+    best = None
+    for _ in range(repeat):
+        source = _TokenList(tokens)
+        start = time.perf_counter()
+        parser.parse(None, source)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def best_parallel_time(data, processes, repeat=3):
+    """
+    Return the least time taken to parse 'data' on 'processes' worker
+    processes, or serially if 'processes' is 0.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if processes:
+            parse.parallel_parse(data, processes, error.LoggerMock(), 0)
+        else:
+            parse.quiet_parse(data)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def parallel_costs(data, repeat=3):
+    """
+    Return the least times taken, in a single process, to split 'data'
+    into top-level definitions and to pickle and unpickle its subtrees
+    and positions, as parallel_parse does.
+    """
+    parser = parse.Parser(logger=error.LoggerMock())
+    tree = parser.parse(data)
+    results = (tree.list, parser.positions)
+    split = transfer = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lexer = lex.Lexer(logger=error.LoggerMock(), engine='fast',
+                          trivia=True)
+        parse.top_level_definitions(list(lexer.tokenize(data)))
+        middle = time.perf_counter()
+        pickle.loads(pickle.dumps(results))
+        end = time.perf_counter()
+        if split is None or middle - start < split:
+            split = middle - start
+        if transfer is None or end - middle < transfer:
+            transfer = end - middle
+    return split, transfer
+
+
+def main(argv):
+    """
+    Report the parsing time of every engine, scaled by 'argv[1]', or
+    of parallel parsing on every number of processes in 'argv[2:]'.
+    """
+    if len(argv) > 2:
+        data = corpus(int(argv[1]))
+        serial = best_parallel_time(data, 0)
+        split, transfer = parallel_costs(data)
+        sys.stdout.write(
+            "%d chars on %d CPUs\n" % (len(data), os.cpu_count() or 1)
+        )
+        sys.stdout.write("serial     %8.3f s\n" % serial)
+        sys.stdout.write("split      %8.3f s\n" % split)
+        sys.stdout.write("transfer   %8.3f s\n" % transfer)
+        for processes in map(int, argv[2:]):
+            elapsed = best_parallel_time(data, processes)
+            sys.stdout.write("%2d workers %8.3f s  speedup %.2fx\n" % (
+                processes, elapsed, serial / elapsed
+            ))
+        return 0
+    scale = int(argv[1]) if len(argv) == 2 else 20
+    tokens = list(lex.quiet_tokenize(corpus(scale)))
+    times = {engine: best_time(engine, tokens) for engine in ("ply", "fast")}
+    for engine, elapsed in sorted(times.items()):
+        sys.stdout.write("%-5s %8d tokens %8.3f s %10.0f tokens/s\n" % (
+            engine, len(tokens), elapsed, len(tokens) / elapsed
+        ))
+    sys.stdout.write("speedup %.2fx\n" % (times["ply"] / times["fast"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,111 @@
+"""
+# ----------------------------------------------------------------------
+# pathological.py
+#
+# Generator of adversarial inputs for the lexer
+#
+# Each generator takes a size in characters and returns one line of
+# Llama source that stresses a rule known to be easy to make
+# super-linear: long runs inside comments, long or unterminated
+# string literals, deep comment nesting and blanks trailing at the
+# end of the input, the only line left without a final newline.
+#
+# Usage: python -m tests.pathological NAME SIZE > input.lla
+# ----------------------------------------------------------------------
+"""
+
+import sys
+
+
+def paren_comment(size):
+    """A comment full of opening parentheses."""
+    return "(* " + "(" * size + " *)\n"
+
+
+def star_comment(size):
+    """A comment full of stars and parentheses that never nest."""
+    return "(* " + "*(" * (size // 2) + " *)\n"
+
+
+def nested_comments(size):
+    """Comments nested as deeply as the size allows."""
+    return "(*" * (size // 4) + "*)" * (size // 4) + "\n"
+
+
+def unterminated_comment(size):
+    """A comment that is never closed."""
+    return "(* " + "a(*)" * (size // 4) + "\n"
+
+
+def unterminated_string(size):
+    """A string literal that runs to the end of the line."""
+    return '"' + "a" * size + "\n"
+
+
+def escape_run(size):
+    """An unterminated string literal made only of escapes."""
+    return '"' + "\\\\" * (size // 2) + "\n"
+
+
+def closed_escape_run(size):
+    """A proper string literal made only of escapes."""
+    return '"' + "\\\\" * (size // 2) + '"\n'
+
+
+def hex_run(size):
+    """An unterminated string of truncated hexadecimal escapes."""
+    return '"' + "\\x4" * (size // 3) + "\n"
+
+
+def quotes(size):
+    """Many short string literals, the last one unterminated."""
+    return '"a' * (size // 2) + "\n"
+
+
+def char_quotes(size):
+    """A run of single quotes."""
+    return "'" * size + "\n"
+
+
+def illegal_run(size):
+    """A run of illegal characters."""
+    return "$" * size + "\n"
+
+
+def trailing_blanks(size):
+    """A definition followed by blanks up to the end of the input."""
+    return "let x = 1" + " \t\r" * (size // 3)
+
+
+generators = {
+    func.__name__: func
+    for func in (
+        paren_comment,
+        star_comment,
+        nested_comments,
+        unterminated_comment,
+        unterminated_string,
+        escape_run,
+        closed_escape_run,
+        hex_run,
+        quotes,
+        char_quotes,
+        illegal_run,
+        trailing_blanks
+    )
+}
+
+
+def main(argv):
+    """Write the input named by 'argv[1]', of size 'argv[2]', to stdout."""
+    if len(argv) != 3 or argv[1] not in generators:
+        sys.stderr.write(
+            "Usage: %s {%s} SIZE\n" % (argv[0], ",".join(sorted(generators)))
+        )
+        return 1
+    sys.stdout.write(generators[argv[1]](int(argv[2])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
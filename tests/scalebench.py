@@ -0,0 +1,122 @@
+"""
+# ----------------------------------------------------------------------
+# scalebench.py
+#
+# Benchmark of the growth of lexing and parsing times with the input
+#
+# Lexes the adversarial inputs of tests/pathological with each lexer
+# engine, at SIZE and at twice SIZE characters, and parses programs
+# holding lists of ITEMS and of twice ITEMS items, and reports the
+# ratio of the best times of a few runs. Doubling the input should
+# about double the time; ratios above MAX_RATIO are flagged as
+# super-linear and make the exit status nonzero.
+#
+# Usage: python -m tests.scalebench [SIZE [ITEMS]]
+# ----------------------------------------------------------------------
+"""
+
+import itertools
+import sys
+import time
+
+from compiler import error, lex, parse
+from tests import pathological
+
+# Ratio of times for twice the input above which growth is flagged,
+# generous to absorb timing noise
+MAX_RATIO = 3.5
+
+# Generators of programs holding a list of the given length
+programs = {
+    'def_list': lambda n: "".join(
+        "let x%d = %d\n" % (i, i) for i in range(n)
+    ),
+    'clause_seq': lambda n: "let f x = match x with %s end" % " | ".join(
+        "%d -> %d" % (i, i) for i in range(n)
+    ),
+    'simple_expr_seq': lambda n: "let y = f %s" % " ".join(
+        "%d" % i for i in range(n)
+    ),
+    'expr_comma_seq': lambda n: "let z = a[%s]" % ", ".join(
+        "%d" % i for i in range(n)
+    ),
+    'constr_pipe_seq': lambda n: "type t = %s" % " | ".join(
+        "C%d of int" % i for i in range(n)
+    )
+}
+
+
+def best_lex_time(engine, data, repeat=5):
+    """Return the least time taken by 'engine' to lex 'data'."""
+    best = None
+    for _ in range(repeat):
+        lexer = lex.Lexer(
+            logger=error.LoggerMock(),
+            engine=engine,
+            max_errors=None
+        )
+        start = time.perf_counter()
+        for _ in lexer.tokenize(data):
+            pass
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def lex_ratios(size):
+    """
+    Yield the engine, input name and ratio of lexing times for inputs
+    of twice 'size' and of 'size' characters, for every input.
+    """
+    for engine in ("ply", "fast"):
+        for name, generate in sorted(pathological.generators.items()):
+            small = best_lex_time(engine, generate(size))
+            large = best_lex_time(engine, generate(2 * size))
+            yield engine, name, large / max(small, 1e-4)
+
+
+def best_parse_time(data, repeat=5):
+    """Return the least time taken to parse 'data'."""
+    best = None
+    for _ in range(repeat):
+        parser = parse.Parser(logger=error.LoggerMock())
+        start = time.perf_counter()
+        parser.parse(data)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def parse_ratios(items):
+    """
+    Yield the engine, list name and ratio of parsing times for lists
+    of twice 'items' and of 'items' items, for every list.
+    """
+    for name, generate in sorted(programs.items()):
+        small = best_parse_time(generate(items))
+        large = best_parse_time(generate(2 * items))
+        yield "parse", name, large / max(small, 1e-4)
+
+
+def main(argv):
+    """
+    Report the growth of lexing times from size 'argv[1]', and of
+    parsing times from 'argv[2]' list items, to twice those. Return 1
+    if any is super-linear, else 0.
+    """
+    size = int(argv[1]) if len(argv) > 1 else 1 << 16
+    items = int(argv[2]) if len(argv) > 2 else 1 << 12
+    status = 0
+    for engine, name, ratio in itertools.chain(
+            lex_ratios(size), parse_ratios(items)):
+        flag = ""
+        if ratio >= MAX_RATIO:
+            flag, status = "  super-linear", 1
+        sys.stdout.write("%-5s %-22s %6.2fx%s\n" % (engine, name, ratio, flag))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
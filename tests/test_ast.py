@@ -1,7 +1,7 @@
 import itertools
 import unittest
 
-from compiler import ast, parse
+from compiler import ast, lineindex, parse
 
 # pylint: disable=no-member
 
@@ -83,3 +83,46 @@ class TestAST(unittest.TestCase):
         i2float.shouldnt.equal(ast.User("foo"))
         i2float.shouldnt.equal(ast.Ref(ast.Int()))
         i2float.shouldnt.equal(ast.Array(ast.Int()))
+
+
+class TestPositionTable(unittest.TestCase):
+    """Test the side table of AST positions."""
+
+    def test_table(self):
+        table = ast.PositionTable(lineindex.LineIndex("ab\ncdef\ng\n"))
+        node, other = ast.User("foo"), ast.User("bar")
+        table.position(node).should.be(None)
+        node.pos = table.add(table.offset(2, 2), 6)
+        other.pos = table.add(table.offset(3, 1))
+        len(table).should.equal(2)
+        table.position(node).should.equal((2, 2))
+        table.span(node).should.equal((4, 6))
+        table.span(other).should.be(None)
+        table.offset(5, 1).should.equal(-1)
+
+        table.move(0, 1, 4)
+        table.position(node).should.equal((3, 1))
+        table.span(node).should.equal((8, 10))
+        table.position(other).should.equal((3, 1))
+        table.move(0, 2, -2)
+        table.span(node).should.equal((6, 8))
+        table.position(other).should.equal((2, 4))
+        table.span(other).should.be(None)
+
+        merged = ast.PositionTable(table.lines)
+        merged.add(0)
+        base = merged.extend(table, 1)
+        base.should.equal(1)
+        ast.renumber([other], base - 1)
+        merged.position(other).should.equal((2, 4))
+        ast.PositionTable().position(other).should.be(None)
+        node.should.equal(ast.User("foo"))
+
+    def test_slots(self):
+        node = ast.ArrayVariableDef("a", 2, ast.Int())
+        hasattr(node, "__dict__").should.be(False)
+        node.pos.should.be(None)
+        attributes = node.attributes()
+        sorted(attributes).should.equal(["dimensions", "name", "type"])
+        attributes["type"].should.equal(ast.Int())
+        sorted(ast.Program([node]).attributes()).should.equal(["list"])
@@ -0,0 +1,77 @@
+import unittest
+
+from compiler import error, fingerprint, lex
+
+# pylint: disable=no-member
+
+
+class TestFingerprint(unittest.TestCase):
+    """Test the semantic fingerprints of token streams."""
+
+    program = (
+        "let x = let y = 1 in y\n"
+        "let rec f a = a and g b = b\n"
+        "type t = A | B\n"
+        "let z = (let q = 2.5 in q) +. 1.0"
+    )
+
+    @staticmethod
+    def _fingerprint(data, engine="fast"):
+        lexer = lex.Lexer(
+            logger=error.LoggerMock(),
+            engine=engine,
+            fingerprint=True
+        )
+        list(lexer.tokenize(data))
+        return lexer.fingerprint
+
+    def test_definitions(self):
+        result = self._fingerprint(self.program)
+        result.definitions.should.have.length_of(4)
+        for definition, text in zip(
+                result.definitions, self.program.split("\n")):
+            self._fingerprint(text).definitions.should.equal([definition])
+
+    def test_layout(self):
+        result = self._fingerprint(self.program)
+        for engine in ("ply", "fast"):
+            self._fingerprint(
+                "-- A program\n"
+                "let x=let y=1 in (* y *) y let rec f a = a\n"
+                "  and g b = b type t = A|B\n"
+                "let z = (let q = 2.50 in q) +. 1.00",
+                engine
+            ).should.equal(result)
+
+    def test_changes(self):
+        result = self._fingerprint(self.program)
+        for changed in (
+                self.program.replace("y = 1", "y = 2"),
+                self.program.replace("g b", "h b"),
+                self.program.replace("2.5", "'a'")):
+            other = self._fingerprint(changed)
+            other.digest.shouldnt.equal(result.digest)
+            len(set(other.definitions) & set(result.definitions)).should.equal(
+                3
+            )
+
+    def test_streams(self):
+        tokens = list(lex.quiet_tokenize(self.program))
+        fingerprint.fingerprint(tokens).should.equal(
+            self._fingerprint(self.program)
+        )
+        fingerprint.fingerprint(
+            lex.quiet_tokenize("1 + 2 let x = 1")
+        ).definitions.should.have.length_of(2)
+        fingerprint.fingerprint([]).definitions.should.equal([])
+
+    def test_errors(self):
+        for engine in ("ply", "fast"):
+            self._fingerprint("let x = 1 @@@ $", engine).should.be(None)
+            self._fingerprint("let x = 1 (* open", engine).should.be(None)
+            self._fingerprint("let x = 1", engine).shouldnt.be(None)
+
+    def test_disabled(self):
+        lexer = lex.Lexer(logger=error.LoggerMock(), engine="fast")
+        list(lexer.tokenize(self.program))
+        lexer.fingerprint.should.be(None)
@@ -0,0 +1,20 @@
+import unittest
+
+from compiler import ident
+
+
+class TestIdentifierTable(unittest.TestCase):
+    """Test the interning of identifiers."""
+
+    def test_intern(self):
+        table = ident.IdentifierTable()
+        foo = table.intern("foo")
+        bar = table.intern("bar")
+        table.intern("f" + "oo").should.be(foo)
+        foo.should.equal("foo")
+        hash(foo).should.equal(hash("foo"))
+        (foo.ident, bar.ident).should.equal((0, 1))
+        table[1].should.be(bar)
+        len(table).should.equal(2)
+        ("bar" in table).should.be.true
+        ("baz" in table).should.be.false
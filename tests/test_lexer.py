@@ -1,7 +1,11 @@
+import io
+import mmap
+import os
 import string
 import unittest
+from unittest import mock
 
-from compiler import error, lex
+from compiler import error, ident, lex, tokenbuffer
 
 # pylint: disable=no-member
 # pylint: disable=pointless-statement
@@ -49,12 +53,63 @@ class TestLexerAPI(unittest.TestCase):
         lexer2.should.have.property("logger").being(logger)
         lexer2.should.have.property("optimize").being(True)
         lexer2.should.have.property("verbose").being(False)
+        lexer2.should.have.property("engine").being("ply")
+
+        lexer3 = lex.Lexer(engine="fast")
+        lexer3.should.have.property("engine").being("fast")
+
+        lex.Lexer.when.called_with(engine="koko").should.throw(ValueError)
 
     @staticmethod
     def test_input():
         lexer = lex.Lexer()
         lexer.input("foo")
 
+    @staticmethod
+    def test_input_stream():
+        lexer = lex.Lexer(engine="fast")
+        lexer.input_stream(io.StringIO("foo"))
+        lexer.token().value.should.equal("foo")
+
+        lexer = lex.Lexer()
+        lexer.input_stream.when.called_with(
+            io.StringIO("foo")
+        ).should.throw(ValueError)
+
+    @staticmethod
+    def test_identifiers():
+        table = ident.IdentifierTable()
+        for engine in ("ply", "fast"):
+            lexer = lex.Lexer(engine=engine, identifiers=table)
+            lexer.identifiers.should.be(table)
+            tokens = lexer.tokenize("foo Bar foo Koko true")
+            foo1, bar, foo2, koko, true = tokens
+            foo1.value.should.be(foo2.value)
+            foo1.value.ident.should.equal(0)
+            bar.value.ident.should.equal(1)
+            koko.value.ident.should.equal(2)
+            true.value.should.be(True)
+        lex.Lexer().identifiers.shouldnt.be(lex.Lexer().identifiers)
+
+    @staticmethod
+    def test_position():
+        lex.Lexer.when.called_with(
+            lazy_positions=True
+        ).should.throw(ValueError)
+
+        lexer = lex.Lexer(engine="fast", lazy_positions=True)
+        lexer.input("foo\n  bar")
+        lexer.token().lexpos.should.equal(0)
+        lexer.token().lexpos.should.equal(6)
+        lexer.position(6).should.equal((2, 3))
+        lexer.tokenize_columns.when.called_with("foo").should.throw(
+            ValueError
+        )
+
+        lexer = lex.Lexer(engine="fast")
+        lexer.input("foo")
+        lexer.position.when.called_with(0).should.throw(ValueError)
+
     @staticmethod
     def test_skip():
         lexer = lex.Lexer()
@@ -76,6 +131,37 @@ class TestLexerAPI(unittest.TestCase):
         iter(lexer)
         next(lexer)
 
+    @staticmethod
+    def test_shared_tables():
+        lex.Lexer().tokenize("")
+        with mock.patch.object(lex.lex, "lex") as ply_lex:
+            lexer = lex.Lexer()
+            for _ in range(3):
+                list(lexer.tokenize("let x = 1"))
+            list(lex.Lexer().tokenize("let x = 1"))
+            ply_lex.called.should.be.false
+
+    @staticmethod
+    def test_reset_on_input():
+        lexer = lex.Lexer(logger=error.LoggerMock())
+        list(lexer.tokenize("(* \n"))
+        tok = next(lexer.tokenize("\n  foo"))
+        tok.value.should.equal("foo")
+        tok.lineno.should.equal(2)
+        tok.lexpos.should.equal(3)
+
+    @staticmethod
+    def test_live_lexers():
+        for engine in ("ply", "fast"):
+            l1 = lex.Lexer(engine=engine)
+            l2 = lex.Lexer(engine=engine)
+            l1.input("a\nb\nc")
+            l2.input("x y z")
+            values = [l1.token().value, l2.token().value, l1.token().value]
+            values.should.equal(["a", "x", "b"])
+            l2.token().lineno.should.equal(1)
+            l1.token().lineno.should.equal(3)
+
     @staticmethod
     def test_tokenize():
         l1 = lex.Lexer()
@@ -266,3 +352,319 @@ class TestLexerRules(unittest.TestCase):
         not_operators = r'\#$%&.?@^_`~'
         for symbol in not_operators:
             self._assert_lex_failure(symbol)
+
+
+class TestFastLexerRules(TestLexerRules):
+    """Test the fast engine's coverage of Llama vocabulary."""
+
+    @staticmethod
+    def _lex_data(input):
+        lexer = lex.Lexer(logger=error.LoggerMock(), engine="fast")
+        tokens = list(lexer.tokenize(input))
+        return tokens, lexer.logger
+
+
+class TestFastLexerEquivalence(unittest.TestCase):
+    """Test that the fast engine mimics the PLY-driven one exactly."""
+
+    class _RecordingLogger(error.LoggerInterface):
+        """A logger recording every formatted error message."""
+
+        def __init__(self):
+            self.messages = []
+
+        def error(self, fmt, *args):
+            self.messages.append(fmt % args)
+            self.errors += 1
+
+    def _lex(self, data, engine="ply", chunk_size=None):
+        logger = self._RecordingLogger()
+        lexer = lex.Lexer(logger=logger, engine=engine)
+        if chunk_size is None:
+            lexer.input(data)
+        else:
+            lexer.input_stream(io.StringIO(data), chunk_size=chunk_size)
+        tokens = [
+            (tok.type, tok.value, tok.lineno, tok.lexpos)
+            for tok in lexer
+        ]
+        return tokens, logger.messages, lexer.lineno
+
+    def _assert_same_lexing(self, data):
+        expected = self._lex(data)
+        self._lex(data, engine="fast").should.equal(expected)
+        for chunk_size in (1, 2, 5, 4096):
+            self._lex(data, "fast", chunk_size).should.equal(expected)
+
+    def test_correct_programs(self):
+        path = os.path.join(os.path.dirname(__file__), "correct")
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name)) as program:
+                self._assert_same_lexing(program.read())
+
+    def test_operators(self):
+        self._assert_same_lexing("+.-.*.**/.->--<><=>===!=:=&&||!|;")
+        self._assert_same_lexing("a-->b (* *) x*)y(*)")
+
+    def test_malformed_input(self):
+        inputs = (
+            "let x = 'ab' in \"\n\"",
+            "(* (* nested \n *) \n *) Koko 42.0e-1 0042",
+            "\"unterminated\n  'x",
+            "@ # let \x00 \xe9 _koko",
+            "'' '\\x4a' '\\xbad' \"\\z\"",
+            "(*(**)",
+            "let\r\n\tfoo -- comment\n  bar",
+            "\n\n(* a\n\n(* b *)\n *)\n\n\"long string\" koko_lala 42.5e1"
+        )
+        for data in inputs:
+            self._assert_same_lexing(data)
+
+    def test_illegal_runs(self):
+        self._assert_same_lexing("x @#$ & y &&@&\xe9 z\n\x00\x01\n" * 3)
+        for engine in ("ply", "fast"):
+            _, messages, _ = self._lex("x @#$ & y\n\xe9\xe9 z", engine)
+            messages.should.equal([
+                "1:3-5: error: 3 illegal characters, starting with '@'.",
+                "1:7: error: Illegal character '&'.",
+                "2:1-2: error: 2 illegal characters, starting with '\xe9'."
+            ])
+
+    def test_max_errors(self):
+        data = "@ x " * 10 + "(* unclosed"
+        for engine in ("ply", "fast"):
+            logger = self._RecordingLogger()
+            lexer = lex.Lexer(logger=logger, engine=engine, max_errors=3)
+            [tok.value for tok in lexer.tokenize(data)].should.equal(
+                ["x", "x"]
+            )
+            logger.messages[-1].should.equal(
+                "1: error: Too many lexical errors; giving up."
+            )
+            logger.errors.should.equal(4)
+            lexer.token().should.be(None)
+
+            logger = self._RecordingLogger()
+            lexer = lex.Lexer(logger=logger, engine=engine, max_errors=None)
+            list(lexer.tokenize(data)).should.have.length_of(10)
+            logger.errors.should.equal(11)
+
+    def test_lazy_positions(self):
+        data = "let x = 'ab' in\n(* (* \n *) *)\n  \"q\n@ 1e999\n\n koko"
+        expected = self._lex(data)
+        for chunk_size in (None, 1, 4096):
+            logger = self._RecordingLogger()
+            lexer = lex.Lexer(
+                logger=logger,
+                engine="fast",
+                lazy_positions=True
+            )
+            if chunk_size is None:
+                lexer.input(data)
+            else:
+                lexer.input_stream(io.StringIO(data), chunk_size=chunk_size)
+            tokens = [
+                (tok.type, tok.value) + lexer.position(tok.lexpos)
+                for tok in lexer
+            ]
+            (tokens, logger.messages, lexer.lineno).should.equal(expected)
+
+    def test_bytes_input(self):
+        path = os.path.join(os.path.dirname(__file__), "correct")
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name), "rb") as program:
+                data = program.read()
+                expected = self._lex(data.decode("ascii"))
+                self._lex(data, "fast").should.equal(expected)
+                self._lex(memoryview(data), "fast").should.equal(expected)
+                if data:
+                    with mmap.mmap(
+                        program.fileno(), 0, access=mmap.ACCESS_READ
+                    ) as mapping:
+                        self._lex(mapping, "fast").should.equal(expected)
+
+        data = "let x = 'ab' in\n(* (*\n *) *) \"q\n@@ 1.5 true"
+        self._lex(data.encode("ascii"), "fast").should.equal(self._lex(data))
+
+        # Non-ASCII bytes are reported as the characters they encode.
+        tokens, messages, _ = self._lex("a \u20ac\u20ac b".encode(), "fast")
+        [tok[1] for tok in tokens].should.equal(["a", "b"])
+        messages.should.equal([
+            "1:3-4: error: 2 illegal characters, starting with '\u20ac'."
+        ])
+
+        lex.Lexer().input.when.called_with(b"x").should.throw(ValueError)
+
+    def test_trailing_blanks(self):
+        blanks = " \t\r" * 3000
+        for data in ("let x = 1" + blanks, "x\n" + blanks + "\n\n" + blanks,
+                     "@" + blanks, "(* *)" + blanks + "\n"):
+            self._assert_same_lexing(data)
+            self._lex(data.encode("ascii"), "fast").should.equal(
+                self._lex(data)
+            )
+            expected = lex.Lexer(logger=error.LoggerMock()).tokenize_columns(
+                data
+            )
+            buffer = lex.Lexer(
+                logger=error.LoggerMock(),
+                engine="fast"
+            ).tokenize_columns(data)
+            list(buffer.line_states).should.equal(list(expected.line_states))
+
+    def test_skip(self):
+        for engine in ("ply", "fast"):
+            lexer = lex.Lexer(logger=error.LoggerMock(), engine=engine)
+            lexer.input("let foo")
+            lexer.skip(4)
+            tok = lexer.token()
+            tok.type.should.equal("GENID")
+            tok.value.should.equal("foo")
+
+
+class TestIncrementalRelexing(unittest.TestCase):
+    """Test that relexing an edited source matches lexing it anew."""
+
+    @staticmethod
+    def _columns(buffer):
+        return [
+            (buffer.type(i), buffer.value(i), buffer.linenos[i],
+             buffer.columns[i], buffer.offsets[i])
+            for i in range(len(buffer))
+        ]
+
+    def _assert_relexes(self, data, edits):
+        for engine in ("ply", "fast"):
+            lexer = lex.Lexer(logger=error.LoggerMock(), engine=engine)
+            buffer = lexer.tokenize_columns(data)
+            source = data
+            for offset, deleted, inserted in edits:
+                buffer = lexer.relex(buffer, offset, deleted, inserted)
+                source = source[:offset] + inserted + source[offset + deleted:]
+                expected = lex.Lexer(
+                    logger=error.LoggerMock(),
+                    engine=engine
+                ).tokenize_columns(source)
+                buffer.source.should.equal(source)
+                self._columns(buffer).should.equal(self._columns(expected))
+                list(buffer.line_states).should.equal(
+                    list(expected.line_states)
+                )
+
+    def test_edit_inside_line(self):
+        data = "let x = 1\nlet y = x + 2\nlet z = \"s\"\n"
+        self._assert_relexes(
+            data,
+            [(14, 1, "foo"), (0, 3, "type"), (0, 0, "")]
+        )
+
+    def test_edit_across_lines(self):
+        data = "let x = 1\nlet y = 2\nlet z = 3\n"
+        self._assert_relexes(data, [(5, 12, ""), (0, 0, "\n\n"), (9, 0, "\n")])
+
+    def test_comment_and_literal_states(self):
+        data = "let x = 1\n(* a\n (* b *)\n*)\nlet y = 'c'\nlet z = \"s\"\n"
+        self._assert_relexes(data, [
+            (0, 0, "(*"),
+            (0, 2, ""),
+            (15, 0, "(*"),
+            (10, 0, "\""),
+            (40, 1, "'"),
+        ])
+
+    def test_reuses_tail(self):
+        data = "let x = 1\n" * 100
+        lexer = lex.Lexer(logger=error.LoggerMock(), engine="fast")
+        buffer = lexer.tokenize_columns(data)
+        with mock.patch.object(
+            tokenbuffer.TokenBuffer, "append",
+            autospec=True,
+            side_effect=tokenbuffer.TokenBuffer.append
+        ) as append:
+            relexed = lexer.relex(buffer, 4, 1, "foo")
+        append.call_count.should.be.lower_than(10)
+        relexed.value(1).should.equal("foo")
+        relexed.offsets[-1].should.equal(buffer.offsets[-1] + 2)
+
+    def test_bad_edit(self):
+        lexer = lex.Lexer()
+        buffer = lexer.tokenize_columns("foo")
+        lexer.relex.when.called_with(buffer, 2, 2, "").should.throw(ValueError)
+        lexer.relex.when.called_with(
+            tokenbuffer.TokenBuffer(lex.tokens, {}), 0, 0, ""
+        ).should.throw(ValueError)
+
+
+class TestParallelLexing(unittest.TestCase):
+    """Test that lexing in parallel matches lexing serially."""
+
+    _RecordingLogger = TestFastLexerEquivalence._RecordingLogger
+
+    def _assert_same_lexing(self, data, chunks):
+        for engine in ("ply", "fast"):
+            serial_logger = self._RecordingLogger()
+            serial = lex.Lexer(
+                logger=serial_logger,
+                engine=engine
+            ).tokenize_columns(data)
+            parallel_logger = self._RecordingLogger()
+            parallel = lex.Lexer(
+                logger=parallel_logger,
+                engine=engine
+            ).tokenize_parallel(data, processes=2, chunks=chunks)
+            TestIncrementalRelexing._columns(parallel).should.equal(
+                TestIncrementalRelexing._columns(serial)
+            )
+            list(parallel.line_states).should.equal(list(serial.line_states))
+            [
+                getattr(parallel.value(i), "ident", None)
+                for i in range(len(parallel))
+            ].should.equal([
+                getattr(serial.value(i), "ident", None)
+                for i in range(len(serial))
+            ])
+            parallel_logger.messages.should.equal(serial_logger.messages)
+
+    def test_correct_programs(self):
+        path = os.path.join(os.path.dirname(__file__), "correct")
+        programs = []
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name)) as program:
+                programs.append(program.read())
+        self._assert_same_lexing("\n".join(programs), 4)
+
+    def test_wrong_boundaries(self):
+        data = "\n".join((
+            "let x = 1 @",
+            "(* comment",
+            "let y = 2 (*",
+            "type t *)",
+            "*)",
+            "let s = \"bad",
+            "let z = 'c'",
+            "type u = Foo (*"
+        ))
+        for chunks in range(2, 9):
+            self._assert_same_lexing(data, chunks)
+
+    def test_max_errors(self):
+        data = "let x = 1\nlet y = @\n" * 60
+        for engine in ("ply", "fast"):
+            serial_logger = self._RecordingLogger()
+            serial = lex.Lexer(
+                logger=serial_logger,
+                engine=engine,
+                max_errors=50
+            ).tokenize_columns(data)
+            parallel_logger = self._RecordingLogger()
+            parallel = lex.Lexer(
+                logger=parallel_logger,
+                engine=engine,
+                max_errors=50
+            ).tokenize_parallel(data, processes=2, chunks=4)
+            len(parallel).should.equal(len(serial))
+            parallel_logger.messages.should.equal(serial_logger.messages)
+
+    def test_single_chunk(self):
+        self._assert_same_lexing("", 2)
+        self._assert_same_lexing("let x = 1", 2)
@@ -0,0 +1,72 @@
+import unittest
+
+from compiler import error, lex, lexprofile
+
+# pylint: disable=no-member
+
+
+class TestLexerProfile(unittest.TestCase):
+    """Test the per-rule statistics of the lexer."""
+
+    def test_record(self):
+        profile = lexprofile.LexerProfile()
+        profile.record('INITIAL', 't_GENID', 3, 1.0)
+        profile.record('comment', 't_comment_SPECIAL', 5, 3.0)
+        profile.record('comment', 't_comment_SPECIAL', 1, 3.5)
+        profile.record('INITIAL', 't_GENID', 2, 4.5)
+        profile.pause()
+        profile.enter('string')
+
+        stats = profile.rules['INITIAL', 't_GENID']
+        (stats.matches, stats.length).should.equal((2, 5))
+        stats = profile.rules['comment', 't_comment_SPECIAL']
+        (stats.matches, stats.length, stats.seconds).should.equal(
+            (2, 6, 1.5)
+        )
+        dict(profile.transitions).should.equal({
+            ('INITIAL', 'comment'): 1,
+            ('comment', 'INITIAL'): 1,
+            ('INITIAL', 'string'): 1
+        })
+
+        report = profile.report()
+        [entry['rule'] for entry in report['rules']].should.equal(
+            ['t_GENID', 't_comment_SPECIAL']
+        )
+        report['seconds'].should.equal(
+            sum(entry['seconds'] for entry in report['rules'])
+        )
+        report['transitions'].should.have.length_of(3)
+        profile.format().should.contain('t_comment_SPECIAL')
+
+    def test_lexer(self):
+        data = "let x = 1 (*c*)\n\"s\" @ 'ab' x;"
+        reports = []
+        for engine in ("ply", "fast"):
+            lexer = lex.Lexer(
+                logger=error.LoggerMock(),
+                engine=engine,
+                profile=True
+            )
+            tokens = list(lexer.tokenize(data))
+            tokens.should.have.length_of(8)
+            reports.append({
+                (entry['state'], entry['rule']):
+                (entry['matches'], entry['length'])
+                for entry in lexer.profile.report()['rules']
+            })
+            dict(lexer.profile.transitions).should.equal({
+                ('INITIAL', 'comment'): 1,
+                ('comment', 'INITIAL'): 1,
+                ('INITIAL', 'char'): 1,
+                ('char', 'INITIAL'): 1
+            })
+        reports[0].should.equal(reports[1])
+        reports[0][('INITIAL', 't_GENID')].should.equal((3, 5))
+        reports[0][('INITIAL', 't_EQ')].should.equal((1, 1))
+        reports[0][('comment', 't_comment_SPECIAL')].should.equal((1, 1))
+
+    def test_disabled(self):
+        lexer = lex.Lexer(logger=error.LoggerMock(), engine="fast")
+        lexer.profile.should.be(None)
+        list(lexer.tokenize("let x = 1")).should.have.length_of(4)
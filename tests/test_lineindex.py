@@ -0,0 +1,34 @@
+import unittest
+
+from compiler import lineindex
+
+
+class TestLineIndex(unittest.TestCase):
+    """Test the resolution of offsets to lines and columns."""
+
+    def test_position(self):
+        index = lineindex.LineIndex("ab\n\ncd\n")
+        len(index).should.equal(4)
+        index.position(0).should.equal((1, 1))
+        index.position(2).should.equal((1, 3))
+        index.position(3).should.equal((2, 1))
+        index.position(5).should.equal((3, 2))
+        index.position(7).should.equal((4, 1))
+
+    def test_extend(self):
+        index = lineindex.LineIndex("ab\nc")
+        index.extend("d\ne\n", 4)
+        list(index.starts).should.equal(
+            list(lineindex.LineIndex("ab\ncd\ne\n").starts)
+        )
+
+    def test_bytes(self):
+        expected = list(lineindex.LineIndex("ab\n\ncd\n").starts)
+        list(lineindex.LineIndex(b"ab\n\ncd\n").starts).should.equal(expected)
+        index = lineindex.LineIndex(memoryview(b"ab\n\ncd\n"))
+        list(index.starts).should.equal(expected)
+
+    def test_empty(self):
+        index = lineindex.LineIndex()
+        len(index).should.equal(1)
+        index.position(0).should.equal((1, 1))
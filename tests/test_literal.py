@@ -0,0 +1,56 @@
+import unittest
+
+from compiler import lex, literal
+
+
+class TestStringLiteral(unittest.TestCase):
+    """Test the compact representation of string literals."""
+
+    def test_decode(self):
+        testcases = (
+            r"",
+            r"abc",
+            r"Helloworld!\n",
+            r"\"",
+            r"Name:\t\"DouglasAdams\"\nValue\t42\n",
+            r"play L\0L",
+            r"an e\\xtra la\\zy string",
+            r"\x41\xfF\x00\'"
+        )
+        for text in testcases:
+            decoded = literal.decode(text).decode("latin-1")
+            list(decoded).should.equal(lex.explode(text))
+
+    def test_sequence(self):
+        hello = literal.StringLiteral(b"hello\0")
+        len(hello).should.equal(6)
+        hello[1].should.equal("e")
+        hello[-2:].should.equal(["o", "\0"])
+        list(hello).should.equal(list("hello\0"))
+        hello.chars.should.equal(list("hello\0"))
+        hello.chars.shouldnt.be(hello.chars)
+        hello.should.equal(list("hello\0"))
+        list("hello\0").should.equal(hello)
+        hello.should.equal(literal.StringLiteral(b"hello\0"))
+        hello.shouldnt.equal(literal.StringLiteral(b"help\0"))
+        hello.shouldnt.equal("hello\0")
+        hash(hello).should.equal(hash(literal.StringLiteral(b"hello\0")))
+
+    def test_pool(self):
+        pool = literal.LiteralPool()
+        tab = pool.intern(r"\t")
+        pool.intern(r"\t").should.be(tab)
+        pool.intern(r"\x09").should.be(tab)
+        pool.add(literal.StringLiteral(b"\t\0")).should.be(tab)
+        pool.intern("a").shouldnt.be(tab)
+        len(pool).should.equal(2)
+
+    def test_lexer_pool(self):
+        pool = literal.LiteralPool()
+        for engine in ("ply", "fast"):
+            lexer = lex.Lexer(engine=engine, literals=pool)
+            lexer.literals.should.be(pool)
+            tokens = list(lexer.tokenize('"a\\tb" "a\\x09b" "x"'))
+            tokens[0].value.should.be(tokens[1].value)
+            tokens[0].value.data.should.equal(b"a\tb\0")
+        len(pool).should.equal(2)
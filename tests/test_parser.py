@@ -1,6 +1,9 @@
+import concurrent.futures
+import os
 import unittest
+from unittest import mock
 
-from compiler import ast, error, lex, parse
+from compiler import ast, error, ident, lex, lrdriver, parse
 
 # pylint: disable=no-member
 
@@ -42,6 +45,300 @@ class TestParserAPI(unittest.TestCase):
         )
         p1.should.have.property("logger").being.equal(logger)
 
+    def test_identifiers(self):
+        table = ident.IdentifierTable()
+        tree = parse.Parser(logger=error.LoggerMock(), start="letdef").parse(
+            "let f x = x + f 1",
+            lex.Lexer(identifiers=table)
+        )
+        definition = tree.list[0]
+        definition.ident.should.equal(table.intern("f").ident)
+        definition.params[0].ident.should.equal(table.intern("x").ident)
+        definition.body.rightOperand.ident.should.equal(definition.ident)
+        ast.Int().ident.should.be(None)
+
+    @staticmethod
+    def _positions(node, positions, table=None):
+        if table is None:
+            table = getattr(node, "positions", None)
+        if isinstance(node, list):
+            for item in node:
+                TestParserAPI._positions(item, positions, table)
+        elif isinstance(node, ast.Node):
+            positions.append(
+                (type(node), table.position(node), table.span(node))
+            )
+            for attr, value in sorted(node.attributes().items()):
+                if attr not in ("pos", "positions"):
+                    TestParserAPI._positions(value, positions, table)
+        return positions
+
+    def test_lazy_positions(self):
+        data = "let x = 1\n\nlet f y =\n  (* c\n *) y + x\ntype t = A | B"
+        for source in (data, data + "\n  let let"):
+            eager_logger = error.LoggerMock()
+            eager = parse.Parser(logger=eager_logger).parse(
+                source,
+                lex.Lexer(logger=eager_logger)
+            )
+            lazy_logger = error.LoggerMock()
+            lazy = parse.Parser(logger=lazy_logger).parse(
+                source,
+                lex.Lexer(
+                    logger=lazy_logger,
+                    engine="fast",
+                    lazy_positions=True
+                )
+            )
+            self._positions(lazy, []).should.equal(
+                self._positions(eager, [])
+            )
+            lazy_logger.errors.should.equal(eager_logger.errors)
+
+    def test_spans(self):
+        data = "let f x = (x + 1) * 2\n  and g = begin f 3 end\ntype t = A"
+        for engine in ("ply", "fast"):
+            lexer = lex.Lexer(logger=error.LoggerMock(), trivia=True)
+            parser = parse.Parser(logger=error.LoggerMock(), engine=engine)
+            tree = parser.parse(data, lexer)
+            table = tree.positions
+            letdef = tree.list[0]
+            f, g = letdef.list
+            [
+                data[slice(*table.span(node))]
+                for node in (letdef, f, f.body, f.body.leftOperand, g.body)
+            ].should.equal([
+                "let f x = (x + 1) * 2\n  and g = begin f 3 end",
+                "f x = (x + 1) * 2",
+                "(x + 1) * 2",
+                "(x + 1)",
+                "begin f 3 end"
+            ])
+            table.position(g).should.equal((2, 7))
+            table.span(tree.list[1][0]).should.equal(
+                (len(data) - 5, len(data))
+            )
+        tree = parse.quiet_parse(data)
+        tree.positions.span(tree.list[0]).should.be(None)
+        tree.positions.position(tree.list[0]).should.equal((1, 1))
+        product = tree.list[0].list[0].body
+        [
+            tree.positions.position(node) for node in (
+                product, product.leftOperand, product.leftOperand.leftOperand
+            )
+        ].should.equal([(1, 11), (1, 11), (1, 12)])
+
+    def test_shared_tables(self):
+        logger1, logger2 = error.LoggerMock(), error.LoggerMock()
+        p1 = parse.Parser(logger=logger1, start="expr")
+        p2 = parse.Parser(logger=logger2, start="expr")
+        p1.parser.action.should.be(p2.parser.action)
+        p1.parser.shouldnt.be(p2.parser)
+
+        p1.parse("1 +")
+        p2.parse("1 + 2").should.equal(parse.quiet_parse("1 + 2", "expr"))
+        (logger1.errors, logger2.errors).should.equal((1, 0))
+
+    def test_threads(self):
+        data = ["%d + %d * x" % (i, i + 1) for i in range(50)]
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            trees = list(executor.map(
+                lambda expr: parse.quiet_parse(expr, "expr"), data
+            ))
+        trees.should.equal([parse.quiet_parse(expr, "expr") for expr in data])
+
+
+class TestParserEngines(unittest.TestCase):
+    """Test that the fast LR driver behaves exactly like PLY's."""
+
+    broken = (
+        "let x = 1 +",
+        "let x = in 1 let y = 2",
+        "let f x = match x with | A -> 1 end let g = f",
+        "type t = A of | B let x = 1 let y = 2 let z = 3",
+        "let x = if then else let y = (1, 2) let z = @",
+        "let x = 1 == 2 == 3"
+    )
+
+    @staticmethod
+    def _parse(data, engine, start="program"):
+        logger = error.LoggerMock()
+        parser = parse.Parser(logger=logger, start=start, engine=engine)
+        tree = parser.parse(data, lex.Lexer(logger=logger, engine="fast"))
+        positions = TestParserAPI._positions(
+            tree, [repr(tree)], parser.positions
+        )
+        return positions, logger.errors
+
+    def test_equivalence(self):
+        path = os.path.join(os.path.dirname(__file__), "correct")
+        programs = []
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name)) as program:
+                programs.append(program.read())
+        for data in programs + list(self.broken):
+            self._parse(data, "fast").should.equal(self._parse(data, "ply"))
+        self._parse("int -> int ref", "fast", "type").should.equal(
+            self._parse("int -> int ref", "ply", "type")
+        )
+
+    def test_errors(self):
+        for data in self.broken:
+            _, errors = self._parse(data, "fast")
+            errors.should.be.greater_than(0)
+
+    def test_engine(self):
+        parse.Parser(logger=error.LoggerMock()).tables.should.be(None)
+        p1 = parse.Parser(logger=error.LoggerMock(), engine="fast")
+        p2 = parse.Parser(logger=error.LoggerMock(), engine="fast")
+        p1.tables.should.be(p2.tables)
+        parse.Parser.when.called_with(engine="slow").should.throw(ValueError)
+
+    def test_trace(self):
+        trace = lrdriver.ParserTrace()
+        parser = parse.Parser(
+            logger=error.LoggerMock(),
+            engine="fast",
+            trace=trace
+        )
+        data = "let f x = x + 1"
+        parser.parse(data).should.equal(parse.quiet_parse(data))
+        events = list(trace.decode(parser.tables))
+        [
+            terminal for event, _, terminal in events if event == "shift"
+        ].should.equal([tok.type for tok in lex.quiet_tokenize(data)])
+        events[-1][:2].should.equal(("reduce", "program -> def_list"))
+        len(trace).should.equal(len(events))
+
+        trace.clear()
+        parser.parse("let x = 1 + * 2 let y = 3")
+        events = [event for event, _, _ in trace.decode(parser.tables)]
+        events.should.contain("error")
+        events.should.contain("pop")
+        parse.Parser.when.called_with(trace=trace).should.throw(ValueError)
+
+
+class TestParallelParse(unittest.TestCase):
+    """Test parsing top-level definitions in worker processes."""
+
+    @staticmethod
+    def _identifiers(node, identifiers):
+        if isinstance(node, list):
+            for item in node:
+                TestParallelParse._identifiers(item, identifiers)
+        elif isinstance(node, ast.Node):
+            for _, value in sorted(node.attributes().items()):
+                if isinstance(value, ident.Identifier):
+                    identifiers.append((value, value.ident))
+                TestParallelParse._identifiers(value, identifiers)
+        return identifiers
+
+    def test_parallel(self):
+        path = os.path.join(os.path.dirname(__file__), "correct")
+        programs = []
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name)) as program:
+                programs.append(program.read())
+        data = "\n".join(programs)
+        serial = parse.quiet_parse(data)
+        tree = parse.parallel_parse(data, 2, error.LoggerMock(), 0)
+        tree.should.equal(serial)
+        TestParserAPI._positions(tree, []).should.equal(
+            TestParserAPI._positions(serial, [])
+        )
+        self._identifiers(tree, []).should.equal(
+            self._identifiers(serial, [])
+        )
+
+    def test_errors(self):
+        data = "let x = 1\nlet f y = (y +\nlet z = 2"
+        logger1, logger2 = error.LoggerMock(), error.LoggerMock()
+        parse.parallel_parse(data, 2, logger1, 0).should.equal(
+            parse.parse(data, logger=logger2)
+        )
+        logger1.errors.should.equal(logger2.errors)
+        parse.parallel_parse("", 2, logger1, 0).should.equal(
+            ast.Program([])
+        )
+
+    def test_small_input(self):
+        data = "let x = 1\nlet y = 2"
+        with mock.patch.object(
+                concurrent.futures, 'ProcessPoolExecutor') as executor:
+            parse.parallel_parse(data, 2, error.LoggerMock()).should.equal(
+                parse.quiet_parse(data)
+            )
+        executor.called.should.be(False)
+
+
+class TestErrorRecovery(unittest.TestCase):
+    """Test recovery from syntax errors."""
+
+    program = (
+        "let f x = x + 1\n"
+        "let g = 1 + * 2\n"
+        "let ok = (1 +) + begin 3 * end\n"
+        "let h = while ) do 1 done\n"
+        "type t = A | B\n"
+        "let z = 3\n"
+        "let y = 1 +"
+    )
+
+    @staticmethod
+    def _parse(data, engine="ply"):
+        logger = error.LoggerMock()
+        tree = parse.Parser(logger=logger, engine=engine).parse(
+            data,
+            lex.Lexer(logger=logger)
+        )
+        return tree, logger.errors
+
+    def test_errors(self):
+        for engine in ("ply", "fast"):
+            tree, errors = self._parse(self.program, engine)
+            errors.should.equal(5)
+            [
+                definition.list[0].name for definition in tree.list
+                if isinstance(definition, ast.LetDef)
+            ].should.equal(["f", "ok", "h", "z"])
+            tree.list[3].should.equal(
+                parse.quiet_parse("type t = A | B").list[0]
+            )
+            tree.list[4].should.equal(
+                parse.quiet_parse("let z = 3", "letdef")
+            )
+
+    def test_error_expressions(self):
+        tree, _ = self._parse("let ok = (1 +) + begin 3 * end")
+        body = tree.list[0].list[0].body
+        body.leftOperand.should.be.an(ast.ErrorExpression)
+        body.rightOperand.should.be.an(ast.ErrorExpression)
+        for data in (
+                "let x = while ) do 1 done",
+                "let x = for i = do 1 done",
+                "let x = match with end",
+                "let x = let = 1 in 2"):
+            tree, errors = self._parse(data)
+            errors.should.equal(1)
+            tree.list[0].list[0].body.should.be.an(ast.ErrorExpression)
+
+    def test_end_of_input(self):
+        tree, errors = self._parse("let x = 1\nlet y = 1 +")
+        errors.should.equal(1)
+        tree.should.equal(parse.quiet_parse("let x = 1"))
+        self._parse("let x = 1 let")[0].should.equal(tree)
+        self._parse("1 +")[0].should.equal(ast.Program([]))
+
+    def test_error_before_definitions(self):
+        for engine in ("ply", "fast"):
+            for data, expected, count in (
+                    ("1 let x = 2 let y = 3", "let x = 2 let y = 3", 1),
+                    (") let x = 1", "let x = 1", 1),
+                    ("1 2 ) let x = 1 1 let y = 2", "let y = 2", 2)):
+                tree, errors = self._parse(data, engine)
+                errors.should.equal(count)
+                tree.should.equal(parse.quiet_parse(expected))
+
 
 class TestParserRules(unittest.TestCase):
     """Test the Parser's coverage of Llama grammar."""
@@ -78,6 +375,22 @@ class TestParserRules(unittest.TestCase):
             [self.xfunc, self.yfunc]
         )
 
+    def test_long_lists(self):
+        tree = parse.quiet_parse("".join(
+            "let x%d = %d\n" % (i, i) for i in range(100)
+        ))
+        tree.should.equal(ast.Program([
+            parse.quiet_parse("let x%d = %d" % (i, i), "letdef")
+            for i in range(100)
+        ]))
+        tree = parse.quiet_parse("let f x = match x with %s end" % " | ".join(
+            "%d -> %d" % (i, i) for i in range(100)
+        ))
+        clauses = tree.list[0].list[0].body.list
+        [clause.pattern.value for clause in clauses].should.equal(
+            list(range(100))
+        )
+
     def test_letdef(self):
         parse.quiet_parse("let x = 1", "letdef").should.equal(
             ast.LetDef(
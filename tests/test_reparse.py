@@ -0,0 +1,106 @@
+import unittest
+
+from compiler import ast, error, lex, parse, reparse
+
+# pylint: disable=no-member
+
+
+class TestReparse(unittest.TestCase):
+    """Test incremental parsing by top-level definitions."""
+
+    program = (
+        "let x = let y = 1 in y\n"
+        "let rec f a = a and g b = b\n"
+        "type t = A | B\n"
+        "\n"
+        "(* a comment *)\n"
+        "let z = (let q = 2.5 in q) +. 1.0"
+    )
+
+    @staticmethod
+    def _parse(data):
+        logger = error.LoggerMock()
+        tree = parse.Parser(logger=logger).parse(
+            data,
+            lex.Lexer(logger=logger, engine='fast', trivia=True)
+        )
+        return TestReparse._positions(tree)
+
+    def test_definitions(self):
+        tokens = list(lex.quiet_tokenize(self.program))
+        [
+            [tok.value for tok in segment[:2]]
+            for segment in parse.top_level_definitions(tokens)
+        ].should.equal([["let", "x"], ["let", "rec"], ["type", "t"],
+                        ["let", "z"]])
+        parse.top_level_definitions([]).should.equal([])
+
+    def test_parse(self):
+        parser = reparse.IncrementalParser(logger=error.LoggerMock())
+        result = parser.parse(self.program)
+        result.changed.should.equal({0, 1, 2, 3})
+        self._positions(result.program).should.equal(
+            self._parse(self.program)
+        )
+        parser.parse(self.program).changed.should.equal(set())
+
+    def test_edits(self):
+        parser = reparse.IncrementalParser(logger=error.LoggerMock())
+        first = parser.parse(self.program).program
+        for data, changed in (
+                ("\n\n" + self.program, set()),
+                (self.program.replace("b = b", "b = a"), {1}),
+                (self.program.replace("| B", "| B\nlet w = 3"), {1, 3}),
+                (self.program.replace("let rec", "let  rec"), {1})):
+            result = parser.parse(data)
+            result.changed.should.equal(changed)
+            self._positions(result.program).should.equal(self._parse(data))
+        parser.parse(self.program).program.list[0].should.be(first.list[0])
+
+    def test_spans(self):
+        parser = reparse.IncrementalParser(logger=error.LoggerMock())
+        parser.parse("let x = 1\nlet y = 2\n")
+        result = parser.parse("let xxxxxx = 1\nlet y = 2\n")
+        result.changed.should.equal({0})
+        definition = result.program.list[1]
+        result.program.positions.span(definition).should.equal((15, 24))
+        self._positions(result.program).should.equal(
+            self._parse("let xxxxxx = 1\nlet y = 2\n")
+        )
+
+    def test_compaction(self):
+        parser = reparse.IncrementalParser(logger=error.LoggerMock())
+        size = len(parser.parse(self.program).program.positions)
+        for i in range(20):
+            data = self.program.replace("2.5", "%d.5" % i)
+            result = parser.parse(data)
+            self._positions(result.program).should.equal(self._parse(data))
+        len(result.program.positions).should.be.lower_than(2 * size + 1)
+
+    def test_errors(self):
+        logger = error.LoggerMock()
+        parser = reparse.IncrementalParser(logger=logger)
+        data = self.program.replace("b = b", "b = b +")
+        result = parser.parse(data)
+        result.program.list.should.have.length_of(3)
+        result.changed.should.equal({0, 1, 2})
+        logger.errors.should.equal(1)
+        parser.parse(data).changed.should.equal(set())
+        logger.errors.should.equal(2)
+
+    @staticmethod
+    def _positions(node, positions=None, table=None):
+        if positions is None:
+            positions = []
+            table = node.positions
+        if isinstance(node, list):
+            for item in node:
+                TestReparse._positions(item, positions, table)
+        elif isinstance(node, ast.Node):
+            positions.append(
+                (type(node), table.position(node), table.span(node))
+            )
+            for attr, value in sorted(node.attributes().items()):
+                if attr not in ("pos", "positions"):
+                    TestReparse._positions(value, positions, table)
+        return positions
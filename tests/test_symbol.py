@@ -27,9 +27,9 @@ class TestTableAPI(unittest.TestCase):
 
         # A couple of NameNodes
         expr = ast.GenidExpression("foo")
-        expr.lineno, expr.lexpos = 1, 2
+        expr.pos = 1
         param = ast.Param("foo")
-        param.lineno, param.lexpos = 3, 4
+        param.pos = 3
 
         table = symbol.Table()
 
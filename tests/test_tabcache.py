@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from compiler import error, lex, parse, tabcache
+
+# pylint: disable=no-member
+
+
+class _Rules:
+    t_A = r'a'
+
+    @staticmethod
+    def t_B(_):
+        r'b+'
+
+
+class TestTableCache(unittest.TestCase):
+    """Test the on-disk cache of generated tables."""
+
+    def test_default_directory(self):
+        with mock.patch.dict(os.environ, {'LLAMA_CACHE_DIR': '/x/y'}):
+            tabcache.default_directory().should.equal('/x/y')
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': '/x'}):
+            os.environ.pop('LLAMA_CACHE_DIR', None)
+            tabcache.default_directory().should.equal('/x/llama')
+        tabcache.TableCache('/z').directory.should.equal('/z')
+
+    def test_digest(self):
+        key = tabcache.digest(_Rules, 't_', 'x')
+        tabcache.digest(_Rules, 't_', 'x').should.equal(key)
+        tabcache.digest(_Rules, 't_', 'y').shouldnt.equal(key)
+
+        class Changed(_Rules):
+            t_A = r'aa'
+
+        tabcache.digest(Changed, 't_', 'x').shouldnt.equal(key)
+
+    def test_publish(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = tabcache.TableCache(os.path.join(directory, 'cache'))
+            path = cache.path('tab', 'abc', '.py')
+            os.path.basename(path).should.equal('tab_abc.py')
+            cache.load_module(path).should.be(None)
+
+            temporary = cache.temporary(path)
+            temporary.shouldnt.equal(path)
+            with open(temporary, 'w') as file:
+                file.write('value = 1\n')
+            cache.publish(temporary, path)
+            os.path.exists(temporary).should.be(False)
+            cache.load_module(path).value.should.equal(1)
+
+            cache.publish(temporary, path)
+            cache.load_module(path).value.should.equal(1)
+
+    def test_unwritable(self):
+        with tempfile.TemporaryDirectory() as directory:
+            blocker = os.path.join(directory, 'file')
+            open(blocker, 'w').close()
+            cache = tabcache.TableCache(os.path.join(blocker, 'cache'))
+            cache.temporary(cache.path('tab', 'abc', '.py')).should.be(None)
+
+
+class TestCachedTables(unittest.TestCase):
+    """Test that lexers and parsers share tables through the cache."""
+
+    def test_parser(self):
+        with tempfile.TemporaryDirectory() as directory:
+            p1 = parse.Parser(
+                logger=error.LoggerMock(), start='type', cache_dir=directory
+            )
+            entries = os.listdir(directory)
+            len(entries).should.equal(1)
+            entries[0].should.match(r'^parsetab_type_[0-9a-f]+\.pickle$')
+
+            parse._yacc_parsers.clear()
+            with mock.patch.object(
+                    tabcache.TableCache, 'temporary') as temporary:
+                p2 = parse.Parser(
+                    logger=error.LoggerMock(), start='type',
+                    cache_dir=directory
+                )
+            temporary.called.should.be(False)
+            os.listdir(directory).should.equal(entries)
+            p2.parse("int -> int").should.equal(p1.parse("int -> int"))
+
+    def test_parser_unwritable(self):
+        with tempfile.TemporaryDirectory() as directory:
+            blocker = os.path.join(directory, 'file')
+            open(blocker, 'w').close()
+            p1 = parse.Parser(
+                logger=error.LoggerMock(), start='type', cache_dir=blocker
+            )
+            p1.parse("int ref").should.equal(parse.quiet_parse(
+                "int ref", start='type'
+            ))
+
+    def test_lexer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            data = 'let x = "a" (* b *)'
+            tokens = [
+                (tok.type, tok.value)
+                for tok in lex.Lexer(cache_dir=directory).tokenize(data)
+            ]
+            entries = os.listdir(directory)
+            [
+                entry for entry in entries if entry.endswith('.py')
+            ].should.have.length_of(1)
+            lex._ply_lexers.clear()
+            [
+                (tok.type, tok.value)
+                for tok in lex.Lexer(cache_dir=directory).tokenize(data)
+            ].should.equal(tokens)
@@ -0,0 +1,76 @@
+import unittest
+
+from compiler import error, lex, parse
+
+# pylint: disable=no-member
+
+
+class TestTokenBuffer(unittest.TestCase):
+    """Test the column-oriented token buffer."""
+
+    program = '''
+        let main =
+          let mutable x[3] in
+          x[0] := 42; x[1] := 42;
+          print_string "foo"; print_string "foo";
+          if true then 'a' else 'b'
+        '''
+
+    @staticmethod
+    def _token_tuples(tokens):
+        return [(t.type, t.value, t.lineno, t.lexpos) for t in tokens]
+
+    def test_same_tokens(self):
+        for engine in ("ply", "fast"):
+            lexer = lex.Lexer(logger=error.LoggerMock(), engine=engine)
+            buf = lexer.tokenize_columns(self.program)
+            tokens = list(lexer.tokenize(self.program))
+            len(buf).should.equal(len(tokens))
+            self._token_tuples(buf).should.equal(self._token_tuples(tokens))
+
+    def test_columns(self):
+        buf = lex.Lexer().tokenize_columns(self.program)
+        for i in range(len(buf)):
+            start = buf.offsets[i]
+            buf.columns[i].should.equal(
+                start - self.program.rfind("\n", 0, start)
+            )
+            buf.linenos[i].should.equal(
+                self.program.count("\n", 0, start) + 1
+            )
+        buf.type(1).should.equal("GENID")
+        buf.value(1).should.equal("main")
+        buf.value(-1).should.equal("b")
+
+    def test_compact(self):
+        buf = lex.Lexer().tokenize_columns(self.program * 10)
+        (buf.nbytes / len(buf)).should.be.lower_than(20)
+        buf.pool.count(42).should.equal(1)
+        buf.pool.count(list("foo\0")).should.equal(1)
+
+    def test_slicing(self):
+        buf = lex.Lexer().tokenize_columns(self.program)
+        part = buf[3:8]
+        len(part).should.equal(5)
+        self._token_tuples(part).should.equal(
+            self._token_tuples(buf)[3:8]
+        )
+        self._token_tuples([buf[-1]]).should.equal(
+            self._token_tuples(buf)[-1:]
+        )
+        buf[len(buf):].should.have.length_of(0)
+
+    def test_string_values_pooled(self):
+        buf = lex.Lexer().tokenize_columns('"foo" "foo"')
+        buf[0].value.should.be(buf[1].value)
+        buf[1].value.should.equal(list("foo\0"))
+
+    def test_parse(self):
+        buf = lex.Lexer().tokenize_columns(self.program)
+        parser = parse.Parser(logger=error.LoggerMock())
+        tree = parser.parse(None, buf.reader())
+        tree.should.equal(parse.quiet_parse(self.program))
+        tree.positions.position(tree.list[0]).should.equal((2, 9))
+        parser.parse(None, buf[:0].reader()).should.equal(
+            parse.quiet_parse("")
+        )
@@ -0,0 +1,80 @@
+import os
+import unittest
+
+from compiler import error, lex, trivia
+
+# pylint: disable=no-member
+
+
+class TestTrivia(unittest.TestCase):
+    """Test lossless token streams and the recovery of their trivia."""
+
+    @staticmethod
+    def _pieces(data, engine="fast"):
+        lexer = lex.Lexer(
+            logger=error.LoggerMock(),
+            engine=engine,
+            trivia=True,
+            max_errors=None
+        )
+        tokens = list(lexer.tokenize(data))
+        return list(trivia.pieces(
+            data,
+            [tok.span[0] for tok in tokens],
+            [tok.span[1] for tok in tokens]
+        ))
+
+    def test_pieces(self):
+        data = (
+            "-- head\n"
+            "let x = 1 (* one\n still one *) -- tail\n"
+            "\n"
+            "  (* lead *) let y = @ 'ab'"
+        )
+        expected = [
+            ("-- head\n", "let", " "),
+            ("", "x", " "),
+            ("", "=", " "),
+            ("", "1", " (* one\n still one *) -- tail\n"),
+            ("\n  (* lead *) ", "let", " "),
+            ("", "y", " "),
+            ("", "=", " @ 'ab"),
+            ("", "'", "")
+        ]
+        for engine in ("ply", "fast"):
+            self._pieces(data, engine).should.equal(expected)
+
+    def test_round_trip(self):
+        path = os.path.join(os.path.dirname(__file__), "correct")
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name)) as program:
+                data = program.read()
+            for engine in ("ply", "fast"):
+                pieces = self._pieces(data, engine)
+                "".join("".join(piece) for piece in pieces).should.equal(data)
+
+    def test_attach(self):
+        data = b"x (* \n *) y\n\n"
+        lexer = lex.Lexer(logger=error.LoggerMock(), engine="fast",
+                          trivia=True)
+        tokens = trivia.attach(data, list(lexer.tokenize(data)))
+        [tok.span for tok in tokens].should.equal([(0, 1), (10, 11)])
+        [tok.trivia for tok in tokens].should.equal([(0, 10), (10, 13)])
+
+    def test_buffer(self):
+        data = "let x = 1\n  (* c *) let y = x"
+        for engine in ("ply", "fast"):
+            lexer = lex.Lexer(logger=error.LoggerMock(), engine=engine,
+                              trivia=True)
+            spans = [tok.span for tok in lexer.tokenize(data)]
+            buffer = lexer.tokenize_columns(data)
+            [tok.span for tok in buffer].should.equal(spans)
+            [tok.span for tok in buffer[2:4]].should.equal(spans[2:4])
+
+            edited = lexer.relex(buffer, data.index("y"), 1, "yy")
+            [tok.span for tok in edited].should.equal(
+                spans[:5] + [(24, 26), (27, 28), (29, 30)]
+            )
+
+        lexer = lex.Lexer(logger=error.LoggerMock())
+        lexer.tokenize_columns(data).ends.should.be(None)
@@ -49,10 +49,8 @@ class TestTypeAPI(unittest.TestCase):
 
 class TestBase(unittest.TestCase):
     def _assert_node_lineinfo(self, node):
-        node.should.have.property("lineno")
-        node.lineno.shouldnt.be(None)
-        node.should.have.property("lexpos")
-        node.lexpos.shouldnt.be(None)
+        node.should.have.property("pos")
+        node.pos.shouldnt.be(None)
 
 
 class TestTable(TestBase):
@@ -0,0 +1,98 @@
+import os
+import random
+import tempfile
+import unittest
+
+from compiler import winnow
+
+# pylint: disable=no-member
+
+
+class TestWinnow(unittest.TestCase):
+    """Test winnowed fingerprints and their index."""
+
+    program = (
+        "let rec fact n =\n"
+        "  if n = 0 then 1 else n * fact (n - 1)\n"
+        "let main =\n"
+        "  let s = fact 10 in\n"
+        "  print_int s; print_string \"done\\n\"\n"
+    )
+
+    def test_winnow(self):
+        rng = random.Random(42)
+        hashes = [rng.randrange(1000) for _ in range(500)]
+        selected = winnow.winnow(hashes, 4)
+        for i in range(len(hashes) - 3):
+            set(hashes[i:i + 4]).intersection(selected).shouldnt.be.empty
+        winnow.winnow([3, 1, 2], 4).should.equal({1})
+        winnow.winnow([], 4).should.equal(set())
+
+    def test_normalized(self):
+        hashes = winnow.fingerprints(self.program)
+        hashes.shouldnt.be.empty
+        renamed = self.program.replace("fact", "f").replace(" s", " t")
+        winnow.fingerprints(
+            "(* copied *)\n" + renamed.replace("\n", "\n  ")
+        ).should.equal(hashes)
+        winnow.fingerprints(
+            self.program.replace("10", "11")
+        ).shouldnt.equal(hashes)
+
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name, data in (
+                    ("original.lla", self.program),
+                    ("copy.lla", self.program.replace("fact", "g")),
+                    ("other.lla", "type t = A | B of int\nlet x = B 1\n")):
+                paths.append(os.path.join(directory, name))
+                with open(paths[-1], "w") as file:
+                    file.write(data)
+
+            path = os.path.join(directory, "index.db")
+            with winnow.Index(path, k=5, window=4) as index:
+                index.add(paths, processes=2)
+                len(index).should.equal(3)
+                index.query_file(paths[0], 0.5).should.equal(
+                    [(paths[1], 1.0)]
+                )
+                index.query(
+                    index.fingerprints(self.program), 0.5
+                ).should.have.length_of(2)
+
+            with winnow.Index(path) as index:
+                (index.k, index.window).should.equal((5, 4))
+                index.add(paths[1:2], processes=1)
+                len(index).should.equal(3)
+                index.query_file(paths[2]).should.equal([])
+
+    def test_common(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for i in range(10):
+                body = "let main = %s\n" % " + ".join(
+                    str(100 * i + j) for j in range(20)
+                )
+                paths.append(os.path.join(directory, "%d.lla" % i))
+                with open(paths[-1], "w") as file:
+                    file.write(self.program + body)
+            with open(os.path.join(directory, "copy.lla"), "w") as file:
+                file.write(self.program + body)
+            paths.append(file.name)
+
+            path = os.path.join(directory, "index.db")
+            with winnow.Index(path, k=5, window=4) as index:
+                index.add(paths, processes=1)
+                index.query_file(paths[0]).should.equal([])
+                index.query_file(paths[-1]).should.equal([(paths[-2], 1.0)])
+                index.query_file(
+                    paths[0], max_share=1.0
+                ).should.have.length_of(10)
+
+                index.add(paths[1:], processes=1)
+                len(index).should.equal(11)
+                index.query_file(paths[0]).should.equal([])
+                index.query(
+                    index.fingerprints(self.program)
+                ).should.equal([])